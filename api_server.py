@@ -0,0 +1,229 @@
+"""
+Headless HTTP API for the itinerary pipeline.
+
+A small asyncio HTTP/1.1 server in front of the same job runner the
+Streamlit app uses, so partner services can generate itineraries without
+a browser session:
+
+    POST /itineraries              submit a trip -> 202 {"job_id": ...}
+    GET  /itineraries/<job_id>     job status with per-step progress
+    GET  /itineraries/<job_id>/result   finished itinerary and step results
+    POST /chat                     {"question": ..., "trip": {...}} -> answer
+    GET  /health
+
+Per-stage metrics are served in Prometheus format on a separate port
+(AGENTX_METRICS_PORT, default 9464) at /metrics.
+
+API keys come from the X-Gemini-Api-Key / X-Tailvy-Api-Key headers, falling
+back to the GEMINI_API_KEY / TAILVY_API_KEY environment variables.
+
+Usage:
+    python api_server.py --host 0.0.0.0 --port 8080
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from http import HTTPStatus
+
+from jobs import get_job_manager
+from metrics import start_metrics_server
+from pipeline import answer_chat, step_records, trip_to_user_input
+
+logger = logging.getLogger("api_server")
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+class HTTPError(Exception):
+    """Error response with a status code and message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _api_keys(headers):
+    gemini_api_key = headers.get("x-gemini-api-key") or os.environ.get("GEMINI_API_KEY")
+    tailvy_api_key = headers.get("x-tailvy-api-key") or os.environ.get("TAILVY_API_KEY")
+    if not gemini_api_key:
+        raise HTTPError(HTTPStatus.UNAUTHORIZED, "A Gemini API key is required (X-Gemini-Api-Key header).")
+    return gemini_api_key, tailvy_api_key
+
+
+def _json_body(body):
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be JSON.")
+    if not isinstance(data, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object.")
+    return data
+
+
+def _get_job(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown job {job_id}.")
+    return job.snapshot()
+
+
+async def submit_itinerary(headers, body):
+    gemini_api_key, tailvy_api_key = _api_keys(headers)
+    try:
+        user_input = trip_to_user_input(_json_body(body))
+    except (TypeError, ValueError) as e:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, str(e))
+    job_id = get_job_manager().submit(user_input, gemini_api_key, tailvy_api_key=tailvy_api_key)
+    return HTTPStatus.ACCEPTED, {"job_id": job_id, "status": "queued"}
+
+
+async def itinerary_status(job_id):
+    snapshot = _get_job(job_id)
+    return HTTPStatus.OK, {
+        "job_id": job_id,
+        "status": snapshot["status"],
+        "steps": snapshot["step_status"],
+        "progress": snapshot["progress"],
+        "partial": snapshot["partial"],
+        "error": snapshot["error"],
+    }
+
+
+async def itinerary_result(job_id):
+    snapshot = _get_job(job_id)
+    if snapshot["status"] == "error":
+        raise HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, snapshot["error"])
+    if snapshot["status"] != "done":
+        raise HTTPError(HTTPStatus.CONFLICT, f"Job {job_id} is still {snapshot['status']}.")
+    return HTTPStatus.OK, {
+        "job_id": job_id,
+        "request": snapshot["user_input"],
+        "itinerary": snapshot["itinerary"],
+        "step_results": snapshot["step_results"],
+        "records": step_records(snapshot["step_results"]),
+        "tailvy_used": snapshot["tailvy_used"],
+        "seconds": round(snapshot["finished_at"] - snapshot["created_at"], 3),
+    }
+
+
+async def chat(headers, body):
+    gemini_api_key, tailvy_api_key = _api_keys(headers)
+    data = _json_body(body)
+    question = str(data.get("question", "")).strip()
+    if not question:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "A question is required.")
+    trip = data.get("trip")
+    if data.get("job_id"):
+        trip = _get_job(data["job_id"])["user_input"]
+    answer, backend = await asyncio.get_running_loop().run_in_executor(
+        None,
+        lambda: answer_chat(question, gemini_api_key, tailvy_api_key=tailvy_api_key, user_input=trip)
+    )
+    return HTTPStatus.OK, {"answer": answer, "backend": backend}
+
+
+async def route(method, path, headers, body):
+    """
+    Dispatch a request to its handler
+
+    Returns:
+        tuple: (HTTPStatus, JSON-serializable response body)
+    """
+    parts = [part for part in path.split("?", 1)[0].split("/") if part]
+    if method == "GET" and parts == ["health"]:
+        return HTTPStatus.OK, {"status": "ok", "jobs": get_job_manager().stats()}
+    if parts[:1] == ["itineraries"]:
+        if method == "POST" and len(parts) == 1:
+            return await submit_itinerary(headers, body)
+        if method == "GET" and len(parts) == 2:
+            return await itinerary_status(parts[1])
+        if method == "GET" and len(parts) == 3 and parts[2] == "result":
+            return await itinerary_result(parts[1])
+    if method == "POST" and parts == ["chat"]:
+        return await chat(headers, body)
+    raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}.")
+
+
+async def handle_connection(reader, writer):
+    """Serve HTTP/1.1 requests on one connection (keep-alive aware)."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line.strip():
+                break
+            try:
+                method, path, version = request_line.decode("latin-1").split()
+            except ValueError:
+                break
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            # Without a valid, fully read body the rest of the stream can't be framed
+            framed = False
+            try:
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length header.")
+                if length > MAX_BODY_BYTES:
+                    raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large.")
+                body = await reader.readexactly(length) if length else b""
+                framed = True
+                status, payload = await route(method.upper(), path, headers, body)
+            except HTTPError as e:
+                status, payload = e.status, {"error": e.message}
+            except Exception as e:
+                logger.exception("Error handling %s %s", method, path)
+                status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+            keep_alive = framed and version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port):
+    server = await asyncio.start_server(handle_connection, host, port)
+    logger.info("AgentX-Travel API listening on http://%s:%s", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the itinerary pipeline over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    start_metrics_server()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -25,33 +25,34 @@
 # - Pydeck for map visualizations
 """
 
+import time
+script_started = time.perf_counter()
+
 import streamlit as st
 import os
 import json
 from datetime import datetime, timedelta
 import base64
-import pandas as pd
-import pydeck as pdk
-import requests
-from travel import (
-    destination_research_task, accommodation_task, transportation_task,
-    activities_task, dining_task, itinerary_task, chatbot_task,
-    run_task
-)
-from geopy.geocoders import Nominatim
-try:
-    from pymongo import MongoClient
-    from bson import ObjectId
-    MONGODB_AVAILABLE = True
-except ImportError:
-    MONGODB_AVAILABLE = False
-    
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+from rate_limiter import get_rate_limiter
+from task_cache import get_cache
+from pipeline import RESEARCH_STEPS, flight_stats, step_records, stream_chat
+from schemas import strip_record
+from compaction import estimate_tokens
+from chat_store import ChatStore
+from retrieval import build_plan_index
+from jobs import STEP_KEYS, get_job_manager
+from metrics import METRICS_PORT, observe, record_error, start_metrics_server, summary as metrics_summary, track
+from gazetteer import get_gazetteer, normalize_place
+from geocoding import get_geocoder
+from lazy_imports import available, load
+
+# Optional integrations are only probed here; they are imported when first used
+MONGODB_AVAILABLE = available("pymongo", "bson")
+OPENAI_AVAILABLE = available("openai")
+
 
+# Prometheus endpoint for the pipeline metrics (started once per process)
+metrics_endpoint = start_metrics_server()
 
 st.set_page_config(
     page_title="Your AI Travel Assistant",
@@ -184,8 +185,26 @@ def initialize_session_state():
         if key not in st.session_state.step_results:
             st.session_state.step_results[key] = None
             
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
+    if "chat_store" not in st.session_state:
+        st.session_state.chat_store = ChatStore()
+    
+    if "chat_page" not in st.session_state:
+        st.session_state.chat_page = 0
+    
+    if "plan_index" not in st.session_state:
+        st.session_state.plan_index = None
+        
+    if "job_id" not in st.session_state:
+        st.session_state.job_id = None
+        
+    if "job_notice" not in st.session_state:
+        st.session_state.job_notice = None
+        
+    if "step_fingerprints" not in st.session_state:
+        st.session_state.step_fingerprints = {}
+        
+    if "reused_steps" not in st.session_state:
+        st.session_state.reused_steps = set()
         
     if "results" not in st.session_state:
         st.session_state.results = {}
@@ -220,65 +239,223 @@ def get_download_link(text_content, filename):
     href = f'<a class="download-link" href="data:text/plain;base64,{b64}" download="{filename}"><i>📥</i> {t("save_itinerary")}</a>'
     return href
 
+# Agent results shown in the Details tab: (step_results key, heading)
+DETAIL_SECTIONS = [
+    ("destination_research", "🧭 Destination Information"),
+    ("dining", "🍽️ Dining Recommendations"),
+]
+
+# Status labels for the research agents
+RESEARCH_LABELS = {key: label for key, _, label, _ in RESEARCH_STEPS}
+
+def detail_title(key, reused_steps=None):
+    """Details tab heading for a step, marking results reused from a similar trip."""
+    title = dict(DETAIL_SECTIONS)[key]
+    if reused_steps is None:
+        reused_steps = st.session_state.reused_steps
+    if key in reused_steps:
+        title += ' <span style="font-size: 0.8rem; color: #046A38;">♻️ reused</span>'
+    return title
+
+def render_output(placeholder, text, title=None):
+    """
+    Render (or re-render) agent output inside an output container
+    
+    Args:
+        placeholder: st.empty() placeholder to render into
+        text (str): The output text, possibly still streaming
+        title (str): Optional heading shown above the text
+    """
+    heading = f"<h3>{title}</h3>" if title else ""
+    placeholder.markdown('<div class="output-container">' + heading + '<div class="output-text">' + 
+                         text + '</div></div>', 
+                         unsafe_allow_html=True)
+
+def render_itinerary(placeholder):
+    """Render the generated itinerary (with the Tailvy badge if used) into a placeholder."""
+    if not st.session_state.generated_itinerary:
+        return
+    
+    with placeholder.container():
+        # Add Tailvy badge if Tailvy API was used for the plan (the chat sets tailvy_used too)
+        if 'tailvy_api_key' in st.session_state and st.session_state.tailvy_api_key and st.session_state.get("plan_tailvy_used"):
+            st.markdown(
+                """
+                <div style="display: inline-block; background-color: #046A38; color: white; 
+                padding: 5px 10px; border-radius: 15px; margin-bottom: 10px; font-size: 0.8rem;">
+                    ✨ Enhanced with Tailvy AI
+                </div>
+                """, 
+                unsafe_allow_html=True
+            )
+        
+        render_output(st.empty(), st.session_state.generated_itinerary)
+
 # ------------------------------------------
-# Tailvy API Integration
+# Background job progress
 # ------------------------------------------
-def use_tailvy_api(query, api_key, endpoint="itinerary"):
+JOB_POLL_INTERVAL = 0.3
+
+def progress_label(progress, partial=""):
     """
-    Call Tailvy API for travel planning
+    Short description of where a model call is (see pipeline.PROGRESS_STATES)
     
     Args:
-        query (str): The travel query with trip details
-        api_key (str): Tailvy API key
-        endpoint (str): API endpoint to use
-        
+        progress (dict): Latest progress info, with its "state"
+        partial (str): Output streamed so far, for a running token count
+    
     Returns:
-        dict: API response or None if failed
+        str: Label suffix such as "📨 sent to gemini-1.5-flash"
     """
-    try:
-        base_url = "https://api.tailvy.com/v1"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "query": query,
-            "format": "json"
-        }
-        
-        # Add a timeout to prevent hanging on slow API responses
-        response = requests.post(f"{base_url}/{endpoint}", headers=headers, json=data, timeout=30)
+    state = progress["state"]
+    if state == "queued":
+        return " ⏳ queued for the rate limit"
+    if state == "sent":
+        return f" 📨 sent to {progress['model']} ({progress['input_tokens']} tokens)"
+    if state == "first_token":
+        tokens = estimate_tokens(partial)
+        return f" ✍️ {progress['model']} writing" + (f", ~{tokens} tokens" if tokens else "")
+    return f" ✓ {progress['output_tokens']} tokens from {progress['model']} in {progress['seconds']:.1f}s"
+
+def render_job_progress(status_placeholder, snapshot):
+    """
+    Render a running job's agent status blocks and stream its partial output into the tabs
+    
+    Args:
+        status_placeholder: st.empty() placeholder for the status blocks
+        snapshot (dict): Job state from Job.snapshot()
+    """
+    with status_placeholder.container():
+        for level, message in snapshot["messages"]:
+            getattr(st, level)(message)
         
-        if response.status_code == 200:
-            try:
-                result = response.json()
-                # Validate that response has expected fields
-                if endpoint == "travel" and not all(k in result for k in ["destination_info", "accommodations", "transportation"]):
-                    st.warning("Tailvy API response is missing expected fields. Falling back to default method.")
-                    return None
-                return result
-            except ValueError:
-                st.warning("Tailvy API returned invalid JSON. Falling back to default method.")
-                return None
-        elif response.status_code == 401:
-            st.error("Invalid Tailvy API key. Please check your credentials.")
-            return None
-        elif response.status_code == 429:
-            st.warning("Tailvy API rate limit exceeded. Falling back to default method.")
-            return None
-        else:
-            st.warning(f"Tailvy API returned status code {response.status_code}. Falling back to default method.")
-            return None
-    except requests.exceptions.Timeout:
-        st.warning("Tailvy API request timed out. Falling back to default method.")
-        return None
-    except requests.exceptions.ConnectionError:
-        st.warning("Could not connect to Tailvy API. Falling back to default method.")
-        return None
-    except Exception as e:
-        st.warning(f"Error calling Tailvy API: {str(e)}. Falling back to default method.")
-        return None
+        for key in STEP_KEYS:
+            step_status = snapshot["step_status"][key]
+            label = RESEARCH_LABELS.get(key, "Creating final itinerary...")
+            if step_status == "reused":
+                label += " ♻️ reused from a similar trip"
+            elif step_status == "kept":
+                label += " ✓ unchanged since your last plan"
+            elif step_status == "prewarmed":
+                label += " ⚡ ready-made plan for a popular route"
+            elif key in snapshot["drafts"] and step_status != "done":
+                label += " 📝 draft ready, refining with the latest research"
+            elif step_status in ("queued", "running") and key in snapshot["progress"]:
+                label += progress_label(snapshot["progress"][key], snapshot["partial"][key])
+            elif step_status == "pending":
+                label += " ⏳ waiting"
+            state = "running" if step_status in ("pending", "queued", "running") else "complete"
+            if snapshot["status"] == "error" and state == "running":
+                state = "error"
+            st.status(label, state=state)
+    
+    # Only the visible panel has placeholders to stream into
+    for key, placeholder in detail_placeholders.items():
+        if snapshot["partial"][key]:
+            render_output(placeholder, strip_record(snapshot["partial"][key]), detail_title(key, snapshot["reused_steps"]))
+    if itinerary_placeholder is not None and snapshot["partial"]["itinerary"]:
+        render_output(itinerary_placeholder, snapshot["partial"]["itinerary"])
+
+def collect_job(snapshot):
+    """Copy a finished job's results into the session and queue its outcome message."""
+    st.session_state.job_id = None
+    if snapshot["status"] == "error":
+        st.session_state.job_notice = ("error", f"Error generating itinerary: {snapshot['error']}")
+        return
+    
+    st.session_state.step_results.update(snapshot["step_results"])
+    st.session_state.generated_itinerary = snapshot["itinerary"]
+    st.session_state.tailvy_used = snapshot["tailvy_used"]
+    # Kept apart from tailvy_used, which the chat also sets
+    st.session_state.plan_tailvy_used = snapshot["tailvy_used"]
+    st.session_state.reused_steps = snapshot["reused_steps"]
+    st.session_state.step_fingerprints = snapshot["fingerprints"]
+    # The map, chat and downloads follow the submitted request, not the live inputs
+    st.session_state.user_input = snapshot["user_input"]
+    st.session_state.destination = snapshot["user_input"]["destination"]
+    # Chat retrieval index, built once per generated plan
+    st.session_state.plan_index = build_plan_index(snapshot["itinerary"], st.session_state.step_results)
+    if snapshot["tailvy_used"]:
+        st.session_state.job_notice = ("success", "Your Tailvy-enhanced travel itinerary has been successfully generated!")
+    else:
+        st.session_state.job_notice = ("success", "Your travel itinerary has been successfully generated!")
+
+def follow_job():
+    """
+    Show the session's background job, refreshing it every JOB_POLL_INTERVAL
+    
+    Each tick reads one job snapshot. With st.fragment only the fragment
+    reruns between ticks, so no script thread waits on the job; older
+    Streamlit versions rerun the whole script instead. Once the job
+    finishes, its results are collected and the app reruns with them.
+    """
+    job_id = st.session_state.get("job_id")
+    if not job_id:
+        return
+    
+    job = get_job_manager().get(job_id)
+    if job is None:
+        # Expired or lost with a server restart
+        st.session_state.job_id = None
+        return
+    
+    status_placeholder = progress_area.empty()
+    
+    def poll():
+        snapshot = job.snapshot()
+        render_job_progress(status_placeholder, snapshot)
+        if snapshot["status"] in ("done", "error"):
+            collect_job(snapshot)
+            st.rerun()
+    
+    if hasattr(st, "fragment"):
+        st.fragment(poll, run_every=JOB_POLL_INTERVAL)()
+    else:
+        poll()
+        time.sleep(JOB_POLL_INTERVAL)
+        st.rerun()
+
+# ------------------------------------------
+# Chat and place helpers
+# ------------------------------------------
+def chat_bubble(message):
+    """HTML for one chat message (text, sender and time)."""
+    is_user = message["sender"] == "user"
+    message_class = "user-message" if is_user else "ai-message"
+    return f"""<div style="display: flex; justify-content: {'flex-end' if is_user else 'flex-start'}; margin-bottom: 10px;">
+        <div class="{message_class}" style="border-radius: 10px; padding: 10px; max-width: 80%;">
+            <div style="font-size: 0.8rem; color: #888; margin-bottom: 5px;">{message["sender"].upper()} - {message["time"]}</div>
+            <div class="output-text">{message["text"]}</div>
+        </div>
+    </div>"""
+
+def show_notice(level, message):
+    """notify callback for pipeline helpers: show the message with st.warning / st.error."""
+    getattr(st, level)(message)
+
+def place_hint(text):
+    """
+    Caption under a place field: the recognized place, or suggestions
+    
+    Args:
+        text (str): What the user typed into the origin or destination field
+    """
+    if not text or not text.strip():
+        return
+    gazetteer = get_gazetteer()
+    # Misspellings are only suggested, never shown as the recognized place
+    place = gazetteer.lookup(text, fuzzy=False)
+    if place and normalize_place(text) == normalize_place(place.name):
+        st.caption(f"📍 {place.name}, {place.state}")
+    elif place:
+        st.caption(f"📍 {text.strip()} → {place.name}, {place.state}")
+    else:
+        suggestions = gazetteer.suggest(text, limit=4)
+        if suggestions:
+            st.caption("💡 Did you mean: " + ", ".join(p.name for p in suggestions) + "?")
+
+# Longest a rerun waits for a queued geocoding lookup (Nominatim allows 1 request/second)
+GEOCODE_TIMEOUT = 15
 
 # ------------------------------------------
 # MongoDB Integration
@@ -305,13 +482,12 @@ def find_nearby_attractions(destination, search_term, radius=5000):
             return None
             
         # Connect to MongoDB
-        client = MongoClient(st.session_state.mongodb_uri)
+        client = load("pymongo").MongoClient(st.session_state.mongodb_uri)
         db_name = 'travel_india'
         collection = client[db_name]['attractions']
         
         # Get coordinates for the destination
-        geolocator = Nominatim(user_agent="travel_app")
-        location = geolocator.geocode(destination)
+        location = get_geocoder().geocode(destination, timeout=GEOCODE_TIMEOUT)
         
         if not location:
             st.warning(f"Could not find coordinates for {destination}.")
@@ -321,7 +497,7 @@ def find_nearby_attractions(destination, search_term, radius=5000):
         coordinates = [location.longitude, location.latitude]
         
         # Create a new search ID for this query
-        search_id = ObjectId()
+        search_id = load("bson").ObjectId()
         
         # Set up pipeline for geospatial pre-filtering
         geo_pipeline = [
@@ -344,7 +520,7 @@ def find_nearby_attractions(destination, search_term, radius=5000):
         collection.aggregate(geo_pipeline)
         
         # Create OpenAI client and generate embeddings for the search term
-        openai_client = OpenAI(api_key=st.session_state.openai_api_key)
+        openai_client = load("openai").OpenAI(api_key=st.session_state.openai_api_key)
         response = openai_client.embeddings.create(
             input=search_term,
             model="text-embedding-3-small",
@@ -397,7 +573,7 @@ def initialize_mongodb_collection():
             return False
             
         # Connect to MongoDB
-        client = MongoClient(st.session_state.mongodb_uri)
+        client = load("pymongo").MongoClient(st.session_state.mongodb_uri)
         db_name = 'travel_india'
         collection_name = 'attractions'
         
@@ -528,7 +704,7 @@ def initialize_mongodb_collection():
         
         # If OPENAI_AVAILABLE, create embeddings for sample data
         if OPENAI_AVAILABLE and st.session_state.openai_api_key:
-            openai_client = OpenAI(api_key=st.session_state.openai_api_key)
+            openai_client = load("openai").OpenAI(api_key=st.session_state.openai_api_key)
             with st.status("Creating vector embeddings..."):
                 for attraction in sample_attractions:
                     # Create embeddings for the attraction name and description
@@ -654,6 +830,32 @@ with st.sidebar:
         "Our AI system uses specialized agents for destination research, accommodations, "
         "transportation, activities, dining, and itinerary creation."
     )
+    
+    # Show how busy the shared Gemini key is
+    if st.session_state.gemini_api_key:
+        limiter_stats = get_rate_limiter().stats(st.session_state.gemini_api_key)
+        st.caption(
+            f"🚦 Gemini queue: {limiter_stats['queued']} waiting, {limiter_stats['in_flight']} running, "
+            f"avg wait {limiter_stats['avg_wait']:.1f}s"
+        )
+    
+    # Show how often repeated trip requests are served from the result cache
+    cache_stats = get_cache().stats()
+    coalesced = sum(stats["coalesced"] for stats in flight_stats().values())
+    st.caption(
+        f"⚡ Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+        f"({cache_stats['entries']} saved results), {coalesced} duplicate calls shared"
+    )
+    
+    # Admin panel: per-stage latency, tokens and errors
+    with st.expander("📊 Pipeline metrics"):
+        metrics_rows = metrics_summary()
+        if metrics_rows:
+            st.dataframe(metrics_rows, hide_index=True, use_container_width=True)
+        else:
+            st.caption("No calls recorded yet.")
+        if metrics_endpoint:
+            st.caption(f"Prometheus: http://127.0.0.1:{METRICS_PORT}/metrics")
 
 # Add a check for MongoDB availability when app starts
 if not MONGODB_AVAILABLE or not OPENAI_AVAILABLE:
@@ -670,13 +872,26 @@ if not MONGODB_AVAILABLE or not OPENAI_AVAILABLE:
 st.markdown("## " + t("create_itinerary"))
 st.markdown("### " + t("trip_details"))
 
+# Time to first paint (sidebar and page header sent); a session's first run
+# also pays for the app's imports if it is the first since a restart
+observe("first_paint", "rerun" if st.session_state.get("painted") else "first_run", time.perf_counter() - script_started)
+st.session_state.painted = True
+
+# Place fields sit outside the form so their hints update as soon as a
+# field is edited instead of only after submitting
+place_col1, place_col2 = st.columns(2)
+with place_col1:
+    origin = st.text_input(t("origin"), "Delhi")
+    place_hint(origin)
+with place_col2:
+    destination = st.text_input(t("destination"), "Agra")
+    place_hint(destination)
+
 with st.form(key="travel_form"):
     # Basic trip information
     col1, col2 = st.columns(2)
     
     with col1:
-        origin = st.text_input(t("origin"), "Delhi")
-        destination = st.text_input(t("destination"), "Agra")
         preferences = st.text_input(t("preferences"), "Historical sites, Culture, Food")
     
     with col2:
@@ -709,224 +924,130 @@ user_input = {
     "special_requirements": special_requirements
 }
 
-# Save destination to session state
-st.session_state.destination = destination  # Save destination to session_state
-
-# Save user input to session state for later use in maps
-st.session_state.user_input = user_input  # Save for later map usage
+# Request summary and agent progress are shown above the tabs
+progress_area = st.container()
 
 # Process form submission
 if submitted:
-    # Show the input summary
-    st.markdown("### " + t("request_details"))
-    input_summary = f"""
-    - **{t('from')}:** {origin}
-    - **{t('destination')}:** {destination}
-    - **{t('when')}:** {start_date.strftime('%d %b %Y')} to {end_date.strftime('%d %b %Y')}
-    - **{t('duration')}:** {duration} days
-    - **{t('preferences')}:** {preferences}
-    - **{t('budget')}:** {budget}
-    """
-    st.markdown(input_summary)
+    with progress_area:
+        # Show the input summary
+        st.markdown("### " + t("request_details"))
+        input_summary = f"""
+        - **{t('from')}:** {origin}
+        - **{t('destination')}:** {destination}
+        - **{t('when')}:** {start_date.strftime('%d %b %Y')} to {end_date.strftime('%d %b %Y')}
+        - **{t('duration')}:** {duration} days
+        - **{t('preferences')}:** {preferences}
+        - **{t('budget')}:** {budget}
+        """
+        st.markdown(input_summary)
     
-    # Original travel request prompt
-    input_text = f"Origin: {origin}, Destination: {destination}, Travel dates: {start_date} to {end_date}, Duration: {duration} days, Preferences: {preferences}, Budget: {budget}"
-    
-    # Check if API key is available
-    if 'gemini_api_key' not in st.session_state or not st.session_state.gemini_api_key:
-        st.error("Please enter your Gemini API key in the sidebar to generate an itinerary.")
-    else:
-        # Process the travel request
-        with st.spinner("Generating your personalized travel itinerary..."):
-            try:
-                # Check if Tailvy API is available
-                if 'tailvy_api_key' in st.session_state and st.session_state.tailvy_api_key:
-                    # Use Tailvy API for enhanced travel planning
-                    st.info("Using Tailvy API for enhanced travel recommendations...")
-                    
-                    tailvy_response = use_tailvy_api(
-                        input_text, 
-                        st.session_state.tailvy_api_key,
-                        endpoint="travel"
-                    )
-                    
-                    if tailvy_response:
-                        # If Tailvy API call was successful, use its results
-                        try:
-                            st.session_state.step_results["destination_research"] = tailvy_response.get("destination_info", "")
-                            st.session_state.step_results["accommodation"] = tailvy_response.get("accommodations", "")
-                            st.session_state.step_results["transportation"] = tailvy_response.get("transportation", "")
-                            st.session_state.step_results["activities"] = tailvy_response.get("activities", "")
-                            st.session_state.step_results["dining"] = tailvy_response.get("dining", "")
-                            
-                            # Generate final itinerary with Tailvy integration
-                            st.session_state.generated_itinerary = tailvy_response.get("itinerary", "")
-                            
-                            # Set tailvy_used flag to True
-                            st.session_state.tailvy_used = True
-                            
-                            # Success message
-                            st.success("Your Tailvy-enhanced travel itinerary has been successfully generated!")
-                            
-                            # Switch to the itinerary tab
-                            st.session_state.active_tab = "full_itinerary"
-                            
-                        except Exception as e:
-                            st.warning(f"Error processing Tailvy data: {str(e)}. Falling back to default method.")
-                            # If error in processing Tailvy data, fall back to the default method
-                            tailvy_response = None
-                            st.session_state.tailvy_used = False
-                    
-                # If Tailvy API not available or failed, use default method
-                if 'tailvy_api_key' not in st.session_state or not st.session_state.tailvy_api_key or not tailvy_response:
-                    # Reset tailvy_used flag since we're using the default method
-                    st.session_state.tailvy_used = False
-                    
-                    # Step 1: Destination Research
-                    with st.status("Researching destination..."):
-                        st.session_state.step_results["destination_research"] = run_task(
-                            destination_research_task, 
-                            input_text, 
-                            api_key=st.session_state.gemini_api_key
-                        )
-                    
-                    # Step 2: Accommodation
-                    with st.status("Finding accommodations..."):
-                        st.session_state.step_results["accommodation"] = run_task(
-                            accommodation_task, 
-                            input_text, 
-                            api_key=st.session_state.gemini_api_key
-                        )
-                    
-                    # Step 3: Transportation
-                    with st.status("Planning transportation..."):
-                        st.session_state.step_results["transportation"] = run_task(
-                            transportation_task, 
-                            input_text, 
-                            api_key=st.session_state.gemini_api_key
-                        )
-                    
-                    # Step 4: Activities
-                    with st.status("Discovering activities..."):
-                        st.session_state.step_results["activities"] = run_task(
-                            activities_task, 
-                            input_text, 
-                            api_key=st.session_state.gemini_api_key
-                        )
-                    
-                    # Step 5: Dining
-                    with st.status("Finding dining options..."):
-                        st.session_state.step_results["dining"] = run_task(
-                            dining_task, 
-                            input_text, 
-                            api_key=st.session_state.gemini_api_key
-                        )
-                    
-                    # Step 6: Generate final itinerary
-                    with st.status("Creating final itinerary..."):
-                        # Combine results for the final itinerary
-                        combined_results = f"""
-                        Destination Research: {st.session_state.step_results['destination_research']}
-                        
-                        Accommodation: {st.session_state.step_results['accommodation']}
-                        
-                        Transportation: {st.session_state.step_results['transportation']}
-                        
-                        Activities: {st.session_state.step_results['activities']}
-                        
-                        Dining: {st.session_state.step_results['dining']}
-                        """
-                        
-                        st.session_state.generated_itinerary = run_task(
-                            itinerary_task, 
-                            f"{input_text}\n\n{combined_results}", 
-                            api_key=st.session_state.gemini_api_key
-                        )
-                    
-                    # Success message
-                    st.success("Your travel itinerary has been successfully generated!")
-                    
-                    # Switch to the itinerary tab
-                    st.session_state.active_tab = "full_itinerary"
-                
-            except Exception as e:
-                st.error(f"Error generating itinerary: {str(e)}")
-                st.info("Please check your API key and try again. Make sure you're using a valid API key.")
-else:
-    # When form is not submitted yet, show a sample itinerary or instructions
-    input_text = f"Origin: {origin}, Destination: {destination}, Travel dates: {start_date} to {end_date}, Duration: {duration} days, Preferences: {preferences}, Budget: {budget}"
+        # Check if API key is available
+        if 'gemini_api_key' not in st.session_state or not st.session_state.gemini_api_key:
+            st.error("Please enter your Gemini API key in the sidebar to generate an itinerary.")
+        else:
+            if 'tailvy_api_key' in st.session_state and st.session_state.tailvy_api_key:
+                st.info("Using Tailvy API for enhanced travel recommendations...")
+            
+            # Hand over the last results so only tasks whose inputs changed run again
+            previous = None
+            if st.session_state.generated_itinerary:
+                previous = {
+                    "step_results": dict(st.session_state.step_results, itinerary=st.session_state.generated_itinerary),
+                    "fingerprints": st.session_state.step_fingerprints,
+                    "tailvy_used": st.session_state.get("plan_tailvy_used", False),
+                }
+            
+            # Generation runs as a background job so reruns can't abandon it
+            st.session_state.job_id = get_job_manager().submit(
+                user_input,
+                st.session_state.gemini_api_key,
+                tailvy_api_key=st.session_state.tailvy_api_key or None,
+                previous=previous
+            )
+            
+            # Switch to the itinerary tab
+            st.session_state.active_tab = "full_itinerary"
 
-# Create tabs for the interface (including chatbot)
-tabs_list = [
-    t("full_itinerary"), 
-    t("details"), 
-    t("download_share"), 
-    "🗺️ " + t("map_view"), 
-    "🤖 " + t("chat")
-]
+# Show the outcome of a job collected on the previous run
+if st.session_state.job_notice:
+    level, message = st.session_state.job_notice
+    st.session_state.job_notice = None
+    with progress_area:
+        getattr(st, level)(message)
+        if level == "error":
+            st.info("Please check your API key and try again. Make sure you're using a valid API key.")
 
-# Check if we should activate a specific tab
-if 'active_tab' in st.session_state:
-    active_tab_index = 0  # Default to first tab
-    if st.session_state.active_tab == "full_itinerary":
-        active_tab_index = 0
-    elif st.session_state.active_tab == "details":
-        active_tab_index = 1
-    elif st.session_state.active_tab == "download_share":
-        active_tab_index = 2
-    elif st.session_state.active_tab == "map_view":
-        active_tab_index = 3
-    elif st.session_state.active_tab == "chat":
-        active_tab_index = 4
-    
-    # Store active tab index
-    st.session_state.active_tab_index = active_tab_index
-    
-tabs = st.tabs(tabs_list)
+# Only the selected tab's panel runs; hidden tabs cost nothing on a rerun
+TAB_LABELS = {
+    "full_itinerary": t("full_itinerary"),
+    "details": t("details"),
+    "download_share": t("download_share"),
+    "map_view": "🗺️ " + t("map_view"),
+    "chat": "🤖 " + t("chat"),
+}
+
+def select_tab():
+    """on_change callback for the tab selector."""
+    st.session_state.active_tab = st.session_state.tab_selector
+
+# Programmatic switches (e.g. to the itinerary after submitting) reach the selector here
+if st.session_state.get("tab_selector") != st.session_state.active_tab:
+    st.session_state.tab_selector = st.session_state.active_tab
+
+st.radio(
+    "Section",
+    list(TAB_LABELS),
+    format_func=TAB_LABELS.get,
+    key="tab_selector",
+    on_change=select_tab,
+    horizontal=True,
+    label_visibility="collapsed"
+)
+active_tab = st.session_state.active_tab
+
+# Placeholders so the itinerary and agent results can stream into the visible panel
+itinerary_placeholder = None
+detail_placeholders = {}
 
 # Itinerary tab
-with tabs[0]:
-    if st.session_state.generated_itinerary:
-        # Add Tailvy badge if Tailvy API was used
-        if 'tailvy_api_key' in st.session_state and st.session_state.tailvy_api_key and 'tailvy_used' in st.session_state and st.session_state.tailvy_used:
-            st.markdown(
-                """
-                <div style="display: inline-block; background-color: #046A38; color: white; 
-                padding: 5px 10px; border-radius: 15px; margin-bottom: 10px; font-size: 0.8rem;">
-                    ✨ Enhanced with Tailvy AI
-                </div>
-                """, 
-                unsafe_allow_html=True
-            )
-        
-        st.markdown('<div class="output-container"><div class="output-text">' + 
-                   st.session_state.generated_itinerary + '</div></div>', 
-                   unsafe_allow_html=True)
+if active_tab == "full_itinerary":
+    itinerary_placeholder = st.empty()
+    render_itinerary(itinerary_placeholder)
 
 # Details tab
-with tabs[1]:
-    if st.session_state.step_results.get("destination_research"):
-        st.markdown('<div class="output-container"><h3>🧭 Destination Information</h3><div class="output-text">' + 
-                    st.session_state.step_results["destination_research"] + '</div></div>', 
-                    unsafe_allow_html=True)
-    
-    if st.session_state.step_results.get("dining"):
-        st.markdown('<div class="output-container"><h3>🍽️ Dining Recommendations</h3><div class="output-text">' + 
-                    st.session_state.step_results["dining"] + '</div></div>', 
-                    unsafe_allow_html=True)
+if active_tab == "details":
+    detail_placeholders = {key: st.empty() for key, _ in DETAIL_SECTIONS}
+    for key, _ in DETAIL_SECTIONS:
+        if st.session_state.step_results.get(key):
+            render_output(detail_placeholders[key], strip_record(st.session_state.step_results[key]), detail_title(key))
 
 # Download and share tab
-with tabs[2]:
+if active_tab == "download_share":
     if st.session_state.generated_itinerary:
         st.markdown('<div class="output-container"><h3>' + t("save_itinerary") + '</h3>', unsafe_allow_html=True)
         # Get destination from session state or use a default value
         destination = st.session_state.get("destination", "Travel")
         download_link = get_download_link(st.session_state.generated_itinerary, f"Travel_Itinerary_{destination.replace(' ', '_')}.txt")
         st.markdown(download_link, unsafe_allow_html=True)
+        
+        # Structured hotels, transport legs, activities and restaurants for other tools
+        records = step_records(st.session_state.step_results)
+        if records:
+            st.download_button(
+                "📥 Download trip data (JSON)",
+                data=json.dumps({"request": st.session_state.get("user_input"), "records": records}, ensure_ascii=False, indent=2),
+                file_name=f"Travel_Data_{destination.replace(' ', '_')}.json",
+                mime="application/json"
+            )
         st.markdown('</div>', unsafe_allow_html=True)
 
 # Maps and visualization tab
-with tabs[3]:
+if active_tab == "map_view":
+    # pandas and pydeck are only needed for the map
+    pd = load("pandas")
+    pdk = load("pydeck")
+    
     st.markdown('<h3 class="output-text">Destination Map</h3>', unsafe_allow_html=True)
     
     # Get destination value from session_state (default to "Delhi" if not available)
@@ -945,7 +1066,11 @@ with tabs[3]:
         
         if st.button("Search"):
             with st.spinner("Searching for nearby attractions..."):
-                mongo_results = find_nearby_attractions(destination, search_term, radius)
+                with track("attraction_search", "mongodb"):
+                    mongo_results = find_nearby_attractions(destination, search_term, radius)
+                if mongo_results is None:
+                    # find_nearby_attractions reports failures itself and returns None
+                    record_error("attraction_search", "mongodb")
                 if mongo_results and mongo_results["count"] > 0:
                     st.session_state.mongodb_used = True
                     st.success(f"Found {mongo_results['count']} attractions near {destination}!")
@@ -977,14 +1102,15 @@ with tabs[3]:
     
     # Get latitude and longitude via geocoding
     try:
-        geolocator = Nominatim(user_agent="travel_app")
-        location = geolocator.geocode(destination)
+        location = get_geocoder().geocode(destination, timeout=GEOCODE_TIMEOUT)
         if location:
             lat, lon = location.latitude, location.longitude
         else:
             lat, lon = 28.6139, 77.2090  # Default to Delhi if location not found
+            st.warning(f"Couldn't find {destination} on the map; showing Delhi instead.")
     except:
         lat, lon = 28.6139, 77.2090  # Default to Delhi if error
+        st.warning(f"Couldn't look up {destination} right now; showing Delhi instead.")
     
     # Create map data (can dynamically generate data for attractions near destination if needed)
     if mongo_results and mongo_results["count"] > 0:
@@ -1091,82 +1217,86 @@ with tabs[3]:
     st.markdown('</div>', unsafe_allow_html=True)
 
 # Chatbot interface tab (Clear button removed)
-with tabs[4]:
+if active_tab == "chat":
     st.markdown('<h3 class="output-text">AI Travel Assistant</h3>', unsafe_allow_html=True)
     
-    # Store conversation history in session state (message, sender, timestamp)
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    # Bounded history: a page of messages on screen, a rolling summary for the model
+    chat_store = st.session_state.chat_store
     
-    # User input field and send button
-    user_question = st.text_input("Ask a question about your travel plans:", key="user_question")
+    # User input field and send button (a form, so the question is sent once
+    # and not again on every rerun)
+    with st.form(key="chat_form", clear_on_submit=True):
+        user_question = st.text_input("Ask a question about your travel plans:")
+        asked = st.form_submit_button("Send")
     
     # Check if API key is available
-    if user_question and user_question.strip():
+    if asked and user_question and user_question.strip():
         if 'gemini_api_key' not in st.session_state or not st.session_state.gemini_api_key:
             st.error("Please enter your Gemini API key in the sidebar to use the chat feature.")
         else:
-            # Create context for the chatbot
-            if "user_input" in st.session_state:
-                context = f"Travel Plan: {st.session_state.user_input}\nQuestion: {user_question}"
-            else:
-                context = f"Question: {user_question}"
+            # The status follows the real calls (queued, sent, first token,
+            # completed) and the winning answer streams into its bubble
+            chat_status = st.status("Thinking...")
+            answer_bubble = st.empty()
             
-            # Try using Tailvy API first if available
-            tailvy_response = None
-            if 'tailvy_api_key' in st.session_state and st.session_state.tailvy_api_key:
-                try:
-                    tailvy_response = use_tailvy_api(
-                        user_question, 
-                        st.session_state.tailvy_api_key,
-                        endpoint="chat"
-                    )
-                except:
-                    tailvy_response = None
+            def show_chat_progress(state, info):
+                prefix = "Answered" if state == "completed" else "Thinking..."
+                chat_status.update(label=prefix + progress_label(dict(info, state=state)))
             
-            # Generate response and add to conversation history
-            with st.spinner("Thinking..."):
-                try:
-                    with st.progress(0) as progress_bar:
-                        for i in range(100):
-                            # Simulating progress
-                            progress_bar.progress(i + 1)
-                            if i < 98:  # Add a small delay for the visual effect
-                                import time
-                                time.sleep(0.01)
-                    
-                    # Use Tailvy response if available, otherwise use Gemini
-                    if tailvy_response:
-                        response = tailvy_response.get("response", "I couldn't find an answer to that question.")
-                        # Mark that Tailvy was used
-                        st.session_state.tailvy_used = True
-                    else:
-                        response = run_task(chatbot_task, context, api_key=st.session_state.gemini_api_key)
-                        # Reset Tailvy used flag if not used
-                        st.session_state.tailvy_used = False
-                    
-                    now = datetime.now().strftime("%H:%M")
-                    st.session_state.messages.append({"text": user_question, "sender": "user", "time": now})
-                    st.session_state.messages.append({"text": response, "sender": "ai", "time": now})
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
-                    st.info("Please check your API key and try again.")
+            try:
+                # Ground the answer in the parts of the plan the question is about
+                if st.session_state.plan_index is None and st.session_state.generated_itinerary:
+                    st.session_state.plan_index = build_plan_index(
+                        st.session_state.generated_itinerary, st.session_state.step_results
+                    )
+                references = st.session_state.plan_index.search(user_question) if st.session_state.plan_index else []
+                
+                # Tailvy (if configured) and Gemini race; the first valid answer wins
+                now = datetime.now().strftime("%H:%M")
+                response = ""
+                backend = "gemini"
+                for backend, chunk in stream_chat(
+                    user_question,
+                    st.session_state.gemini_api_key,
+                    tailvy_api_key=st.session_state.tailvy_api_key or None,
+                    user_input=st.session_state.get("user_input"),
+                    notify=show_notice,
+                    on_progress=show_chat_progress,
+                    history=chat_store.context(),
+                    references=references
+                ):
+                    response += chunk
+                    answer_bubble.markdown(chat_bubble({"text": response, "sender": "ai", "time": now}), unsafe_allow_html=True)
+                chat_status.update(state="complete")
+                answer_bubble.empty()
+                # Mark whether Tailvy was used
+                st.session_state.tailvy_used = backend == "tailvy"
+                
+                chat_store.add_exchange(user_question, response, now)
+                st.session_state.chat_page = 0
+            except Exception as e:
+                chat_status.update(state="error")
+                st.error(f"Error: {str(e)}")
+                st.info("Please check your API key and try again.")
     
-    # Display conversation history (with timestamps, in a scrollable area)
-    chat_container = st.container()
-    with chat_container:
-        for message in reversed(st.session_state.messages):
-            is_user = message["sender"] == "user"
-            message_class = "user-message" if is_user else "ai-message"
-            st.markdown(
-                f"""<div style="display: flex; justify-content: {'flex-end' if is_user else 'flex-start'}; margin-bottom: 10px;">
-                    <div class="{message_class}" style="border-radius: 10px; padding: 10px; max-width: 80%;">
-                        <div style="font-size: 0.8rem; color: #888; margin-bottom: 5px;">{message["sender"].upper()} - {message["time"]}</div>
-                        <div class="output-text">{message["text"]}</div>
-                    </div>
-                </div>""",
-                unsafe_allow_html=True
-            )
+    # Display one page of the conversation (newest first) as a single element
+    page_count = chat_store.page_count()
+    st.session_state.chat_page = min(st.session_state.chat_page, page_count - 1)
+    bubbles = [chat_bubble(message) for message in chat_store.page(st.session_state.chat_page)]
+    if bubbles:
+        st.markdown("\n".join(bubbles), unsafe_allow_html=True)
+    
+    # Pagination of older messages
+    if page_count > 1:
+        def change_chat_page(step):
+            st.session_state.chat_page += step
+        
+        newer_col, page_col, older_col = st.columns([1, 2, 1])
+        newer_col.button("◀ Newer", on_click=change_chat_page, args=(-1,), disabled=st.session_state.chat_page == 0)
+        page_col.caption(f"Page {st.session_state.chat_page + 1} of {page_count}")
+        older_col.button("Older ▶", on_click=change_chat_page, args=(1,), disabled=st.session_state.chat_page >= page_count - 1)
+    if chat_store.total > len(chat_store):
+        st.caption(f"{chat_store.total - len(chat_store)} older messages are only kept as a summary.")
 
 st.markdown("""
 <div style="margin-top: 50px; text-align: center; padding: 20px; color: #6c757d; font-size: 0.8rem;">
@@ -1180,3 +1310,12 @@ st.markdown("""
     </div>
 </div>
 """, unsafe_allow_html=True)
+
+# ------------------------------------------
+# Follow the background generation job
+# ------------------------------------------
+# Rerun cost per visible tab, shown in the sidebar's metrics panel
+observe("script_rerun", active_tab, time.perf_counter() - script_started)
+
+# Runs last so the rest of the page stays interactive while we poll
+follow_job()
@@ -0,0 +1,234 @@
+"""
+Headless batch itinerary generation.
+
+Reads trip requests from a JSONL file (one object per line with the same
+fields as the travel form: origin, destination, start_date, duration,
+preferences, budget, special_requirements and an optional id), runs the
+agent pipeline with bounded concurrency and retries, and appends one JSONL
+result per request to the output file as soon as it is ready.
+
+The output file doubles as the checkpoint: requests that already have a
+successful result there are skipped, so an interrupted run can simply be
+started again with the same arguments.
+
+Usage:
+    python batch.py trips.jsonl -o itineraries.jsonl --concurrency 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pipeline import run_pipeline, trip_to_user_input
+
+logger = logging.getLogger("batch")
+
+
+def error_result(request_id, request, error, seconds=0.0, attempts=0):
+    """JSONL result line for a request that could not be generated."""
+    return {
+        "id": request_id,
+        "status": "error",
+        "request": request,
+        "error": str(error),
+        "total_seconds": seconds,
+        "attempts": attempts,
+    }
+
+
+def load_requests(path):
+    """
+    Read trip requests from a JSONL file
+
+    A line that is not valid JSON or not a JSON object does not stop the
+    run; it becomes an error result of its own.
+
+    Args:
+        path (str): Input file path
+
+    Returns:
+        tuple: (list of (request id, record) tuples, list of error results
+        for unreadable lines); blank lines are skipped
+    """
+    trips = []
+    invalid = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            request_id = f"line-{line_number}"
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                invalid.append(error_result(request_id, line.strip(), f"invalid JSON: {e}"))
+                continue
+            if not isinstance(record, dict):
+                invalid.append(error_result(request_id, record, "a trip request must be a JSON object"))
+                continue
+            trips.append((str(record.get("id", request_id)), record))
+    return trips, invalid
+
+
+def completed_ids(path):
+    """
+    Read the checkpoint: ids that already have a successful result
+
+    Args:
+        path (str): Output file path
+
+    Returns:
+        set: Request ids to skip
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # A line cut short by an interrupted run
+                continue
+            if result.get("status") == "ok":
+                done.add(result["id"])
+    return done
+
+
+def end_with_newline(path):
+    """Terminate a line cut short by an interrupted run, so appended results start on their own line."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def generate(request_id, record, gemini_api_key, tailvy_api_key=None, retries=2, backoff=5.0):
+    """
+    Run the pipeline for one trip request, retrying failures
+
+    Args:
+        request_id (str): Id of the request
+        record (dict): The trip request
+        gemini_api_key (str): Gemini API key
+        tailvy_api_key (str): Optional Tailvy API key
+        retries (int): Extra attempts after the first failure
+        backoff (float): Seconds to wait before the first retry (doubles each time)
+
+    Returns:
+        dict: JSON-serializable result line
+    """
+    attempts = 0
+    started = time.time()
+
+    def failed(error):
+        return error_result(request_id, record, error, round(time.time() - started, 3), attempts)
+
+    # A malformed request fails the same way every time: don't retry it
+    try:
+        user_input = trip_to_user_input(record)
+    except (TypeError, ValueError) as e:
+        return failed(e)
+
+    while True:
+        attempts += 1
+        timings = {}
+        attempt_started = time.perf_counter()
+
+        def on_event(step, kind, text):
+            elapsed = round(time.perf_counter() - attempt_started, 3)
+            if kind in ("queued", "sent", "first_token"):
+                timings.setdefault(step, {}).setdefault(kind, elapsed)
+            elif kind == "completed":
+                # Summed over the step's model calls (escalations, drafts)
+                step_timings = timings.setdefault(step, {})
+                for field in ("input_tokens", "output_tokens"):
+                    step_timings[field] = step_timings.get(field, 0) + text[field]
+            elif kind == "chunk":
+                timings.setdefault(step, {}).setdefault("first_chunk", elapsed)
+            elif kind == "draft":
+                timings.setdefault(step, {})["draft"] = elapsed
+            elif kind == "reset":
+                field = "draft_abandoned" if step == "itinerary" else "escalated"
+                timings.setdefault(step, {})[field] = elapsed
+            else:
+                timings.setdefault(step, {})["finished"] = elapsed
+                timings[step]["source"] = kind
+
+        try:
+            result = run_pipeline(
+                user_input,
+                gemini_api_key,
+                tailvy_api_key=tailvy_api_key,
+                on_event=on_event,
+                notify=lambda level, message: logger.warning("%s: %s", request_id, message)
+            )
+            return {
+                "id": request_id,
+                "status": "ok",
+                "request": user_input,
+                "itinerary": result["itinerary"],
+                "step_results": result["step_results"],
+                "records": result["records"],
+                "tailvy_used": result["tailvy_used"],
+                "timings": timings,
+                "total_seconds": round(time.time() - started, 3),
+                "attempts": attempts,
+            }
+        except Exception as e:
+            if attempts > retries:
+                return failed(e)
+            wait = backoff * 2 ** (attempts - 1)
+            logger.warning("%s: attempt %d failed (%s), retrying in %.0fs", request_id, attempts, e, wait)
+            time.sleep(wait)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate itineraries for a JSONL file of trip requests.")
+    parser.add_argument("input", help="JSONL file with one trip request per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file results are appended to (also the checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Trips generated at the same time (default: 4)")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per trip after a failure (default: 2)")
+    parser.add_argument("--gemini-api-key", default=os.environ.get("GEMINI_API_KEY"), help="Defaults to $GEMINI_API_KEY")
+    parser.add_argument("--tailvy-api-key", default=os.environ.get("TAILVY_API_KEY"), help="Defaults to $TAILVY_API_KEY")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not args.gemini_api_key:
+        parser.error("a Gemini API key is required (--gemini-api-key or GEMINI_API_KEY)")
+
+    trips, invalid = load_requests(args.input)
+    done = completed_ids(args.output)
+    pending = [(request_id, record) for request_id, record in trips if request_id not in done]
+    logger.info("%d trip requests, %d already done, %d to generate", len(trips), len(trips) - len(pending), len(pending))
+
+    failures = len(invalid)
+    end_with_newline(args.output)
+    with open(args.output, "a", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="agentx-batch") as executor:
+        for result in invalid:
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            logger.warning("%s: %s", result["id"], result["error"])
+        out.flush()
+        futures = [
+            executor.submit(generate, request_id, record, args.gemini_api_key, args.tailvy_api_key, args.retries)
+            for request_id, record in pending
+        ]
+        for count, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            if result["status"] != "ok":
+                failures += 1
+            logger.info("[%d/%d] %s: %s in %.1fs", count, len(pending), result["id"], result["status"], result["total_seconds"])
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Deterministic stand-ins for the external services the app talks to.
+
+- FakeLLM builds a replacement for the travel module (the agent tasks,
+  run_task and stream_task) with configurable latency and output size.
+- FakeTailvy answers the Tailvy endpoints in place of requests.post.
+- FakeNominatim, FakeMongoClient and FakeOpenAI replace geocoding and the
+  MongoDB attraction search.
+
+install() swaps them in; it must run before pipeline (or app.py) is
+imported so every module picks up the fake travel module.
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+import types
+from contextlib import contextmanager
+
+TASK_NAMES = (
+    "destination_research_task", "accommodation_task", "transportation_task",
+    "activities_task", "dining_task", "itinerary_task", "chatbot_task",
+)
+
+# Lines the fake agents repeat (with the day and item filled in) so the
+# output looks like real research: names, prices and times to compact
+_LINES = (
+    "Day {day}: Visit the Heritage Fort {item} at 9:00 AM, entry ₹{price} per person.",
+    "Stay at Hotel Residency {item}, ₹{price}/night, near the main bazaar.",
+    "Take the Shatabdi Express {item} departing 6:15 AM, fare ₹{price}.",
+    "Lunch at Spice Route {item}, thali ₹{price}, open 12:00 PM - 3:30 PM.",
+    "Evening aarti at the ghats around 6:45 PM; carry ₹{price} for boats.",
+    "Note: carry water and sunscreen, the afternoons are hot.",
+)
+
+
+class Latency:
+    """Latency distribution in seconds: "fixed", "uniform" or "lognormal"."""
+
+    def __init__(self, kind="lognormal", mean=0.3, spread=0.5, seed=0):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"unknown latency distribution {kind!r}")
+        self.kind = kind
+        self.mean = mean
+        self.spread = spread
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        with self._lock:
+            if self.kind == "fixed":
+                return self.mean
+            if self.kind == "uniform":
+                return self._random.uniform(self.mean * (1 - self.spread), self.mean * (1 + self.spread))
+            # Median mean, heavy right tail like real API latency
+            return self.mean * self._random.lognormvariate(0, self.spread)
+
+
+class FakeLLM:
+    """
+    Fake Gemini backend
+
+    Args:
+        first_token (Latency): Time before the first chunk
+        per_chunk (float): Seconds between streamed chunks
+        base_chars (int): Output size of every response
+        chars_per_day (int): Extra output per trip day (taken from the
+            "Duration: N days" part of the prompt)
+        chunk_chars (int): Size of each streamed chunk
+        streaming (bool): Whether the fake travel module offers stream_task
+        fast_speedup (float): How much faster "flash" models answer
+    """
+
+    def __init__(self, first_token=None, per_chunk=0.002, base_chars=1500, chars_per_day=600, chunk_chars=80,
+                 streaming=True, fast_speedup=3.0):
+        self.first_token = first_token or Latency()
+        self.per_chunk = per_chunk
+        self.base_chars = base_chars
+        self.chars_per_day = chars_per_day
+        self.chunk_chars = chunk_chars
+        self.streaming = streaming
+        self.fast_speedup = fast_speedup
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def output(self, task, input_text):
+        match = re.search(r"Duration: (\d+) days", input_text)
+        days = int(match.group(1)) if match else 1
+        size = self.base_chars + self.chars_per_day * days
+        lines = []
+        length = 0
+        item = 0
+        while length < size:
+            line = _LINES[item % len(_LINES)].format(day=item // len(_LINES) + 1, item=item, price=100 + 50 * (item % 7))
+            lines.append(line)
+            length += len(line) + 1
+            item += 1
+        text = f"{task.name}:\n" + "\n".join(lines)
+        # Answer the structured record request (see schemas.schema_instructions)
+        shape = re.search(r"with exactly this shape: (\{.*?\})\. ", input_text)
+        if shape:
+            record = self.record(json.loads(shape.group(1)), lines)
+            text += "\n\n```json\n" + json.dumps(record, ensure_ascii=False) + "\n```"
+        return text
+
+    def record(self, shape, lines):
+        """Fill a record shape with values taken from the generated lines."""
+        if isinstance(shape, dict):
+            return {key: self.record(value, lines) for key, value in shape.items()}
+        if isinstance(shape, list):
+            return [self.record(shape[0], lines[i:]) for i in range(min(8, len(lines)))]
+        return lines[0][:40] if lines else ""
+
+    def stream(self, task, input_text, api_key=None, model=None):
+        with self._lock:
+            self.calls += 1
+        scale = 1 / self.fast_speedup if model and "flash" in model else 1
+        text = self.output(task, input_text)
+        time.sleep(self.first_token.sample() * scale)
+        for start in range(0, len(text), self.chunk_chars):
+            if start:
+                time.sleep(self.per_chunk * scale)
+            yield text[start:start + self.chunk_chars]
+
+    def run(self, task, input_text, api_key=None, model=None):
+        return "".join(self.stream(task, input_text, api_key, model))
+
+    def module(self):
+        """Build the fake travel module."""
+        travel = types.ModuleType("travel")
+        for name in TASK_NAMES:
+            setattr(travel, name, types.SimpleNamespace(name=name))
+        travel.run_task = self.run
+        if self.streaming:
+            travel.stream_task = self.stream
+        return travel
+
+
+class _FakeResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeTailvy:
+    """Replacement for requests.post serving the Tailvy "travel" and "chat" endpoints."""
+
+    def __init__(self, llm, latency=None, status_code=200):
+        self.llm = llm
+        self.latency = latency or Latency()
+        self.status_code = status_code
+        self.calls = 0
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.calls += 1
+        time.sleep(self.latency.sample())
+        query = (json or {}).get("query", "")
+        endpoint = url.rstrip("/").rsplit("/", 1)[-1]
+        if endpoint == "chat":
+            payload = {"response": self.llm.output(types.SimpleNamespace(name="tailvy_chat"), query)}
+        else:
+            payload = {
+                field: self.llm.output(types.SimpleNamespace(name=field), query)
+                for field in ("destination_info", "accommodations", "transportation", "activities", "dining", "itinerary")
+            }
+        return _FakeResponse(self.status_code, payload)
+
+
+class FakeNominatim:
+    """Replacement for geopy's Nominatim geocoder."""
+
+    latency = Latency("fixed", 0.05)
+
+    def __init__(self, user_agent=None, **kwargs):
+        pass
+
+    def geocode(self, query, **kwargs):
+        time.sleep(self.latency.sample())
+        # Stable pseudo-coordinates inside India
+        seed = sum(map(ord, str(query)))
+        return types.SimpleNamespace(
+            address=str(query),
+            latitude=8 + (seed % 2700) / 100,
+            longitude=68 + (seed % 2900) / 100,
+        )
+
+
+class _FakeCollection:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def aggregate(self, pipeline):
+        time.sleep(self.latency.sample())
+        return [
+            {
+                "name": f"Attraction {i}",
+                "description": "Historic monument with gardens.",
+                "location": {"type": "Point", "coordinates": [78.04 + i / 100, 27.17 + i / 100]},
+                "distance": 500 * (i + 1),
+            }
+            for i in range(5)
+        ]
+
+    def count_documents(self, query):
+        return 5
+
+
+class FakeMongoClient:
+    """Replacement for pymongo.MongoClient returning canned attractions."""
+
+    latency = Latency("fixed", 0.02)
+
+    def __init__(self, uri=None, **kwargs):
+        pass
+
+    def __getitem__(self, name):
+        return self
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return _FakeCollection(self.latency)
+
+
+class FakeOpenAI:
+    """Replacement for openai.OpenAI (embeddings only, for the attraction search)."""
+
+    def __init__(self, api_key=None, **kwargs):
+        self.embeddings = self
+
+    def create(self, input=None, model=None, dimensions=256):
+        return types.SimpleNamespace(data=[types.SimpleNamespace(embedding=[0.0] * dimensions)])
+
+
+def _patch(module_name, attribute, value, originals):
+    """Replace module_name.attribute if the module is installed."""
+    try:
+        module = __import__(module_name, fromlist=[attribute])
+    except ImportError:
+        return
+    originals.append((module, attribute, getattr(module, attribute, None)))
+    setattr(module, attribute, value)
+
+
+@contextmanager
+def install(llm, tailvy=None):
+    """
+    Swap the fakes in for the duration of the block
+
+    Args:
+        llm (FakeLLM): Fake Gemini backend (becomes the travel module)
+        tailvy (FakeTailvy): Fake Tailvy API (replaces requests.post)
+    """
+    previous_travel = sys.modules.get("travel")
+    sys.modules["travel"] = llm.module()
+    originals = []
+    if tailvy is not None:
+        _patch("requests", "post", tailvy.post, originals)
+    _patch("geopy.geocoders", "Nominatim", FakeNominatim, originals)
+    _patch("pymongo", "MongoClient", FakeMongoClient, originals)
+    _patch("openai", "OpenAI", FakeOpenAI, originals)
+    try:
+        yield
+    finally:
+        for module, attribute, value in reversed(originals):
+            setattr(module, attribute, value)
+        if previous_travel is None:
+            sys.modules.pop("travel", None)
+        else:
+            sys.modules["travel"] = previous_travel
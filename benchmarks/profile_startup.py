@@ -0,0 +1,107 @@
+"""
+Profile what a cold start of app.py spends on imports.
+
+Runs app.py's module-level imports in a fresh interpreter under
+python -X importtime and reports, for each import statement, how long it
+took including everything it pulled in, plus the heaviest modules loaded
+overall. Imports that fail (a package not installed) are listed instead of
+aborting the profile.
+
+    python benchmarks/profile_startup.py
+    python benchmarks/profile_startup.py --top 30 -o startup.json
+
+Time to first paint in the running app is recorded by app.py itself as the
+"first_paint" stage (see the sidebar's pipeline metrics or /metrics).
+"""
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "app.py")
+
+# Prints one marker line per statement so importtime output can be split by statement
+_RUNNER = """
+import sys, time
+for index, statement in enumerate(STATEMENTS):
+    started = time.perf_counter()
+    try:
+        exec(statement, {})
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    print(repr((index, time.perf_counter() - started, error)), file=sys.stderr, flush=True)
+"""
+
+
+def top_level_imports(path=APP_PATH):
+    """Source of the import statements app.py runs at module level (including inside try blocks)."""
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    statements = []
+
+    def collect(body):
+        for node in body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                statements.append(ast.get_source_segment(source, node))
+            elif isinstance(node, ast.Try):
+                collect(node.body)
+
+    collect(ast.parse(source).body)
+    return statements
+
+
+def profile(statements):
+    """Run statements under -X importtime; returns (per-statement rows, per-module rows)."""
+    code = f"STATEMENTS = {statements!r}\n{_RUNNER}"
+    env = dict(os.environ, AGENTX_METRICS_PORT="0")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    rows = []
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if line.startswith("import time:"):
+            # "import time: self [us] | cumulative | imported package"
+            parts = [part.strip() for part in line[len("import time:"):].split("|")]
+            if parts[0].isdigit():
+                name = parts[2].strip()
+                modules[name] = max(modules.get(name, 0), int(parts[1]))
+        elif line.startswith("("):
+            index, seconds, error = ast.literal_eval(line)
+            rows.append({"statement": statements[index], "seconds": round(seconds, 4), "error": error})
+    heaviest = sorted(
+        ({"module": name, "cumulative_s": round(us / 1e6, 4)} for name, us in modules.items()),
+        key=lambda row: -row["cumulative_s"]
+    )
+    return rows, heaviest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="How many of the heaviest modules to list")
+    parser.add_argument("-o", "--output", help="Also write the profile to this JSON file")
+    args = parser.parse_args()
+
+    rows, heaviest = profile(top_level_imports())
+    total = sum(row["seconds"] for row in rows)
+    print(f"app.py module-level imports: {total:.3f}s")
+    for row in sorted(rows, key=lambda row: -row["seconds"]):
+        note = f"  ({row['error']})" if row["error"] else ""
+        print(f"  {row['seconds']:8.4f}s  {row['statement']}{note}")
+    print("Heaviest modules (cumulative):")
+    for row in heaviest[:args.top]:
+        print(f"  {row['cumulative_s']:8.4f}s  {row['module']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"total_s": round(total, 4), "statements": rows, "modules": heaviest[:args.top]}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
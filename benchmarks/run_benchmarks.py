@@ -0,0 +1,251 @@
+"""
+Benchmark the itinerary pipeline and the Streamlit script against fake backends.
+
+Gemini, Tailvy, Nominatim and MongoDB are replaced by the deterministic
+fakes in fakes.py, so a run costs no quota and does not depend on the
+network; only the orchestration around the calls is measured. Scenarios:
+
+    submit_3day_gemini / submit_30day_gemini / submit_3day_tailvy
+        End-to-end submit latency through the background job runner, with
+        empty caches every repetition
+    rerun_3day / rerun_30day / rerun_map / rerun_long_chat
+        Cost of one Streamlit script rerun with a finished itinerary (and a
+        long chat history) in the session, on the itinerary, map or chat
+        tab; needs streamlit installed
+
+Every scenario also reports peak Python memory (tracemalloc, measured on a
+separate run so it doesn't slow the timed ones). Results are JSON, tagged
+with the current commit, so two runs can be diffed:
+
+    python benchmarks/run_benchmarks.py -o before.json
+    git checkout my-branch
+    python benchmarks/run_benchmarks.py -o after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, "app.py")
+sys.path.insert(0, REPO_DIR)
+
+# Keep the benchmark away from the real caches, limits and metrics port;
+# these must be set before the app modules are imported
+os.environ.setdefault("AGENTX_CACHE_DIR", tempfile.mkdtemp(prefix="agentx-bench-"))
+os.environ.setdefault("AGENTX_GEMINI_RPM", "1000000")
+os.environ.setdefault("AGENTX_GEMINI_TPM", "1000000000")
+os.environ.setdefault("AGENTX_GEMINI_MAX_CONCURRENCY", "64")
+os.environ.setdefault("AGENTX_METRICS_PORT", "0")
+
+from fakes import FakeLLM, FakeTailvy, Latency, install  # noqa: E402
+
+GEMINI_KEY = "AIbenchmark-key"
+TAILVY_KEY = "tailvy-benchmark-key"
+LONG_CHAT_MESSAGES = 400
+
+
+def summarize(values):
+    """Min / median / p95 / max / mean of a list of seconds."""
+    ordered = sorted(values)
+    return {
+        "min": round(ordered[0], 4),
+        "median": round(statistics.median(ordered), 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4),
+        "max": round(ordered[-1], 4),
+        "mean": round(statistics.fmean(ordered), 4),
+    }
+
+
+def peak_memory(fn):
+    """Run fn once under tracemalloc and return its peak allocation in MiB."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / (1024 * 1024), 2)
+
+
+def reset_caches():
+    """Point every cache at a fresh directory so each run really calls the backends."""
+    import prewarm
+    import semantic_cache
+    import task_cache
+
+    directory = tempfile.mkdtemp(prefix="agentx-bench-", dir=os.environ["AGENTX_CACHE_DIR"])
+    task_cache._cache = task_cache.TaskCache(path=os.path.join(directory, "task_cache.sqlite3"))
+    semantic_cache._cache = semantic_cache.SemanticCache(path=os.path.join(directory, "semantic_cache.sqlite3"))
+    prewarm._store = prewarm.PrewarmStore(path=os.path.join(directory, "prewarm.sqlite3"))
+
+
+def trip(duration):
+    from pipeline import trip_to_user_input
+
+    return trip_to_user_input({
+        "origin": "Delhi",
+        "destination": "Varanasi",
+        "start_date": "2025-11-01",
+        "duration": duration,
+        "preferences": "Historical sites, Culture, Food",
+        "budget": "Mid-range",
+    })
+
+
+def bench_submit(llm, duration, tailvy_key, repeat):
+    """Time submit -> first itinerary chunk -> done through the job runner."""
+    from jobs import JobManager
+
+    manager = JobManager(max_workers=1)
+    user_input = trip(duration)
+
+    def submit_once():
+        reset_caches()
+        started = time.perf_counter()
+        job = manager.get(manager.submit(user_input, GEMINI_KEY, tailvy_api_key=tailvy_key))
+        first_chunk = None
+        while not job.finished:
+            if first_chunk is None and job.snapshot()["partial"]["itinerary"]:
+                first_chunk = time.perf_counter() - started
+            time.sleep(0.002)
+        total = time.perf_counter() - started
+        if job.status == "error":
+            raise RuntimeError(job.error)
+        return total, first_chunk if first_chunk is not None else total
+
+    calls_before = llm.calls
+    totals, first_chunks = [], []
+    for _ in range(repeat):
+        total, first_chunk = submit_once()
+        totals.append(total)
+        first_chunks.append(first_chunk)
+    return {
+        "submit_to_done_s": summarize(totals),
+        "submit_to_first_itinerary_chunk_s": summarize(first_chunks),
+        "llm_calls_per_submit": (llm.calls - calls_before) / repeat,
+        "peak_memory_mib": peak_memory(submit_once),
+    }
+
+
+def bench_rerun(llm, duration, chat_messages, repeat, tab="full_itinerary"):
+    """Time Streamlit script reruns with a finished itinerary in the session."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return {"skipped": "streamlit is not installed"}
+    from chat_store import ChatStore
+
+    user_input = trip(duration)
+    prompt = f"Duration: {duration} days"
+    step_results = {key: llm.output(SimpleNamespace(name=key), prompt)
+                    for key in ("destination_research", "accommodation", "transportation", "activities", "dining")}
+    itinerary = step_results["itinerary"] = llm.output(SimpleNamespace(name="itinerary"), prompt)
+    answer = llm.output(SimpleNamespace(name="chat"), "")
+    chat_store = ChatStore()
+    for i in range(chat_messages // 2):
+        chat_store.add_exchange(f"Question {i} about the trip?", answer, "10:00")
+
+    app = AppTest.from_file(APP_PATH, default_timeout=120)
+    app.session_state["gemini_api_key"] = GEMINI_KEY
+    app.session_state["generated_itinerary"] = itinerary
+    app.session_state["step_results"] = step_results
+    app.session_state["user_input"] = user_input
+    app.session_state["chat_store"] = chat_store
+    app.session_state["active_tab"] = tab
+
+    cold_started = time.perf_counter()
+    app.run()
+    cold = time.perf_counter() - cold_started
+    if app.exception:
+        return {"error": str(app.exception[0].message)}
+
+    reruns = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        app.run()
+        reruns.append(time.perf_counter() - started)
+    return {
+        "first_run_s": round(cold, 4),
+        "rerun_s": summarize(reruns),
+        "peak_memory_mib": peak_memory(app.run),
+    }
+
+
+SCENARIOS = {
+    "submit_3day_gemini": lambda llm, repeat: bench_submit(llm, 3, None, repeat),
+    "submit_30day_gemini": lambda llm, repeat: bench_submit(llm, 30, None, repeat),
+    "submit_3day_tailvy": lambda llm, repeat: bench_submit(llm, 3, TAILVY_KEY, repeat),
+    "rerun_3day": lambda llm, repeat: bench_rerun(llm, 3, 0, repeat),
+    "rerun_30day": lambda llm, repeat: bench_rerun(llm, 30, 0, repeat),
+    "rerun_map": lambda llm, repeat: bench_rerun(llm, 3, 0, repeat, tab="map_view"),
+    "rerun_long_chat": lambda llm, repeat: bench_rerun(llm, 3, LONG_CHAT_MESSAGES, repeat, tab="chat"),
+}
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline and app script against fake backends.")
+    parser.add_argument("-o", "--output", help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable; default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per scenario (default: 5)")
+    parser.add_argument("--latency", choices=("fixed", "uniform", "lognormal"), default="lognormal",
+                        help="Distribution of the fake time to first token (default: lognormal)")
+    parser.add_argument("--latency-mean", type=float, default=0.3, help="Median time to first token in seconds")
+    parser.add_argument("--latency-spread", type=float, default=0.5, help="Spread of the latency distribution")
+    parser.add_argument("--chunk-delay", type=float, default=0.002, help="Seconds between streamed chunks")
+    parser.add_argument("--base-chars", type=int, default=1500, help="Output size of every fake response")
+    parser.add_argument("--chars-per-day", type=int, default=600, help="Extra output per trip day")
+    parser.add_argument("--no-streaming", action="store_true", help="Fake a travel module without stream_task")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    llm = FakeLLM(
+        first_token=Latency(args.latency, args.latency_mean, args.latency_spread, seed=args.seed),
+        per_chunk=args.chunk_delay,
+        base_chars=args.base_chars,
+        chars_per_day=args.chars_per_day,
+        streaming=not args.no_streaming,
+    )
+    tailvy = FakeTailvy(llm, latency=Latency(args.latency, args.latency_mean, args.latency_spread, seed=args.seed + 1))
+
+    results = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "scenario")},
+        "scenarios": {},
+    }
+    with install(llm, tailvy):
+        for name in args.scenario or SCENARIOS:
+            print(f"running {name}...", file=sys.stderr)
+            results["scenarios"][name] = SCENARIOS[name](llm, max(1, args.repeat))
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""
+Bounded conversation history for the chat tab.
+
+The chat used to keep every message in st.session_state.messages, render
+all of them on every rerun and send the model no history at all. A
+ChatStore keeps:
+
+- the most recent messages (MAX_MESSAGES) for display, paged WINDOW at a
+  time so a rerun renders a fixed number of messages,
+- the last CONTEXT_TURNS exchanges verbatim for the prompt,
+- a rolling summary of everything older: each exchange that leaves the
+  verbatim window is folded into one line (the question and the most
+  factual lines of the answer, see compaction.compact_section) and the
+  oldest lines are dropped once the summary is over its token budget.
+
+Prompt size and render cost therefore stay constant however long the
+conversation runs.
+"""
+
+import os
+from collections import deque
+
+from compaction import compact_section, estimate_tokens
+
+WINDOW = int(os.environ.get("AGENTX_CHAT_WINDOW", 10))
+MAX_MESSAGES = int(os.environ.get("AGENTX_CHAT_MAX_MESSAGES", 200))
+CONTEXT_TURNS = int(os.environ.get("AGENTX_CHAT_CONTEXT_TURNS", 3))
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("AGENTX_CHAT_SUMMARY_TOKENS", 400))
+# Longest a single answer may be in the prompt, verbatim or summarized
+TURN_TOKEN_BUDGET = 300
+SUMMARY_LINE_TOKENS = 60
+
+
+class ChatStore:
+    """One session's conversation (see module docstring)."""
+
+    def __init__(self, max_messages=MAX_MESSAGES, context_turns=CONTEXT_TURNS,
+                 summary_token_budget=SUMMARY_TOKEN_BUDGET):
+        self.messages = deque(maxlen=max_messages)
+        self.total = 0
+        self.summary_token_budget = summary_token_budget
+        self._summary = deque()
+        self._recent = deque()
+        self._context_turns = context_turns
+
+    def __len__(self):
+        """Messages available for display (older ones live on in the summary only)."""
+        return len(self.messages)
+
+    def add_exchange(self, question, answer, time):
+        """
+        Record a question and its answer
+
+        Args:
+            question (str): What the user asked
+            answer (str): The assistant's reply
+            time (str): Display timestamp (e.g. "14:05")
+        """
+        self.messages.append({"text": question, "sender": "user", "time": time})
+        self.messages.append({"text": answer, "sender": "ai", "time": time})
+        self.total += 2
+        self._recent.append((question, answer))
+        while len(self._recent) > self._context_turns:
+            self._fold(*self._recent.popleft())
+
+    def _fold(self, question, answer):
+        gist = " / ".join(compact_section(answer, SUMMARY_LINE_TOKENS).splitlines())
+        self._summary.append(f"- Asked: {' '.join(question.split())} Answered: {gist}")
+        while len(self._summary) > 1 and estimate_tokens("\n".join(self._summary)) > self.summary_token_budget:
+            self._summary.popleft()
+
+    @property
+    def summary(self):
+        """Rolling summary of the exchanges no longer passed verbatim."""
+        return "\n".join(self._summary)
+
+    def context(self):
+        """
+        History to send with the next question
+
+        Returns:
+            tuple: (summary str, list of (question, answer) for the most
+            recent exchanges, answers trimmed to TURN_TOKEN_BUDGET)
+        """
+        recent = [(question, compact_section(answer, TURN_TOKEN_BUDGET)) for question, answer in self._recent]
+        return self.summary, recent
+
+    def page_count(self, size=WINDOW):
+        return max(1, -(-len(self.messages) // size))
+
+    def page(self, number=0, size=WINDOW):
+        """
+        Messages for one page of the history, newest first
+
+        Args:
+            number (int): 0 for the newest messages, 1 for the ones before...
+            size (int): Messages per page
+
+        Returns:
+            list: Message dicts with text, sender and time
+        """
+        end = len(self.messages) - number * size
+        start = max(0, end - size)
+        return [self.messages[i] for i in range(end - 1, start - 1, -1)]
@@ -0,0 +1,145 @@
+"""
+Token-budgeted compaction of the itinerary prompt.
+
+The final step receives the full output of all five research agents, which
+for long trips makes the prompt (and its latency and cost) balloon. Each
+section is measured and, when the total is over budget, trimmed down to
+the lines that carry facts the itinerary needs: headings, names, prices,
+timings and distances. Filler prose goes first.
+"""
+
+import math
+import os
+import re
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("AGENTX_ITINERARY_TOKEN_BUDGET", 6000))
+
+# Roughly four characters per token for English text with Gemini/GPT tokenizers
+CHARS_PER_TOKEN = 4
+
+_PRICE = re.compile(r"(₹|\brs\.?\s*\d|\binr\b|\$|\d+\s*(/-|k\b|lakh))", re.IGNORECASE)
+_TIME = re.compile(r"\b\d{1,2}(:\d{2})?\s*(am|pm|hrs?|hours?|mins?|minutes?)\b", re.IGNORECASE)
+_DISTANCE = re.compile(r"\b\d+(\.\d+)?\s*(km|kms|kilometers?|m)\b", re.IGNORECASE)
+_HEADING = re.compile(r"^\s*(#+\s|\*\*[^*]+\*\*\s*:?\s*$|[A-Z][A-Za-z /&]+:\s*$)")
+_PROPER_NAME = re.compile(r"\b[A-Z][a-z]+(\s+[A-Z][a-z]+)+\b")
+
+
+def estimate_tokens(text):
+    """Estimate the token count of a string."""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def _line_score(line):
+    score = 0
+    if _HEADING.match(line):
+        score += 4
+    if _PRICE.search(line):
+        score += 3
+    if _TIME.search(line) or _DISTANCE.search(line):
+        score += 2
+    if _PROPER_NAME.search(line):
+        score += 2
+    if re.search(r"\d", line):
+        score += 1
+    return score
+
+
+def _truncate(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+    # Leave room for the " …" marker
+    cut = text[:max_chars - 2]
+    # Prefer ending on a sentence or clause boundary
+    boundary = max(cut.rfind(". "), cut.rfind("; "), cut.rfind(", "))
+    if boundary > max_chars // 2:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + " …"
+
+
+def compact_section(text, token_budget):
+    """
+    Trim one agent output to a token budget, keeping its most factual lines
+
+    Args:
+        text (str): The agent output
+        token_budget (int): Maximum tokens for this section
+
+    Returns:
+        str: The compacted section, with lines kept in their original order
+    """
+    text = str(text or "")
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    # Drop blank and repeated lines (agents often restate the same point)
+    lines = list(dict.fromkeys(line for line in lines if line))
+    compacted = "\n".join(lines)
+    if estimate_tokens(compacted) <= token_budget:
+        return compacted
+
+    max_chars = token_budget * CHARS_PER_TOKEN
+    # Highest-scoring lines first, earlier lines winning ties
+    ranked = sorted(range(len(lines)), key=lambda i: (-_line_score(lines[i]), i))
+    kept = {}
+    used = 0
+    for i in ranked:
+        remaining = max_chars - used
+        if remaining < 40:
+            break
+        line = _truncate(lines[i], remaining)
+        kept[i] = line
+        used += len(line) + 1
+    return "\n".join(kept[i] for i in sorted(kept))
+
+
+def allocate_budget(sizes, token_budget):
+    """
+    Split a token budget across sections, giving small sections all they need
+
+    Args:
+        sizes (dict): Section name -> token count
+        token_budget (int): Total tokens available
+
+    Returns:
+        dict: Section name -> token allowance
+    """
+    allowance = {}
+    pending = dict(sizes)
+    remaining = token_budget
+    # Water-filling: sections under the fair share keep their full size and
+    # hand the rest of their share to the larger ones
+    while pending:
+        share = remaining // len(pending)
+        small = {name: size for name, size in pending.items() if size <= share}
+        if not small:
+            for name in pending:
+                allowance[name] = share
+            break
+        for name, size in small.items():
+            allowance[name] = size
+            remaining -= size
+            del pending[name]
+    return allowance
+
+
+def compact_sections(sections, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Fit a set of named sections into a total token budget
+
+    Args:
+        sections (dict): Section name -> text, in prompt order
+        token_budget (int): Total tokens available for all sections
+
+    Returns:
+        tuple: (compacted sections dict, stats dict with original and
+        compacted token counts per section and in total)
+    """
+    sizes = {name: estimate_tokens(text) for name, text in sections.items()}
+    allowance = allocate_budget(sizes, token_budget)
+    compacted = {name: compact_section(text, allowance[name]) for name, text in sections.items()}
+    compacted_sizes = {name: estimate_tokens(text) for name, text in compacted.items()}
+    stats = {
+        "original_tokens": sum(sizes.values()),
+        "compacted_tokens": sum(compacted_sizes.values()),
+        "budget": token_budget,
+        "sections": {name: (sizes[name], compacted_sizes[name]) for name in sections},
+    }
+    return compacted, stats
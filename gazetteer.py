@@ -0,0 +1,189 @@
+"""
+Offline gazetteer of Indian cities, towns and landmarks.
+
+The bundled data/india_places.csv (name, kind, state, coordinates and
+aliases such as Bombay -> Mumbai or Benares -> Varanasi) is loaded once
+into parallel arrays plus a prefix trie over the normalized names and
+aliases. Lookups are exact, by alias, or typo-tolerant (bounded edit
+distance searched over the trie), and need no network. The geocoder
+consults exact and alias matches before Nominatim; typo matches are only
+offered to the user as suggestions by the travel form, since a real place
+one or two letters away from another (Mandi, Mandu) would otherwise be
+silently swapped.
+"""
+
+import csv
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from collections import namedtuple
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "india_places.csv")
+
+Place = namedtuple("Place", ["name", "kind", "state", "latitude", "longitude"])
+
+# Cities are the likeliest answer when several places match
+_KIND_RANK = {"city": 0, "state": 1, "town": 2, "landmark": 3}
+
+
+def normalize_place(text):
+    """Lowercase, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.sub(r"[^a-z0-9 ]", " ", text.lower()).split())
+
+
+def max_typos(key):
+    """Edits tolerated for a query of this length (short names must match exactly)."""
+    if len(key) <= 4:
+        return 0
+    return 1 if len(key) <= 8 else 2
+
+
+class Gazetteer:
+    """Array-backed place index with a prefix trie (see module docstring)."""
+
+    def __init__(self, path=DATA_PATH):
+        self.names = []
+        self.kinds = []
+        self.states = []
+        self.latitudes = array("d")
+        self.longitudes = array("d")
+        # Trie nodes as parallel lists: child maps and the places ending there
+        self._children = [{}]
+        self._terminals = [()]
+        with open(path, encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                index = len(self.names)
+                self.names.append(row["name"])
+                self.kinds.append(row["kind"])
+                self.states.append(row["state"])
+                self.latitudes.append(float(row["latitude"]))
+                self.longitudes.append(float(row["longitude"]))
+                for key in [row["name"]] + [alias for alias in row["aliases"].split("|") if alias]:
+                    self._insert(normalize_place(key), index)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _insert(self, key, index):
+        node = 0
+        for char in key:
+            child = self._children[node].get(char)
+            if child is None:
+                child = len(self._children)
+                self._children[node][char] = child
+                self._children.append({})
+                self._terminals.append(())
+            node = child
+        if index not in self._terminals[node]:
+            self._terminals[node] += (index,)
+
+    def _node(self, key):
+        node = 0
+        for char in key:
+            node = self._children[node].get(char)
+            if node is None:
+                return None
+        return node
+
+    def place(self, index):
+        return Place(self.names[index], self.kinds[index], self.states[index],
+                     self.latitudes[index], self.longitudes[index])
+
+    def _rank(self, index):
+        return _KIND_RANK.get(self.kinds[index], len(_KIND_RANK)), index
+
+    def _fuzzy(self, key, max_distance):
+        """(distance, index) for every name within max_distance edits of key."""
+        matches = {}
+        first_row = list(range(len(key) + 1))
+
+        def walk(node, char, previous_row):
+            row = [previous_row[0] + 1]
+            for column in range(1, len(key) + 1):
+                row.append(min(
+                    row[column - 1] + 1,
+                    previous_row[column] + 1,
+                    previous_row[column - 1] + (key[column - 1] != char),
+                ))
+            if row[-1] <= max_distance:
+                for index in self._terminals[node]:
+                    matches[index] = min(matches.get(index, row[-1]), row[-1])
+            if min(row) <= max_distance:
+                for next_char, child in self._children[node].items():
+                    walk(child, next_char, row)
+
+        for char, child in self._children[0].items():
+            walk(child, char, first_row)
+        return sorted((distance, index) for index, distance in matches.items())
+
+    def lookup(self, query, fuzzy=True):
+        """
+        Find a place by name, alias or a slightly misspelled name
+
+        Args:
+            query (str): Place name as typed (e.g. "Bombay", "Varansi")
+            fuzzy (bool): Also accept misspellings; False for exact and
+                alias matches only
+
+        Returns:
+            Place: The best match, or None
+        """
+        key = normalize_place(query)
+        if not key:
+            return None
+        node = self._node(key)
+        if node is not None and self._terminals[node]:
+            return self.place(min(self._terminals[node], key=self._rank))
+        if not fuzzy:
+            return None
+        matches = self._fuzzy(key, max_typos(key))
+        if not matches:
+            return None
+        best = matches[0][0]
+        return self.place(min((index for distance, index in matches if distance == best), key=self._rank))
+
+    def suggest(self, text, limit=5):
+        """
+        Places for autocompleting a partly typed name
+
+        Prefix matches come first; if there are none, close misspellings.
+
+        Args:
+            text (str): What the user has typed so far
+            limit (int): Most suggestions to return
+
+        Returns:
+            list: Place tuples, best first
+        """
+        key = normalize_place(text)
+        if not key:
+            return []
+        found = set()
+        node = self._node(key)
+        if node is not None:
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                found.update(self._terminals[current])
+                stack.extend(self._children[current].values())
+        if found:
+            ordered = sorted(found, key=self._rank)
+        else:
+            ordered = [index for _, index in self._fuzzy(key, max(1, max_typos(key)))]
+        return [self.place(index) for index in ordered[:limit]]
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Return the process-wide gazetteer, loading it on first use."""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer()
+        return _gazetteer
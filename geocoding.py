@@ -0,0 +1,230 @@
+"""
+Shared, cached and rate-limited geocoding.
+
+Nominatim's usage policy allows at most one request per second per
+application, and the Map tab used to geocode the destination on every
+rerun. All lookups now go through one process-wide Geocoder:
+
+- the offline gazetteer of Indian places first (exact names and aliases
+  only, no network at all),
+- an in-memory LRU in front of a SQLite store, so a place is looked up
+  over the network once, across reruns, sessions and restarts,
+- negative caching, so unknown places are not retried on every rerun,
+- a single worker thread that sends queued requests in order at most once
+  per second, sharing one request between callers asking for the same
+  place at the same time,
+- geocode_many for resolving a list of places in one go.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import Future
+
+from gazetteer import get_gazetteer
+from metrics import track
+from task_cache import CACHE_DIR, normalize_text
+
+USER_AGENT = os.environ.get("AGENTX_NOMINATIM_USER_AGENT", "travel_app")
+MIN_INTERVAL = float(os.environ.get("AGENTX_GEOCODE_MIN_INTERVAL", 1.0))
+POSITIVE_TTL = int(os.environ.get("AGENTX_GEOCODE_TTL", 90 * 24 * 3600))
+NEGATIVE_TTL = int(os.environ.get("AGENTX_GEOCODE_NEGATIVE_TTL", 24 * 3600))
+LRU_SIZE = 1024
+REQUEST_TIMEOUT = 10
+
+Location = namedtuple("Location", ["address", "latitude", "longitude"])
+
+# Marks a cached "no such place" answer
+_NOT_FOUND = object()
+
+
+class Geocoder:
+    """Process-wide geocoding service (see module docstring)."""
+
+    def __init__(self, path=None, min_interval=MIN_INTERVAL, backend=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "geocode.sqlite3")
+        self.min_interval = min_interval
+        self._backend = backend
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS geocodes (
+                query TEXT PRIMARY KEY,
+                address TEXT,
+                latitude REAL,
+                longitude REAL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._worker = None
+        self._last_request = 0.0
+        self.gazetteer_hits = 0
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+
+    def _nominatim(self):
+        if self._backend is None:
+            from geopy.geocoders import Nominatim
+
+            self._backend = Nominatim(user_agent=USER_AGENT, timeout=REQUEST_TIMEOUT)
+        return self._backend
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > LRU_SIZE:
+            self._lru.popitem(last=False)
+
+    def _cached(self, key):
+        """Cached answer for a normalized query: Location, _NOT_FOUND or None if unknown."""
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            return self._lru[key]
+        row = self._conn.execute(
+            "SELECT address, latitude, longitude, created_at FROM geocodes WHERE query = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        address, latitude, longitude, created_at = row
+        found = latitude is not None
+        if time.time() - created_at > (POSITIVE_TTL if found else NEGATIVE_TTL):
+            return None
+        value = Location(address, latitude, longitude) if found else _NOT_FOUND
+        self._remember(key, value)
+        return value
+
+    def _store(self, key, location):
+        with self._lock:
+            self._remember(key, location or _NOT_FOUND)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO geocodes (query, address, latitude, longitude, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, location.address if location else None, location.latitude if location else None,
+                 location.longitude if location else None, time.time())
+            )
+            self._conn.commit()
+
+    def _run(self):
+        while True:
+            key, query = self._queue.get()
+            wait = self._last_request + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                with track("geocode", "nominatim"):
+                    result = self._nominatim().geocode(query)
+                location = Location(result.address, result.latitude, result.longitude) if result else None
+                self._store(key, location)
+                error = None
+            except Exception as e:
+                # Network and service errors are not cached; the next rerun retries
+                location, error = None, e
+            finally:
+                self._last_request = time.monotonic()
+                self.requests += 1
+            with self._lock:
+                future = self._pending.pop(key)
+            if error is None:
+                future.set_result(location)
+            else:
+                future.set_exception(error)
+
+    def _submit(self, query):
+        """Gazetteer or cached result, or a Future for the network lookup (queued once per place)."""
+        # Only exact and alias matches: a typo match may be a different real place
+        place = get_gazetteer().lookup(query, fuzzy=False)
+        if place is not None:
+            with self._lock:
+                self.gazetteer_hits += 1
+            return Location(f"{place.name}, {place.state}, India", place.latitude, place.longitude)
+        key = normalize_text(query)
+        with self._lock:
+            cached = self._cached(key)
+            if cached is not None:
+                self.hits += 1
+                return None if cached is _NOT_FOUND else cached
+            self.misses += 1
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="agentx-geocoder", daemon=True)
+                    self._worker.start()
+                self._queue.put((key, query))
+            return future
+
+    def geocode(self, query, timeout=None):
+        """
+        Look up the coordinates of a place
+
+        Args:
+            query (str): Place name (e.g. "Agra")
+            timeout (float): Longest to wait in the queue and for the
+                request, in seconds (None waits as long as needed)
+
+        Returns:
+            Location: address, latitude and longitude, or None if the place
+            is unknown
+
+        Raises:
+            Exception: The geocoder's error if the lookup failed (e.g. a timeout)
+        """
+        if not query or not str(query).strip():
+            return None
+        result = self._submit(str(query).strip())
+        return result.result(timeout) if isinstance(result, Future) else result
+
+    def geocode_many(self, queries, timeout=None):
+        """
+        Look up several places, queueing all network lookups at once
+
+        Args:
+            queries (iterable): Place names
+            timeout (float): Longest to wait for each lookup, in seconds
+
+        Returns:
+            dict: Query -> Location, or None for unknown places and failed
+            lookups
+        """
+        submitted = {query: self._submit(str(query).strip()) for query in queries if query and str(query).strip()}
+        results = {}
+        for query, result in submitted.items():
+            if isinstance(result, Future):
+                try:
+                    result = result.result(timeout)
+                except Exception:
+                    result = None
+            results[query] = result
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "gazetteer_hits": self.gazetteer_hits,
+                "hits": self.hits,
+                "misses": self.misses,
+                "requests": self.requests,
+                "queued": self._queue.qsize(),
+            }
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    """Return the process-wide geocoder, creating it on first use."""
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            _geocoder = Geocoder()
+        return _geocoder
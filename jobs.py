@@ -0,0 +1,203 @@
+"""
+Background job runner for itinerary generation.
+
+Streamlit reruns the whole script on every widget interaction, which used
+to abandon a pipeline running inside the script thread. Submissions now
+become jobs that run on a process-wide worker pool; the UI only keeps the
+job ID and polls the job for partial results, so reruns (and other
+sessions) never interrupt the work.
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import PROGRESS_STATES, RESEARCH_STEPS, run_pipeline
+
+MAX_WORKERS = int(os.environ.get("AGENTX_JOB_WORKERS", 4))
+# Finished jobs are kept around this long so the UI can collect them
+JOB_RETENTION = int(os.environ.get("AGENTX_JOB_RETENTION", 3600))
+
+STEP_KEYS = [key for key, _, _, _ in RESEARCH_STEPS] + ["itinerary"]
+
+
+class Job:
+    """State of one itinerary generation, updated by the worker as it runs."""
+
+    def __init__(self, user_input):
+        self.id = uuid.uuid4().hex
+        self.user_input = dict(user_input)
+        self.status = "queued"  # queued -> running -> done | error
+        self.step_status = {key: "pending" for key in STEP_KEYS}
+        self.partial = {key: "" for key in STEP_KEYS}
+        # Latest model call progress per step: state plus its info (model, tokens, timings)
+        self.progress = {}
+        # Steps showing a speculative draft, and those whose next chunk replaces it
+        self.drafts = set()
+        self._superseded = set()
+        self.step_results = {}
+        self.itinerary = None
+        self.tailvy_used = False
+        self.reused_steps = set()
+        self.fingerprints = {}
+        self.messages = []
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def on_event(self, step, kind, text):
+        """Pipeline progress callback (see pipeline.run_pipeline)."""
+        with self._lock:
+            if kind in PROGRESS_STATES:
+                self.step_status[step] = "queued" if kind == "queued" else "running"
+                self.progress[step] = dict(text, state=kind)
+            elif kind == "chunk":
+                self.step_status[step] = "running"
+                if step in self._superseded:
+                    # The final pass is replacing the draft
+                    self._superseded.discard(step)
+                    self.partial[step] = text
+                else:
+                    self.partial[step] += text
+            elif kind == "draft":
+                self.partial[step] = text
+                self.drafts.add(step)
+                self._superseded.add(step)
+            elif kind == "reset":
+                # An abandoned draft or rejected routed answer: drop its chunks
+                self.partial[step] = ""
+                self.drafts.discard(step)
+                self._superseded.discard(step)
+            else:
+                self.step_status[step] = kind
+                self.partial[step] = text
+                if step == "itinerary":
+                    self.itinerary = text
+                else:
+                    self.step_results[step] = text
+
+    def notify(self, level, message):
+        """Collect user-facing warnings raised while the job runs."""
+        with self._lock:
+            self.messages.append((level, message))
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error")
+
+    def snapshot(self):
+        """
+        Copy the job state for rendering
+
+        Returns:
+            dict: A consistent copy of the job's public fields
+        """
+        with self._lock:
+            return {
+                "id": self.id,
+                "user_input": dict(self.user_input),
+                "status": self.status,
+                "step_status": dict(self.step_status),
+                "partial": dict(self.partial),
+                "progress": {step: dict(info) for step, info in self.progress.items()},
+                "drafts": set(self.drafts),
+                "step_results": dict(self.step_results),
+                "itinerary": self.itinerary,
+                "tailvy_used": self.tailvy_used,
+                "reused_steps": set(self.reused_steps),
+                "fingerprints": dict(self.fingerprints),
+                "messages": list(self.messages),
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """Process-wide registry of jobs and the worker pool that runs them."""
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agentx-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_input, gemini_api_key, tailvy_api_key=None, previous=None):
+        """
+        Queue an itinerary generation
+
+        Args:
+            user_input (dict): Trip details from the travel form
+            gemini_api_key (str): Gemini API key
+            tailvy_api_key (str): Optional Tailvy API key
+            previous (dict): Results, fingerprints and tailvy_used of the
+                session's last run, so unchanged tasks are not run again
+
+        Returns:
+            str: The job ID
+        """
+        job = Job(user_input)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        # API keys only live in the worker's closure, never on the job
+        self._executor.submit(self._run, job, gemini_api_key, tailvy_api_key, previous)
+        return job.id
+
+    def get(self, job_id):
+        """Return the job with this ID, or None if unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, gemini_api_key, tailvy_api_key, previous):
+        job.status = "running"
+        try:
+            result = run_pipeline(
+                job.user_input,
+                gemini_api_key,
+                tailvy_api_key=tailvy_api_key,
+                on_event=job.on_event,
+                notify=job.notify,
+                previous=previous
+            )
+            with job._lock:
+                job.step_results = result["step_results"]
+                job.itinerary = result["itinerary"]
+                job.tailvy_used = result["tailvy_used"]
+                job.reused_steps = result["reused_steps"]
+                job.fingerprints = result["fingerprints"]
+                job.finished_at = time.time()
+                job.status = "done"
+        except Exception as e:
+            with job._lock:
+                job.error = str(e)
+                job.finished_at = time.time()
+                job.status = "error"
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [j.id for j in self._jobs.values() if j.finished and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        """Return the number of jobs in each status."""
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "error": 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """Return the process-wide job manager, creating it on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
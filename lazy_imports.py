@@ -0,0 +1,67 @@
+"""
+Cheap availability probes and on-demand imports for optional integrations.
+
+pymongo, openai, pydeck, pandas, requests and the travel module's
+LangChain/Gemini stack each take from tens of milliseconds to seconds to
+import. Importing them at the top of app.py made the first page load after
+a deploy wait for all of them, even though most sessions never use MongoDB
+search or open the map.
+
+available() only asks the import system whether a module could be found
+(importlib.util.find_spec), without executing it. load() imports the
+module when a feature first needs it and records how long that took as the
+"import" stage in metrics.py, so the sidebar metrics panel and /metrics
+show which integrations were loaded and what they cost.
+"""
+
+import importlib
+import importlib.util
+import sys
+import threading
+
+from metrics import track
+
+_probes = {}
+_lock = threading.Lock()
+
+
+def available(*modules):
+    """
+    Check that modules are installed without importing them
+
+    Args:
+        *modules (str): Top-level module names (e.g. "pymongo", "bson")
+
+    Returns:
+        bool: True if every module can be imported
+    """
+    with _lock:
+        for name in modules:
+            if name not in _probes:
+                try:
+                    _probes[name] = name in sys.modules or importlib.util.find_spec(name) is not None
+                except (ImportError, ValueError):
+                    _probes[name] = False
+            if not _probes[name]:
+                return False
+        return True
+
+
+def load(name):
+    """
+    Import a module on first use, timing the import
+
+    Args:
+        name (str): Module name (e.g. "pydeck", "geopy.geocoders")
+
+    Returns:
+        module: The imported module
+
+    Raises:
+        ImportError: If the module is not installed
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with track("import", name):
+        return importlib.import_module(name)
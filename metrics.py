@@ -0,0 +1,254 @@
+"""
+Per-stage latency, token and error metrics for the agent pipeline.
+
+Stages are the individual agent tasks, the Tailvy endpoints, MongoDB geo
+search and geocoding, each labelled with the backend that served it.
+Metrics are kept in-process, exported in Prometheus text format on a
+small local HTTP endpoint (AGENTX_METRICS_PORT, default 9464) and
+summarized for the admin panel in the sidebar.
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.environ.get("AGENTX_METRICS_PORT", 9464))
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# Recent samples kept per series for the admin panel's percentiles
+RECENT_SAMPLES = 500
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, plus recent samples for percentiles."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {
+                    "buckets": [0] * len(self.buckets),
+                    "count": 0,
+                    "sum": 0.0,
+                    "recent": deque(maxlen=RECENT_SAMPLES),
+                }
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["buckets"][index] += 1
+            series["count"] += 1
+            series["sum"] += value
+            series["recent"].append(value)
+
+    def percentiles(self, labels, quantiles=(0.5, 0.95)):
+        with self._lock:
+            samples = sorted(self.series.get(labels, {}).get("recent", ()))
+        if not samples:
+            return [None for _ in quantiles]
+        return [samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.label_names + ("le",)
+        with self._lock:
+            for labels, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + ('+Inf',))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {series['count']}")
+        return lines
+
+
+stage_latency = Histogram(
+    "agentx_stage_latency_seconds", "Latency of pipeline stages.", ("stage", "backend")
+)
+stage_tokens = Counter(
+    "agentx_stage_tokens_total", "Estimated tokens sent to / received from each stage.", ("stage", "direction")
+)
+stage_errors = Counter(
+    "agentx_stage_errors_total", "Failed calls per stage.", ("stage", "backend")
+)
+fallbacks = Counter(
+    "agentx_fallbacks_total", "Requests that fell back from one backend to another.", ("stage", "from_backend", "to_backend")
+)
+cache_lookups = Counter(
+    "agentx_cache_lookups_total", "Cache lookups by outcome.", ("cache", "outcome")
+)
+ALL_METRICS = (stage_latency, stage_tokens, stage_errors, fallbacks, cache_lookups)
+
+
+@contextmanager
+def track(stage, backend):
+    """
+    Time a stage and count it as an error if it raises
+
+    Args:
+        stage (str): Stage name (e.g. "dining", "tailvy_travel", "geocode")
+        backend (str): Backend serving the stage (e.g. "gemini", "nominatim")
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        if isinstance(e, Exception):
+            stage_errors.inc((stage, backend))
+        raise
+    finally:
+        stage_latency.observe((stage, backend), time.perf_counter() - started)
+
+
+def observe(stage, backend, seconds):
+    """Record a duration measured by the caller (e.g. a whole script rerun)."""
+    stage_latency.observe((stage, backend), seconds)
+
+
+def record_error(stage, backend):
+    """Count a failure that was handled without raising (e.g. a None result)."""
+    stage_errors.inc((stage, backend))
+
+
+def record_tokens(stage, input_tokens=0, output_tokens=0):
+    """Add a call's token counts for a stage."""
+    if input_tokens:
+        stage_tokens.inc((stage, "input"), input_tokens)
+    if output_tokens:
+        stage_tokens.inc((stage, "output"), output_tokens)
+
+
+def record_fallback(stage, from_backend, to_backend):
+    """Count a request that fell back to another backend."""
+    fallbacks.inc((stage, from_backend, to_backend))
+
+
+def record_lookup(cache, outcome):
+    """Count a cache lookup ("hit" or "miss")."""
+    cache_lookups.inc((cache, outcome))
+
+
+def render_prometheus():
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def summary():
+    """
+    Summarize every stage for the admin panel
+
+    Returns:
+        list: One dict per (stage, backend) with calls, errors, p50/p95
+        latency in seconds and token totals, slowest p95 first
+    """
+    rows = []
+    with stage_latency._lock:
+        series = {labels: data["count"] for labels, data in stage_latency.series.items()}
+    for (stage, backend), count in series.items():
+        p50, p95 = stage_latency.percentiles((stage, backend))
+        rows.append({
+            "stage": stage,
+            "backend": backend,
+            "calls": count,
+            "errors": stage_errors.values.get((stage, backend), 0),
+            "p50_s": round(p50, 3),
+            "p95_s": round(p95, 3),
+            "input_tokens": stage_tokens.values.get((stage, "input"), 0),
+            "output_tokens": stage_tokens.values.get((stage, "output"), 0),
+        })
+    return sorted(rows, key=lambda row: row["p95_s"], reverse=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would drown the app log
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """
+    Serve /metrics from a background thread (once per process)
+
+    Args:
+        port (int): Port to listen on (0 disables the endpoint)
+        host (str): Interface to bind
+
+    Returns:
+        bool: True if the endpoint is running in this process
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return True
+        if not port:
+            return False
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+            return False
+        threading.Thread(target=_server.serve_forever, name="agentx-metrics", daemon=True).start()
+        return True
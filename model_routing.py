@@ -0,0 +1,111 @@
+"""
+Per-task model routing with quality-checked escalation.
+
+Not every agent needs the largest Gemini model: dining suggestions or chat
+small talk come back just as well (and much faster) from a flash model.
+Each task names a primary and an optional fallback model. When the
+primary's output fails the task's checks (too short, missing its
+structured record, ...), the call is escalated to the fallback model.
+
+Routing only applies if travel.run_task / travel.stream_task accept a
+model argument; otherwise every task keeps running on the default model.
+"""
+
+import inspect
+import logging
+import os
+
+from schemas import STEP_SCHEMAS, extract_record
+
+logger = logging.getLogger(__name__)
+
+FAST_MODEL = os.environ.get("AGENTX_FAST_MODEL", "gemini-1.5-flash")
+LARGE_MODEL = os.environ.get("AGENTX_LARGE_MODEL", "gemini-1.5-pro")
+
+# task name -> (primary model, fallback model or None)
+MODEL_ROUTES = {
+    "destination_research": (FAST_MODEL, LARGE_MODEL),
+    "accommodation": (FAST_MODEL, LARGE_MODEL),
+    "transportation": (FAST_MODEL, LARGE_MODEL),
+    "activities": (FAST_MODEL, LARGE_MODEL),
+    "dining": (FAST_MODEL, LARGE_MODEL),
+    "chat": (FAST_MODEL, LARGE_MODEL),
+    # The itinerary is the product; it always gets the large model
+    "itinerary": (LARGE_MODEL, None),
+    # Speculative drafts only need to be quick (see pipeline.run_pipeline)
+    "itinerary_draft": (FAST_MODEL, None),
+}
+
+# Shortest output that can be a real answer, per task
+MIN_OUTPUT_CHARS = {
+    "chat": 20,
+    "itinerary": 400,
+    "itinerary_draft": 400,
+}
+DEFAULT_MIN_OUTPUT_CHARS = 200
+
+# Tasks whose checks are settled by the opening of the answer: once this
+# many characters pass, a primary model's answer is accepted and the rest
+# streams as it arrives (tasks with a JSON record need the whole output)
+RELEASE_AFTER_CHARS = {
+    "chat": 300,
+}
+
+_REFUSALS = ("i cannot help", "i can't help", "i'm unable to", "as an ai language model")
+
+
+def accepts_model(fn):
+    """
+    Check whether a task runner takes a model argument
+
+    Args:
+        fn (callable): travel.run_task or travel.stream_task
+
+    Returns:
+        bool: True if fn(..., model=...) is accepted
+    """
+    try:
+        parameters = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == "model" or p.kind is inspect.Parameter.VAR_KEYWORD for p in parameters)
+
+
+def models_for(task_name, routing_enabled=True):
+    """
+    Models to try for a task, in order
+
+    Args:
+        task_name (str): Stable name of the task (e.g. "dining")
+        routing_enabled (bool): Whether the task runner accepts a model
+
+    Returns:
+        list: Model names, or [None] to use the runner's default model
+    """
+    if not routing_enabled:
+        return [None]
+    primary, fallback = MODEL_ROUTES.get(task_name, (LARGE_MODEL, None))
+    return [primary] + ([fallback] if fallback and fallback != primary else [])
+
+
+def check_output(task_name, text):
+    """
+    Validation hook run on a model's output before it is accepted
+
+    Args:
+        task_name (str): Stable name of the task
+        text (str): The model's full output
+
+    Returns:
+        list: Problems found (empty if the output is acceptable)
+    """
+    text = (text or "").strip()
+    problems = []
+    min_chars = MIN_OUTPUT_CHARS.get(task_name, DEFAULT_MIN_OUTPUT_CHARS)
+    if len(text) < min_chars:
+        problems.append(f"too short ({len(text)} < {min_chars} chars)")
+    if any(marker in text[:300].lower() for marker in _REFUSALS):
+        problems.append("looks like a refusal")
+    if task_name in STEP_SCHEMAS and extract_record(task_name, text) is None:
+        problems.append("no valid JSON record")
+    return problems
@@ -0,0 +1,1264 @@
+"""
+Agent pipeline helpers for AgentX-Travel India.
+
+The five research agents (destination, accommodation, transportation,
+activities and dining) only depend on the trip request, never on each
+other, so they are fanned out to a thread pool and joined before the
+final itinerary step. run_pipeline ties this together with the Tailvy
+shortcut so the whole generation can run outside the Streamlit script.
+
+Nothing in this module touches Streamlit: worker threads have no script
+context, so all UI updates stay with the caller.
+"""
+
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from compaction import CHARS_PER_TOKEN, DEFAULT_TOKEN_BUDGET, compact_sections, estimate_tokens
+from metrics import record_error, record_fallback, record_tokens, track
+from lazy_imports import load
+from model_routing import RELEASE_AFTER_CHARS, accepts_model, check_output, models_for
+from prewarm import get_prewarm_store
+from rate_limiter import get_rate_limiter
+from schemas import (
+    STEP_SCHEMAS, SchemaError, compact_record, describe_record, extract_record, record_block,
+    schema_instructions, strip_record, validate_record
+)
+from semantic_cache import get_semantic_cache
+from singleflight import LeaderAbandoned, SingleFlight
+from task_cache import get_cache, make_key
+
+logger = logging.getLogger(__name__)
+
+TravelRunners = namedtuple("TravelRunners", ["module", "stream_task", "model_routing"])
+
+# Output size assumed when reserving tokens-per-minute budget for a call
+EXPECTED_OUTPUT_TOKENS = 1500
+
+# Model travel.py's runners are assumed to use when they take no model
+# argument and a task's agent doesn't name one (only used in cache keys)
+DEFAULT_MODEL = os.environ.get("AGENTX_GEMINI_MODEL", "gemini")
+
+# Progress of a single model call, reported as on_progress(state, info):
+# "queued" while it waits for a rate limiter slot, "sent" once the request
+# is out, "first_token" when output starts arriving and "completed" with
+# the call's token counts. info always has the "model" (or "tailvy");
+# "queued" and "sent" add input_tokens (sent also waited_s, the time spent
+# queued), "first_token" has seconds since sent and "completed" has
+# input_tokens, output_tokens and seconds.
+PROGRESS_STATES = ("queued", "sent", "first_token", "completed")
+
+# Trip lengths accepted, in days (the travel form's limits)
+MIN_DURATION = 1
+MAX_DURATION = 30
+
+# Step events that finish a step (everything else is progress)
+FINAL_KINDS = ("done", "reused", "kept", "prewarmed")
+
+# Draft the itinerary once this many research steps are in, while the rest
+# are still running (AGENTX_SPECULATIVE_DRAFTS=0 turns drafting off)
+SPECULATIVE_DRAFTS = os.environ.get("AGENTX_SPECULATIVE_DRAFTS", "1") != "0"
+SPECULATIVE_MIN_STEPS = int(os.environ.get("AGENTX_SPECULATIVE_MIN_STEPS", 3))
+# A late step counts as material when the draft mentions less than this
+# share of the places it names
+DRAFT_COVERAGE_THRESHOLD = 0.5
+_PROPER_NAME = re.compile(r"\b[A-Z][a-z]+(\s+[A-Z][a-z]+)+\b")
+
+# Identical requests in flight at the same time are sent only once
+task_flight = SingleFlight("run_task")
+tailvy_flight = SingleFlight("tailvy")
+
+_runners = None
+_runners_lock = threading.Lock()
+
+# Research steps in display order: (step_results key, travel task name, status label, section title)
+RESEARCH_STEPS = [
+    ("destination_research", "destination_research_task", "Researching destination...", "Destination Research"),
+    ("accommodation", "accommodation_task", "Finding accommodations...", "Accommodation"),
+    ("transportation", "transportation_task", "Planning transportation...", "Transportation"),
+    ("activities", "activities_task", "Discovering activities...", "Activities"),
+    ("dining", "dining_task", "Finding dining options...", "Dining"),
+]
+
+# Chunk source (step_results key or "itinerary") -> title shown with plan
+# excerpts in the chat prompt
+SOURCE_TITLES = dict({key: title for key, _, _, title in RESEARCH_STEPS}, itinerary="Itinerary")
+
+# Which trip fields each task actually depends on. When a user resubmits the
+# form, only tasks whose fields changed are run again. Only fields that
+# build_input_text puts in the prompt count (special_requirements is not sent).
+TASK_DEPENDENCIES = {
+    "destination_research": ("destination", "preferences"),
+    "accommodation": ("destination", "start_date", "end_date", "duration", "budget"),
+    "transportation": ("origin", "destination", "start_date", "end_date", "budget"),
+    "activities": ("destination", "start_date", "duration", "preferences"),
+    "dining": ("destination", "preferences", "budget"),
+    "itinerary": ("origin", "destination", "start_date", "end_date", "duration", "preferences", "budget"),
+}
+
+# Tailvy "travel" response fields mapped onto step_results keys
+TAILVY_FIELDS = {
+    "destination_research": "destination_info",
+    "accommodation": "accommodations",
+    "transportation": "transportation",
+    "activities": "activities",
+    "dining": "dining",
+}
+
+
+def log_notify(level, message):
+    """Default notify callback: send user-facing messages to the log."""
+    logger.log(logging.ERROR if level == "error" else logging.WARNING, message)
+
+
+def use_tailvy_api(query, api_key, endpoint="itinerary", notify=log_notify):
+    """
+    Call Tailvy API for travel planning, sharing identical in-flight requests
+    
+    Args:
+        query (str): The travel query with trip details
+        api_key (str): Tailvy API key
+        endpoint (str): API endpoint to use
+        notify (callable): notify(level, message) for problems worth showing
+            the user; level is "warning" or "error"
+        
+    Returns:
+        dict: API response or None if failed
+    """
+    return tailvy_flight.do(
+        make_key(f"tailvy-{endpoint}", query, model="tailvy"),
+        lambda: _tracked_tailvy_call(query, api_key, endpoint, notify),
+        is_success=lambda result: result is not None
+    )
+
+
+def _tracked_tailvy_call(query, api_key, endpoint, notify):
+    stage = f"tailvy_{endpoint}"
+    with track(stage, "tailvy"):
+        result = _call_tailvy_api(query, api_key, endpoint, notify)
+    if result is None:
+        # _call_tailvy_api reports failures through notify instead of raising
+        record_error(stage, "tailvy")
+    return result
+
+
+def _call_tailvy_api(query, api_key, endpoint, notify):
+    """
+    Call Tailvy API for travel planning
+    
+    Args:
+        query (str): The travel query with trip details
+        api_key (str): Tailvy API key
+        endpoint (str): API endpoint to use
+        notify (callable): notify(level, message) for problems worth showing
+            the user; level is "warning" or "error"
+        
+    Returns:
+        dict: API response or None if failed
+    """
+    requests = load("requests")
+    try:
+        base_url = "https://api.tailvy.com/v1"
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        data = {
+            "query": query,
+            "format": "json"
+        }
+        
+        # Add a timeout to prevent hanging on slow API responses
+        response = requests.post(f"{base_url}/{endpoint}", headers=headers, json=data, timeout=30)
+        
+        if response.status_code == 200:
+            try:
+                result = response.json()
+                # Validate that response has expected fields
+                if endpoint == "travel" and not all(k in result for k in ["destination_info", "accommodations", "transportation"]):
+                    notify("warning", "Tailvy API response is missing expected fields. Falling back to default method.")
+                    return None
+                return result
+            except ValueError:
+                notify("warning", "Tailvy API returned invalid JSON. Falling back to default method.")
+                return None
+        elif response.status_code == 401:
+            notify("error", "Invalid Tailvy API key. Please check your credentials.")
+            return None
+        elif response.status_code == 429:
+            notify("warning", "Tailvy API rate limit exceeded. Falling back to default method.")
+            return None
+        else:
+            notify("warning", f"Tailvy API returned status code {response.status_code}. Falling back to default method.")
+            return None
+    except requests.exceptions.Timeout:
+        notify("warning", "Tailvy API request timed out. Falling back to default method.")
+        return None
+    except requests.exceptions.ConnectionError:
+        notify("warning", "Could not connect to Tailvy API. Falling back to default method.")
+        return None
+    except Exception as e:
+        notify("warning", f"Error calling Tailvy API: {str(e)}. Falling back to default method.")
+        return None
+
+
+def build_input_text(user_input):
+    """
+    Build the travel request prompt shared by every agent
+
+    Args:
+        user_input (dict): Trip details from the travel form
+
+    Returns:
+        str: The travel request prompt
+    """
+    return (
+        f"Origin: {user_input['origin']}, Destination: {user_input['destination']}, "
+        f"Travel dates: {user_input['start_date']} to {user_input['end_date']}, "
+        f"Duration: {user_input['duration']} days, Preferences: {user_input['preferences']}, "
+        f"Budget: {user_input['budget']}"
+    )
+
+
+def trip_to_user_input(trip):
+    """
+    Turn a trip request from outside the form (batch file, HTTP API) into user_input
+
+    Missing dates default to a trip starting a week from today, and
+    end_date is derived from start_date and duration like the form does.
+
+    Args:
+        trip (dict): Trip request with at least a destination
+
+    Returns:
+        dict: Trip details in the travel form's format
+
+    Raises:
+        ValueError: If the request has no destination, a malformed date or
+            a duration outside MIN_DURATION..MAX_DURATION days
+    """
+    if not trip.get("destination"):
+        raise ValueError("trip request has no destination")
+    raw_duration = trip.get("duration", 3)
+    # int() would quietly turn true into 1 and 2.7 into 2
+    whole = not isinstance(raw_duration, bool) and not (isinstance(raw_duration, float) and not raw_duration.is_integer())
+    try:
+        duration = int(raw_duration) if whole else None
+    except (TypeError, ValueError, OverflowError):
+        duration = None
+    if duration is None:
+        raise ValueError(f"duration must be a whole number of days, got {raw_duration!r}")
+    if not MIN_DURATION <= duration <= MAX_DURATION:
+        raise ValueError(f"duration must be between {MIN_DURATION} and {MAX_DURATION} days, got {duration}")
+    if trip.get("start_date"):
+        start_date = datetime.strptime(trip["start_date"], "%Y-%m-%d")
+    else:
+        start_date = datetime.today() + timedelta(days=7)
+    return {
+        "origin": trip.get("origin", "Delhi"),
+        "destination": trip["destination"],
+        "start_date": start_date.strftime("%Y-%m-%d"),
+        "end_date": (start_date + timedelta(days=duration)).strftime("%Y-%m-%d"),
+        "duration": duration,
+        "preferences": trip.get("preferences", ""),
+        "budget": trip.get("budget", "Mid-range"),
+        "special_requirements": trip.get("special_requirements", ""),
+    }
+
+
+def research_prompt(step, input_text):
+    """
+    Prompt for one research agent: the travel request plus the request for
+    its structured record (see schemas.py)
+    """
+    return input_text + schema_instructions(step)
+
+
+def tailvy_step_text(step, value):
+    """
+    Turn a Tailvy response field into step text
+
+    Tailvy returns some fields as prose and some as data; data is validated
+    against the step's schema and stored like an agent's answer (readable
+    bullets followed by the JSON record), so everything downstream treats
+    both sources the same way.
+
+    Args:
+        step (str): Research step key
+        value: The response field
+
+    Returns:
+        str: Step text
+    """
+    if value is None or isinstance(value, str):
+        return value or ""
+    if isinstance(value, list):
+        # A bare list is the step's main list (hotels, legs, ...)
+        list_key = next(key for key, spec in STEP_SCHEMAS[step].items() if isinstance(spec, list))
+        value = {list_key: value}
+    try:
+        record = validate_record(step, value)
+    except SchemaError as e:
+        logger.info("Tailvy %s data does not match the schema (%s); keeping it as text", step, e)
+        return json.dumps(value, ensure_ascii=False)
+    return describe_record(record) + "\n\n" + record_block(record)
+
+
+def step_records(step_results):
+    """
+    Collect the structured records of the research results
+
+    Args:
+        step_results (dict): Research results keyed by step
+
+    Returns:
+        dict: Step key -> validated record, for steps that have one
+    """
+    records = {}
+    for key in STEP_SCHEMAS:
+        record = extract_record(key, (step_results or {}).get(key))
+        if record is not None:
+            records[key] = record
+    return records
+
+
+def step_fingerprints(user_input):
+    """
+    Fingerprint the inputs of every task
+
+    Args:
+        user_input (dict): Trip details from the travel form
+
+    Returns:
+        dict: Task key -> hash of the (normalized) fields it depends on
+    """
+    return {
+        key: make_key(key, "|".join(str(user_input.get(field, "")) for field in fields), model="fingerprint")
+        for key, fields in TASK_DEPENDENCIES.items()
+    }
+
+
+def stale_steps(user_input, previous):
+    """
+    Work out which tasks have to run again for a resubmitted trip
+
+    Args:
+        user_input (dict): Trip details from the travel form
+        previous (dict): "step_results" and "fingerprints" of the last run,
+            or None
+
+    Returns:
+        set: Task keys (including "itinerary") whose result can't be kept
+    """
+    fingerprints = step_fingerprints(user_input)
+    if not previous:
+        return set(fingerprints)
+    old_results = previous.get("step_results") or {}
+    old_fingerprints = previous.get("fingerprints") or {}
+    stale = {
+        key for key, fingerprint in fingerprints.items()
+        if not old_results.get(key) or old_fingerprints.get(key) != fingerprint
+    }
+    # The itinerary combines everything, so any stale step makes it stale too
+    if stale:
+        stale.add("itinerary")
+    return stale
+
+
+def travel_runners():
+    """
+    travel.py's task runners, imported on first use
+
+    travel pulls in LangChain and the Gemini client, which takes seconds.
+    Deferring it keeps importing this module cheap, so the app's first
+    paint (and api_server or batch startup) doesn't wait for it.
+
+    Returns:
+        TravelRunners: The travel module, its stream_task (None if travel.py
+        cannot stream; results then arrive as a single chunk) and whether
+        per-task model routing is available
+    """
+    global _runners
+    with _runners_lock:
+        if _runners is None:
+            travel = load("travel")
+            stream = getattr(travel, "stream_task", None)
+            if not callable(stream):
+                stream = None
+            # Per-task models need a runner that takes a model argument
+            routing = accepts_model(travel.run_task) and (stream is None or accepts_model(stream))
+            if not routing:
+                logger.info("travel task runners take no model argument; every task uses the default model")
+            _runners = TravelRunners(travel, stream, routing)
+        return _runners
+
+
+def agent_task(name):
+    """The travel agent task called name (e.g. "dining_task")."""
+    return getattr(travel_runners().module, name)
+
+
+def cache_model(task_name, task):
+    """
+    The model(s) a task's results come from, for its cache key
+
+    Args:
+        task_name (str): Stable name of the task (e.g. "dining")
+        task: The travel agent task
+
+    Returns:
+        str: The task's model route (e.g. "gemini-1.5-flash>gemini-1.5-pro")
+        with model routing, otherwise the model of the task's agent as
+        configured in travel.py (DEFAULT_MODEL if it can't be found)
+    """
+    if travel_runners().model_routing:
+        return ">".join(models_for(task_name))
+    llm = getattr(getattr(task, "agent", None), "llm", None)
+    for attribute in ("model", "model_name"):
+        model = getattr(llm, attribute, None)
+        if isinstance(model, str) and model:
+            return model
+    return DEFAULT_MODEL
+
+
+def stream_task(task, input_text, api_key, on_progress=None, stage="task", model=None):
+    """
+    Streaming variant of run_task
+
+    The call waits for a slot from the per-key rate limiter first, so all
+    sessions sharing a Gemini key queue fairly instead of tripping 429s.
+    Latency (including time queued) and token counts are recorded under
+    stage in the pipeline metrics.
+
+    Args:
+        task: The travel agent task to run
+        input_text (str): The prompt for the task
+        api_key (str): Gemini API key
+        on_progress (callable): on_progress(state, info) as the call moves
+            through PROGRESS_STATES
+        stage (str): Stage name the call is recorded under in the metrics
+        model (str): Model to run the task on (None for the runner's default)
+
+    Yields:
+        str: Chunks of the task result as they are generated
+    """
+    on_progress = on_progress or (lambda state, info: None)
+    prompt_tokens = estimate_tokens(input_text)
+    backend = model or "gemini"
+    options = {"api_key": api_key}
+    if model is not None:
+        options["model"] = model
+
+    def on_slot(state):
+        if state == "queued":
+            on_progress("queued", {"model": backend, "input_tokens": prompt_tokens})
+
+    with track(stage, backend), \
+            get_rate_limiter().slot(api_key, prompt_tokens + EXPECTED_OUTPUT_TOKENS, on_slot) as slot:
+        on_progress("sent", {"model": backend, "input_tokens": prompt_tokens, "waited_s": round(slot.waited, 3)})
+        sent = time.perf_counter()
+        output_chars = 0
+        runners = travel_runners()
+        if runners.stream_task is not None:
+            for chunk in runners.stream_task(task, input_text, **options):
+                if chunk:
+                    if not output_chars:
+                        on_progress("first_token", {"model": backend, "seconds": round(time.perf_counter() - sent, 3)})
+                    output_chars += len(chunk)
+                    yield chunk
+        else:
+            result = runners.module.run_task(task, input_text, **options)
+            output_chars = len(result or "")
+            on_progress("first_token", {"model": backend, "seconds": round(time.perf_counter() - sent, 3)})
+            yield result
+        output_tokens = -(-output_chars // CHARS_PER_TOKEN)
+        slot.used_tokens = prompt_tokens + output_tokens
+        record_tokens(stage, prompt_tokens, output_tokens)
+        on_progress("completed", {
+            "model": backend,
+            "input_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "seconds": round(time.perf_counter() - sent, 3),
+        })
+
+
+def routed_stream_task(task_name, task, input_text, api_key, on_progress=None, on_provisional=None):
+    """
+    stream_task on the task's model route (see model_routing.py)
+
+    The primary model's answer is checked before it is accepted and the
+    call escalates to the fallback model if the checks fail or the call
+    errors. Output from a model that still has a fallback is held back
+    from the yielded stream until it passes: the whole answer, or for tasks
+    in RELEASE_AFTER_CHARS only its opening, after which the rest streams
+    on. The last model in the route streams as usual.
+
+    Callers that can take back what they showed pass on_provisional to see
+    held output as it arrives: on_provisional(chunk) for each held chunk
+    and on_provisional(None) when the answer is rejected. The accepted
+    answer is still yielded in full, starting with the held text.
+
+    Args:
+        task_name (str): Stable name of the task (e.g. "dining")
+        task: The travel agent task to run
+        input_text (str): The prompt for the task
+        api_key (str): Gemini API key
+        on_progress (callable): Progress callback (see stream_task)
+        on_provisional (callable): Receives held output before it is
+            accepted, None when it is withdrawn
+
+    Yields:
+        str: Chunks of the accepted result
+    """
+    models = models_for(task_name, travel_runners().model_routing)
+    for attempt, model in enumerate(models):
+        if attempt == len(models) - 1:
+            if model is not None:
+                logger.info("%s routed to %s", task_name, model)
+            yield from stream_task(task, input_text, api_key, on_progress, stage=task_name, model=model)
+            return
+        release_at = RELEASE_AFTER_CHARS.get(task_name)
+        stream = stream_task(task, input_text, api_key, on_progress, stage=task_name, model=model)
+        held = []
+        try:
+            for chunk in stream:
+                held.append(chunk)
+                if on_provisional is not None:
+                    on_provisional(chunk)
+                if release_at is not None and sum(map(len, held)) >= release_at:
+                    break
+            problems = check_output(task_name, "".join(held))
+        except Exception as e:
+            problems = [f"call failed: {e}"]
+        if not problems:
+            logger.info("%s routed to %s", task_name, model)
+            yield "".join(held)
+            # Accepted on its opening: the rest streams as it arrives
+            yield from stream
+            return
+        # Cancel whatever the rejected call would still send
+        stream.close()
+        if held and on_provisional is not None:
+            on_provisional(None)
+        logger.warning("%s escalated from %s to %s: %s", task_name, model, models[attempt + 1], "; ".join(problems))
+        record_fallback(task_name, model, models[attempt + 1])
+
+
+def cached_stream_task(task_name, task, input_text, api_key, on_progress=None, on_provisional=None):
+    """
+    routed_stream_task with the persistent result cache and single-flight in front of it
+
+    Concurrent callers with the same key (across sessions) wait for the one
+    call already in flight instead of sending the same prompt again; only
+    that leading call streams, followers get the whole result at once.
+
+    Args:
+        task_name (str): Stable name of the task, used in the cache key
+        task: The travel agent task to run
+        input_text (str): The prompt for the task
+        api_key (str): Gemini API key
+        on_progress (callable): Progress callback (see stream_task)
+        on_provisional (callable): Held-output callback of the leading call
+            (see routed_stream_task)
+
+    Yields:
+        str: Chunks of the task result (a cache hit is a single chunk)
+    """
+    cache = get_cache()
+    key = make_key(task_name, input_text, model=cache_model(task_name, task))
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    future, leader = task_flight.join(key)
+    if not leader:
+        try:
+            yield future.result()
+            return
+        except Exception:
+            # The leader failed (bad key, quota...); try with our own key
+            pass
+    else:
+        # A previous leader may have filled the cache since our lookup (the
+        # miss is already counted)
+        cached = cache.get(key, count=False)
+        if cached is not None:
+            task_flight.finish(key, result=cached)
+            yield cached
+            return
+
+    chunks = []
+    try:
+        for chunk in routed_stream_task(task_name, task, input_text, api_key, on_progress, on_provisional):
+            chunks.append(chunk)
+            yield chunk
+    except BaseException as e:
+        if leader:
+            task_flight.finish(key, error=e if isinstance(e, Exception) else LeaderAbandoned(task_name))
+        raise
+    result = "".join(chunks)
+    cache.put(key, result)
+    if leader:
+        task_flight.finish(key, result=result)
+
+
+def iter_research_events(user_input, api_key, previous=None, max_workers=None):
+    """
+    Run the research agents concurrently and stream their output
+
+    Every agent streams into a shared queue, so the caller sees chunks from
+    all agents interleaved in the order they are generated. Steps whose
+    inputs did not change since the previous run are kept as they are, and
+    steps with a close enough match in the semantic cache are answered from
+    it without calling the agent.
+
+    Args:
+        user_input (dict): Trip details from the travel form
+        api_key (str): Gemini API key
+        previous (dict): "step_results" and "fingerprints" of the last run
+            for this session, or None
+        max_workers (int): Thread pool size (defaults to one thread per agent)
+
+    Yields:
+        tuple: (step key, kind, text) where kind is one of PROGRESS_STATES
+        (text is the progress info dict) as the step's model call advances, "chunk" for
+        the next piece of streamed output, "reset" (empty text) when the
+        output streamed so far was a routed model's answer that failed its
+        checks and the fallback model starts over, or "done" / "reused" /
+        "kept" with the full result once a step has finished (freshly
+        generated / reused from a similar trip / unchanged since the
+        previous run).
+    """
+    input_text = build_input_text(user_input)
+    stale = stale_steps(user_input, previous)
+    steps = [(key, agent_task(task_name)) for key, task_name, _, _ in RESEARCH_STEPS if key in stale]
+    for key, _, _, _ in RESEARCH_STEPS:
+        if key not in stale:
+            yield key, "kept", previous["step_results"][key]
+    if not steps:
+        return
+
+    semantic_cache = get_semantic_cache()
+    events = queue.Queue()
+    stop = threading.Event()
+
+    def run_step(key, task):
+        try:
+            model = cache_model(key, task)
+            match = semantic_cache.lookup(key, user_input, model)
+            if match is not None:
+                events.put((key, "reused", match[0], None))
+                return
+
+            chunks = []
+            # Length of the result already shown as provisional output
+            shown = 0
+
+            def on_provisional(chunk):
+                nonlocal shown
+                if chunk is None:
+                    shown = 0
+                    events.put((key, "reset", "", None))
+                else:
+                    shown += len(chunk)
+                    events.put((key, "chunk", chunk, None))
+
+            on_progress = lambda state, info: events.put((key, state, info, None))
+            prompt = research_prompt(key, input_text)
+            for chunk in cached_stream_task(key, task, prompt, api_key, on_progress, on_provisional):
+                if stop.is_set():
+                    return
+                chunks.append(chunk)
+                # The accepted answer is yielded again from its start
+                fresh, shown = chunk[shown:], max(0, shown - len(chunk))
+                if fresh:
+                    events.put((key, "chunk", fresh, None))
+            result = "".join(chunks)
+            semantic_cache.store(key, user_input, model, result)
+            events.put((key, "done", result, None))
+        except Exception as e:
+            events.put((key, "error", None, e))
+
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers or len(steps),
+        thread_name_prefix="agentx-research"
+    )
+    try:
+        for key, task in steps:
+            executor.submit(run_step, key, task)
+
+        remaining = len(steps)
+        while remaining:
+            key, kind, text, error = events.get()
+            if error is not None:
+                raise error
+            if kind in FINAL_KINDS:
+                remaining -= 1
+            yield key, kind, text
+    finally:
+        # If one agent failed (or the caller went away) stop the others
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def build_itinerary_prompt(input_text, step_results, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Combine the research results into the prompt for the itinerary agent
+
+    Steps that produced a valid structured record contribute that compact
+    record instead of their prose; the remaining prose sections are
+    compacted to fit token_budget, keeping names, prices and timings. The
+    before/after prompt size is logged for every request.
+
+    Args:
+        input_text (str): The travel request prompt
+        step_results (dict): Research results keyed by step
+        token_budget (int): Token budget for the combined research sections
+
+    Returns:
+        str: Prompt for itinerary_task
+    """
+    records = step_records(step_results)
+    sections = {}
+    for key, _, _, title in RESEARCH_STEPS:
+        if key in records:
+            sections[title] = compact_record(records[key])
+        else:
+            sections[title] = strip_record(step_results.get(key))
+    compacted, stats = compact_sections(sections, token_budget)
+    input_tokens = estimate_tokens(input_text)
+    original_tokens = sum(estimate_tokens(step_results.get(key)) for key, _, _, _ in RESEARCH_STEPS)
+    logger.info(
+        "itinerary prompt: %d -> %d tokens (budget %d, %d/%d steps as records) %s",
+        input_tokens + original_tokens,
+        input_tokens + stats["compacted_tokens"],
+        token_budget,
+        len(records),
+        len(RESEARCH_STEPS),
+        {title: f"{before}->{after}" for title, (before, after) in stats["sections"].items()}
+    )
+    combined_results = "\n\n".join(f"{title}: {text}" for title, text in compacted.items())
+    return f"{input_text}\n\n{combined_results}"
+
+
+def build_draft_prompt(input_text, step_results, pending):
+    """
+    Prompt for a speculative itinerary drafted before all research is in
+
+    Args:
+        input_text (str): The travel request prompt
+        step_results (dict): Research results finished so far
+        pending (set): Step keys still running
+
+    Returns:
+        str: Prompt for itinerary_task
+    """
+    titles = [title for key, _, _, title in RESEARCH_STEPS if key in pending]
+    return (
+        build_itinerary_prompt(input_text, step_results)
+        + f"\n\nResearch on {', '.join(titles)} is still in progress: write the complete itinerary anyway, "
+        "using well-known options for those parts."
+    )
+
+
+def proper_names(text):
+    """Lowercased multi-word proper names in text (plus the text itself if it is one capitalized word)."""
+    names = {match.group(0).lower() for match in _PROPER_NAME.finditer(text)}
+    word = text.strip()
+    if re.fullmatch(r"[A-Z][a-z]+", word):
+        names.add(word.lower())
+    return names
+
+
+def step_names(key, text):
+    """
+    Names of the places a research result recommends
+
+    Uses the structured record when there is one (hotel, restaurant and
+    activity names, transport modes, and proper names in lists of strings
+    such as destination highlights) and proper names in the prose when the
+    record has none.
+
+    Returns:
+        set: Lowercased names
+    """
+    record = extract_record(key, text) if key in STEP_SCHEMAS else None
+    names = set()
+    for value in (record or {}).values():
+        if not isinstance(value, list):
+            continue
+        for item in value:
+            if isinstance(item, dict):
+                name = item.get("name") or item.get("mode")
+                if name:
+                    names.add(name.lower())
+            elif isinstance(item, str):
+                names.update(proper_names(item))
+    if not names:
+        names = proper_names(strip_record(text))
+    return names
+
+
+def late_results_material(draft, late_results):
+    """
+    Decide whether research that finished after the draft warrants a rewrite
+
+    Args:
+        draft (str): The speculative itinerary
+        late_results (dict): Step key -> result for steps the draft didn't see
+
+    Returns:
+        list: Steps whose recommendations the draft mostly doesn't mention,
+        or whose recommendations can't be told apart (empty if the draft
+        can stand)
+    """
+    draft_text = (draft or "").lower()
+    material = []
+    for key, text in late_results.items():
+        names = step_names(key, text)
+        if not names:
+            # Nothing to check the draft against, so it can't be trusted
+            material.append(key)
+            continue
+        covered = sum(1 for name in names if name in draft_text)
+        if covered / len(names) < DRAFT_COVERAGE_THRESHOLD:
+            material.append(key)
+    return material
+
+
+def run_itinerary_task(input_text, step_results, api_key):
+    """
+    Generate the final itinerary from the research results
+
+    Args:
+        input_text (str): The travel request prompt
+        step_results (dict): Research results keyed by step
+        api_key (str): Gemini API key
+
+    Returns:
+        str: The generated itinerary
+    """
+    return "".join(stream_itinerary_task(input_text, step_results, api_key))
+
+
+def stream_itinerary_task(input_text, step_results, api_key, on_progress=None):
+    """
+    Streaming variant of run_itinerary_task
+
+    Args:
+        input_text (str): The travel request prompt
+        step_results (dict): Research results keyed by step
+        api_key (str): Gemini API key
+        on_progress (callable): Progress callback (see stream_task)
+
+    Yields:
+        str: Chunks of the itinerary as they are generated
+    """
+    yield from cached_stream_task(
+        "itinerary",
+        agent_task("itinerary_task"),
+        build_itinerary_prompt(input_text, step_results),
+        api_key,
+        on_progress
+    )
+
+
+def run_pipeline(user_input, gemini_api_key, tailvy_api_key=None, on_event=None, notify=log_notify, previous=None,
+                 use_prewarmed=True, speculative=SPECULATIVE_DRAFTS):
+    """
+    Run the full itinerary pipeline without any UI
+
+    Tailvy is tried first when a key is given; otherwise (or if it fails) the
+    research agents run concurrently on Gemini and feed itinerary_task. With
+    the previous run's results, only tasks whose inputs changed run again,
+    and popular routes are served from the pre-warmed store when possible.
+    A pre-warmed plan made for other dates only contributes the steps that
+    don't depend on the dates (see TASK_DEPENDENCIES); the others and the
+    itinerary are generated for the requested dates.
+
+    In speculative mode a draft itinerary is written on the fast model as
+    soon as SPECULATIVE_MIN_STEPS research steps are in. When the rest
+    arrive, the draft is kept unless the late results are material (see
+    late_results_material), in which case the full itinerary is generated
+    and replaces it.
+
+    Args:
+        user_input (dict): Trip details from the travel form
+        gemini_api_key (str): Gemini API key
+        tailvy_api_key (str): Optional Tailvy API key
+        on_event (callable): on_event(step, kind, text) for progress; step is
+            a research step key or "itinerary", kind is one of
+            PROGRESS_STATES (text is the progress info dict), "chunk",
+            "done", "reused", "kept" (see iter_research_events),
+            "prewarmed" for plans generated ahead of time or "draft" with a
+            speculative itinerary; the chunks after a draft are a fresh
+            itinerary that replaces it. "reset" (empty text) means the
+            chunks streamed so far belong to a draft that was abandoned or,
+            for a research step, to an answer that failed the model
+            routing checks
+        notify (callable): notify(level, message) for user-facing problems
+        previous (dict): "step_results" (including "itinerary"),
+            "fingerprints" and "tailvy_used" of the last run for this
+            session, or None
+        use_prewarmed (bool): Check the pre-warmed store first (the
+            pre-warm job itself turns this off)
+        speculative (bool): Draft the itinerary before all research is in
+
+    Returns:
+        dict: step_results, itinerary, tailvy_used, reused_steps, the
+        structured records of the research steps (see step_records) and the
+        fingerprints to pass back as previous next time
+    """
+    on_event = on_event or (lambda step, kind, text: None)
+    input_text = build_input_text(user_input)
+    fingerprints = step_fingerprints(user_input)
+
+    if not stale_steps(user_input, previous):
+        # Nothing the pipeline depends on changed since the last run
+        step_results = {key: previous["step_results"][key] for key, _, _, _ in RESEARCH_STEPS}
+        for key, text in step_results.items():
+            on_event(key, "kept", text)
+        on_event("itinerary", "kept", previous["step_results"]["itinerary"])
+        return {
+            "step_results": step_results,
+            "itinerary": previous["step_results"]["itinerary"],
+            "tailvy_used": bool(previous.get("tailvy_used")),
+            "reused_steps": set(),
+            "fingerprints": fingerprints,
+            "records": step_records(step_results),
+        }
+
+    prewarmed = get_prewarm_store().lookup(user_input) if use_prewarmed else None
+    if prewarmed and all(prewarmed[field] == user_input[field] for field in ("start_date", "end_date")):
+        for key, text in prewarmed["step_results"].items():
+            on_event(key, "prewarmed", text)
+        on_event("itinerary", "prewarmed", prewarmed["itinerary"])
+        return {
+            "step_results": prewarmed["step_results"],
+            "itinerary": prewarmed["itinerary"],
+            "tailvy_used": False,
+            "reused_steps": set(),
+            "fingerprints": fingerprints,
+            "records": step_records(prewarmed["step_results"]),
+        }
+    if prewarmed:
+        # Made for placeholder dates: treat it as the previous run of a trip
+        # on those dates, so only the date-dependent steps run again
+        previous = {
+            "step_results": dict(prewarmed["step_results"], itinerary=prewarmed["itinerary"]),
+            "fingerprints": step_fingerprints(
+                dict(user_input, start_date=prewarmed["start_date"], end_date=prewarmed["end_date"])
+            ),
+        }
+
+    if tailvy_api_key and not prewarmed:
+        tailvy_response = use_tailvy_api(input_text, tailvy_api_key, endpoint="travel", notify=notify)
+        if tailvy_response:
+            try:
+                step_results = {
+                    key: tailvy_step_text(key, tailvy_response.get(field))
+                    for key, field in TAILVY_FIELDS.items()
+                }
+                itinerary = tailvy_response.get("itinerary", "")
+                for key, text in step_results.items():
+                    on_event(key, "done", text)
+                on_event("itinerary", "done", itinerary)
+                return {
+                    "step_results": step_results,
+                    "itinerary": itinerary,
+                    "tailvy_used": True,
+                    "reused_steps": set(),
+                    "fingerprints": fingerprints,
+                    "records": step_records(step_results),
+                }
+            except Exception as e:
+                notify("warning", f"Error processing Tailvy data: {str(e)}. Falling back to default method.")
+        record_fallback("pipeline", "tailvy", "gemini")
+
+    step_results = {}
+    reused_steps = set()
+    on_progress = lambda state, info: on_event("itinerary", state, info)
+    draft = {"seen": None, "text": None}
+    draft_thread = None
+    stop_draft = threading.Event()
+
+    def write_draft(finished, pending):
+        try:
+            chunks = []
+            prompt = build_draft_prompt(input_text, finished, pending)
+            for chunk in cached_stream_task("itinerary_draft", agent_task("itinerary_task"), prompt, gemini_api_key, on_progress):
+                if stop_draft.is_set():
+                    break
+                chunks.append(chunk)
+                on_event("itinerary", "chunk", chunk)
+            else:
+                draft["text"] = "".join(chunks)
+                on_event("itinerary", "draft", draft["text"])
+        except Exception as e:
+            logger.warning("Speculative itinerary draft failed: %s", e)
+        if draft["text"] is None and chunks:
+            # Whatever streams next must not be appended to the half-written draft
+            on_event("itinerary", "reset", "")
+
+    try:
+        for key, kind, text in iter_research_events(user_input, gemini_api_key, previous=previous):
+            if kind == "kept" and prewarmed:
+                kind = "prewarmed"
+            if kind in FINAL_KINDS:
+                step_results[key] = text
+                if kind == "reused":
+                    reused_steps.add(key)
+            on_event(key, kind, text)
+            if speculative and draft_thread is None and SPECULATIVE_MIN_STEPS <= len(step_results) < len(RESEARCH_STEPS):
+                draft["seen"] = set(step_results)
+                pending = {key for key, _, _, _ in RESEARCH_STEPS if key not in step_results}
+                draft_thread = threading.Thread(
+                    target=write_draft, args=(dict(step_results), pending), name="agentx-draft", daemon=True
+                )
+                draft_thread.start()
+    except BaseException:
+        stop_draft.set()
+        raise
+
+    itinerary = None
+    if draft_thread is not None:
+        draft_thread.join()
+        if draft["text"]:
+            late = {key: text for key, text in step_results.items() if key not in draft["seen"]}
+            material = late_results_material(draft["text"], late)
+            if material:
+                logger.info("Refining the draft itinerary: late results for %s are not in it", ", ".join(material))
+            else:
+                logger.info("Keeping the draft itinerary: late results for %s add nothing material", ", ".join(late))
+                itinerary = draft["text"]
+
+    if itinerary is None:
+        chunks = []
+        for chunk in stream_itinerary_task(input_text, step_results, gemini_api_key, on_progress):
+            chunks.append(chunk)
+            on_event("itinerary", "chunk", chunk)
+        itinerary = "".join(chunks)
+    on_event("itinerary", "done", itinerary)
+
+    return {
+        "step_results": step_results,
+        "itinerary": itinerary,
+        "tailvy_used": False,
+        "reused_steps": reused_steps,
+        "fingerprints": fingerprints,
+        "records": step_records(step_results),
+    }
+
+
+def build_chat_context(question, user_input=None, history=None, references=None):
+    """
+    Build the chatbot prompt for a question about the user's trip
+
+    Args:
+        question (str): The user's question
+        user_input (dict): Trip details from the travel form, if any
+        history (tuple): (summary, recent exchanges) from ChatStore.context,
+            so the model can follow up on earlier answers
+        references (list): Chunks of the generated plan relevant to the
+            question (see retrieval.PlanIndex.search)
+
+    Returns:
+        str: Prompt for chatbot_task
+    """
+    parts = []
+    if user_input:
+        parts.append(f"Travel Plan: {user_input}")
+    if references:
+        parts.append("Relevant parts of the generated plan:\n" + "\n\n".join(
+            f"[{SOURCE_TITLES.get(chunk.source, chunk.source)}]\n{chunk.text}" for chunk in references
+        ))
+    if history:
+        summary, recent = history
+        if summary:
+            parts.append(f"Earlier in this conversation:\n{summary}")
+        if recent:
+            parts.append("Recent messages:\n" + "\n".join(
+                f"User: {asked}\nAssistant: {answered}" for asked, answered in recent
+            ))
+    parts.append(f"Question: {question}")
+    return "\n".join(parts)
+
+
+def stream_chat(question, gemini_api_key, tailvy_api_key=None, user_input=None, notify=log_notify, on_progress=None,
+                history=None, references=None):
+    """
+    Answer a chat question as a stream, racing Tailvy against Gemini
+
+    With a Tailvy key both backends start at once, on the same prompt
+    (trip, conversation history and plan references), and the first valid
+    answer wins: a Tailvy reply that passes the chat checks, or Gemini's
+    first accepted chunk (see routed_stream_task). Chat latency is
+    therefore that of the faster backend instead of Tailvy's timeout plus
+    Gemini.
+
+    Cancelling the loser only stops its output from being used; a call
+    already in flight is not interrupted. A losing Gemini stream is closed
+    when its next chunk arrives, which frees its rate limiter slot; with a
+    travel module that has no stream_task the whole answer is one chunk,
+    so the slot is held until the call finishes. A Tailvy request still in
+    flight finishes in the background and is ignored.
+
+    Both backends run on helper threads, but on_progress and notify are
+    only ever called from the caller's thread (so they may update
+    Streamlit elements).
+
+    Args:
+        question (str): The user's question
+        gemini_api_key (str): Gemini API key
+        tailvy_api_key (str): Optional Tailvy API key
+        user_input (dict): Trip details from the travel form, if any
+        notify (callable): notify(level, message) for user-facing problems
+        on_progress (callable): Progress callback (see stream_task)
+        history (tuple): Conversation so far (see build_chat_context)
+        references (list): Plan chunks to ground the answer in (see build_chat_context)
+
+    Yields:
+        tuple: (backend, chunk) with backend "tailvy" or "gemini"; every
+        chunk comes from the winning backend
+
+    Raises:
+        Exception: Gemini's error if neither backend produced an answer
+    """
+    on_progress = on_progress or (lambda state, info: None)
+    prompt = build_chat_context(question, user_input, history, references)
+    if not tailvy_api_key:
+        for chunk in routed_stream_task("chat", agent_task("chatbot_task"), prompt, gemini_api_key, on_progress):
+            yield "gemini", chunk
+        return
+
+    events = queue.Queue()
+    stop = threading.Event()
+
+    def run_tailvy():
+        sent = time.perf_counter()
+        events.put(("tailvy", "progress", ("sent", {"model": "tailvy", "input_tokens": estimate_tokens(prompt), "waited_s": 0.0})))
+        try:
+            response = use_tailvy_api(
+                prompt, tailvy_api_key, endpoint="chat",
+                notify=lambda level, message: events.put(("tailvy", "notice", (level, message)))
+            )
+            answer = (response or {}).get("response")
+            problems = check_output("chat", answer) if response else ["no response"]
+        except Exception as e:
+            answer, problems = None, [str(e)]
+        if problems:
+            events.put(("tailvy", "failed", RuntimeError("; ".join(problems))))
+            return
+        events.put(("tailvy", "progress", ("completed", {
+            "model": "tailvy",
+            "input_tokens": estimate_tokens(prompt),
+            "output_tokens": estimate_tokens(answer),
+            "seconds": round(time.perf_counter() - sent, 3),
+        })))
+        events.put(("tailvy", "done", answer))
+
+    def run_gemini():
+        stream = routed_stream_task(
+            "chat", agent_task("chatbot_task"), prompt, gemini_api_key,
+            lambda state, info: events.put(("gemini", "progress", (state, info)))
+        )
+        try:
+            for chunk in stream:
+                if stop.is_set():
+                    return
+                events.put(("gemini", "chunk", chunk))
+            events.put(("gemini", "done", None))
+        except Exception as e:
+            events.put(("gemini", "failed", e))
+        finally:
+            stream.close()
+
+    for backend, target in (("tailvy", run_tailvy), ("gemini", run_gemini)):
+        threading.Thread(target=target, name=f"agentx-chat-{backend}", daemon=True).start()
+
+    winner = None
+    failures = {}
+    try:
+        while True:
+            backend, kind, payload = events.get()
+            if winner not in (None, backend):
+                continue
+            if kind == "progress":
+                on_progress(*payload)
+            elif kind == "notice":
+                notify(*payload)
+            elif kind == "failed":
+                if winner == backend:
+                    # Part of the answer is already out; there is no clean fallback
+                    raise payload
+                failures[backend] = payload
+                if len(failures) == 2:
+                    raise failures["gemini"]
+                if backend == "tailvy":
+                    record_fallback("chat", "tailvy", "gemini")
+            elif kind == "chunk":
+                if winner is None:
+                    winner = backend
+                    logger.info("chat race won by gemini")
+                yield backend, payload
+            elif backend == "tailvy":
+                winner = backend
+                logger.info("chat race won by tailvy")
+                yield backend, payload
+                return
+            elif winner == backend:
+                return
+            else:
+                # Gemini finished without any output
+                failures[backend] = RuntimeError("empty answer")
+                if len(failures) == 2:
+                    raise failures[backend]
+    finally:
+        # Cancel the loser (or both, if the caller stopped reading)
+        stop.set()
+
+
+def answer_chat(question, gemini_api_key, tailvy_api_key=None, user_input=None, notify=log_notify, on_progress=None,
+                history=None, references=None):
+    """
+    Answer a chat question (stream_chat collected into one string)
+
+    Args:
+        question (str): The user's question
+        gemini_api_key (str): Gemini API key
+        tailvy_api_key (str): Optional Tailvy API key
+        user_input (dict): Trip details from the travel form, if any
+        notify (callable): notify(level, message) for user-facing problems
+        on_progress (callable): Progress callback (see stream_task)
+        history (tuple): Conversation so far (see build_chat_context)
+        references (list): Plan chunks to ground the answer in (see build_chat_context)
+
+    Returns:
+        tuple: (answer text, backend) where backend is "tailvy" or "gemini"
+    """
+    backend = "gemini"
+    chunks = []
+    for backend, chunk in stream_chat(question, gemini_api_key, tailvy_api_key, user_input, notify, on_progress,
+                                      history, references):
+        chunks.append(chunk)
+    return "".join(chunks), backend
+
+
+def flight_stats():
+    """
+    Report how many duplicate in-flight calls were coalesced
+
+    Returns:
+        dict: SingleFlight counters keyed by "run_task" and "tailvy"
+    """
+    return {flight.name: flight.stats() for flight in (task_flight, tailvy_flight)}
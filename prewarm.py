@@ -0,0 +1,303 @@
+"""
+Offline pre-warming of popular city-pair itineraries.
+
+Most traffic is a few dozen routes (Delhi→Agra, Mumbai→Goa, ...). This job
+generates plans for routes × durations × budget tiers ahead of time and
+stores them where pipeline.run_pipeline looks before calling any LLM.
+Plans are matched on route, duration, budget and preferences (not on
+travel dates) and stop being served once they are older than the
+staleness limit; re-running the job refreshes stale and missing ones.
+Each plan remembers the dates it was generated for; for other dates the
+pipeline keeps only the date-independent research and generates the rest
+and the itinerary for the requested dates (see pipeline.run_pipeline).
+
+Run it from cron, e.g. nightly:
+    0 2 * * * cd /srv/agentx && python prewarm.py --concurrency 4
+
+Show coverage and hit rate without generating anything:
+    python prewarm.py --report
+
+Lookups are counted in memory and added to the database at most every
+COUNT_FLUSH_SECONDS (and when the process exits), so the report covers
+every process that served plans. The live counts are also exported as
+agentx_cache_lookups_total{cache="prewarm"} (see metrics.py).
+"""
+
+import argparse
+import atexit
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import record_lookup
+from task_cache import CACHE_DIR, normalize_text
+
+MAX_AGE_DAYS = float(os.environ.get("AGENTX_PREWARM_MAX_AGE_DAYS", 7))
+# Longest lookup counts stay in memory before being added to the database
+COUNT_FLUSH_SECONDS = 60
+
+POPULAR_ROUTES = [
+    ("Delhi", "Agra"),
+    ("Delhi", "Jaipur"),
+    ("Delhi", "Rishikesh"),
+    ("Delhi", "Shimla"),
+    ("Delhi", "Varanasi"),
+    ("Mumbai", "Goa"),
+    ("Mumbai", "Pune"),
+    ("Mumbai", "Lonavala"),
+    ("Bengaluru", "Mysuru"),
+    ("Bengaluru", "Coorg"),
+    ("Bengaluru", "Ooty"),
+    ("Chennai", "Puducherry"),
+    ("Chennai", "Mahabalipuram"),
+    ("Kolkata", "Darjeeling"),
+    ("Hyderabad", "Hampi"),
+    ("Kochi", "Munnar"),
+    ("Ahmedabad", "Udaipur"),
+    ("Jaipur", "Jodhpur"),
+]
+DURATIONS = [2, 3, 5]
+BUDGETS = ["Budget", "Mid-range", "Luxury"]
+# The travel form's default interests, which most requests keep
+PREFERENCES = "Historical sites, Culture, Food"
+
+logger = logging.getLogger("prewarm")
+
+
+def route_key(user_input):
+    """
+    Key a trip request by the fields pre-warmed plans are matched on
+
+    Args:
+        user_input (dict): Trip details from the travel form
+
+    Returns:
+        str: Normalized route key
+    """
+    return "|".join(
+        normalize_text(user_input.get(field, ""))
+        for field in ("origin", "destination", "duration", "budget", "preferences")
+    )
+
+
+class PrewarmStore:
+    """SQLite store of pre-generated plans plus hit/miss counters written in batches."""
+
+    def __init__(self, path=None, max_age_days=MAX_AGE_DAYS):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "prewarm.sqlite3")
+        self.max_age = max_age_days * 24 * 3600
+        self._lock = threading.Lock()
+        # Lookups not yet added to prewarm_lookups
+        self._pending = {"hit": 0, "miss": 0}
+        self._flushed_at = time.monotonic()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS prewarmed (
+                route_key TEXT PRIMARY KEY,
+                step_results TEXT NOT NULL,
+                itinerary TEXT NOT NULL,
+                generated_at REAL NOT NULL
+            )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(prewarmed)")}
+        for column in ("start_date", "end_date"):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE prewarmed ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS prewarm_lookups (outcome TEXT PRIMARY KEY, count INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _flush(self):
+        """Add the pending lookup counts to the database (caller holds the lock)."""
+        for outcome, count in self._pending.items():
+            if count:
+                self._conn.execute(
+                    "INSERT INTO prewarm_lookups (outcome, count) VALUES (?, ?) "
+                    "ON CONFLICT(outcome) DO UPDATE SET count = count + excluded.count",
+                    (outcome, count)
+                )
+        self._conn.commit()
+        self._pending = {"hit": 0, "miss": 0}
+        self._flushed_at = time.monotonic()
+
+    def flush(self):
+        """Write the lookup counts kept in memory now."""
+        with self._lock:
+            self._flush()
+
+    def lookup(self, user_input):
+        """
+        Find a fresh pre-generated plan for a trip request
+
+        Args:
+            user_input (dict): Trip details from the travel form
+
+        Returns:
+            dict: step_results, itinerary and the start_date and end_date
+            the plan was generated for, or None if missing or stale
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT step_results, itinerary, generated_at, start_date, end_date FROM prewarmed WHERE route_key = ?",
+                (route_key(user_input),)
+            ).fetchone()
+            hit = row is not None and time.time() - row[2] <= self.max_age
+            self._pending["hit" if hit else "miss"] += 1
+            if time.monotonic() - self._flushed_at >= COUNT_FLUSH_SECONDS:
+                self._flush()
+        record_lookup("prewarm", "hit" if hit else "miss")
+        if not hit:
+            return None
+        return {"step_results": json.loads(row[0]), "itinerary": row[1], "start_date": row[3], "end_date": row[4]}
+
+    def store(self, user_input, step_results, itinerary):
+        """Save a freshly generated plan for a trip request."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO prewarmed (route_key, step_results, itinerary, generated_at, start_date, end_date) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (route_key(user_input), json.dumps(step_results, ensure_ascii=False), itinerary, time.time(),
+                 user_input.get("start_date", ""), user_input.get("end_date", ""))
+            )
+            self._conn.commit()
+
+    def age(self, user_input):
+        """Seconds since the plan for this request was generated, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT generated_at FROM prewarmed WHERE route_key = ?", (route_key(user_input),)
+            ).fetchone()
+        return None if row is None else time.time() - row[0]
+
+    def lookup_counts(self):
+        """Return the {"hit": n, "miss": n} lookup counters of every process so far."""
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT outcome, count FROM prewarm_lookups").fetchall())
+            return {outcome: counts.get(outcome, 0) + self._pending[outcome] for outcome in ("hit", "miss")}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_prewarm_store():
+    """Return the process-wide pre-warm store, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PrewarmStore()
+            atexit.register(_store.flush)
+        return _store
+
+
+def plan_requests(routes=POPULAR_ROUTES, durations=DURATIONS, budgets=BUDGETS, preferences=PREFERENCES):
+    """
+    Expand routes × durations × budget tiers into trip requests
+
+    Returns:
+        list: user_input dicts to pre-warm
+    """
+    from pipeline import trip_to_user_input
+
+    return [
+        trip_to_user_input({
+            "origin": origin,
+            "destination": destination,
+            "duration": duration,
+            "budget": budget,
+            "preferences": preferences,
+        })
+        for (origin, destination), duration, budget in itertools.product(routes, durations, budgets)
+    ]
+
+
+def report(store, requests):
+    """
+    Summarize coverage of the planned requests and the live hit rate
+
+    Returns:
+        dict: Counts of fresh, stale and missing plans, coverage and hit rate
+    """
+    fresh = stale = missing = 0
+    for user_input in requests:
+        age = store.age(user_input)
+        if age is None:
+            missing += 1
+        elif age > store.max_age:
+            stale += 1
+        else:
+            fresh += 1
+    counts = store.lookup_counts()
+    lookups = counts["hit"] + counts["miss"]
+    return {
+        "planned": len(requests),
+        "fresh": fresh,
+        "stale": stale,
+        "missing": missing,
+        "coverage": fresh / len(requests) if requests else 0.0,
+        "hits": counts["hit"],
+        "misses": counts["miss"],
+        "hit_rate": counts["hit"] / lookups if lookups else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate itineraries for popular routes.")
+    parser.add_argument("--routes", help="JSON file with [[origin, destination], ...] (default: built-in popular routes)")
+    parser.add_argument("--durations", type=int, nargs="+", default=DURATIONS)
+    parser.add_argument("--budgets", nargs="+", default=BUDGETS)
+    parser.add_argument("--refresh-after-days", type=float, default=MAX_AGE_DAYS / 2,
+                        help="Regenerate plans older than this, before they go stale (default: half the staleness limit)")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--gemini-api-key", default=os.environ.get("GEMINI_API_KEY"), help="Defaults to $GEMINI_API_KEY")
+    parser.add_argument("--report", action="store_true", help="Only print coverage and hit rate")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    routes = POPULAR_ROUTES
+    if args.routes:
+        with open(args.routes, encoding="utf-8") as f:
+            routes = [tuple(route) for route in json.load(f)]
+    requests = plan_requests(routes, args.durations, args.budgets)
+    store = get_prewarm_store()
+
+    if not args.report:
+        if not args.gemini_api_key:
+            parser.error("a Gemini API key is required (--gemini-api-key or GEMINI_API_KEY)")
+        from pipeline import run_pipeline
+
+        refresh_after = args.refresh_after_days * 24 * 3600
+        todo = [u for u in requests if (store.age(u) is None or store.age(u) > refresh_after)]
+        logger.info("%d planned, %d to (re)generate", len(requests), len(todo))
+
+        def warm(user_input):
+            result = run_pipeline(user_input, args.gemini_api_key, use_prewarmed=False)
+            store.store(user_input, result["step_results"], result["itinerary"])
+            return user_input
+
+        with ThreadPoolExecutor(max_workers=max(1, args.concurrency), thread_name_prefix="agentx-prewarm") as executor:
+            futures = {executor.submit(warm, u): u for u in todo}
+            for count, future in enumerate(as_completed(futures), start=1):
+                user_input = futures[future]
+                route = f"{user_input['origin']}→{user_input['destination']} {user_input['duration']}d {user_input['budget']}"
+                try:
+                    future.result()
+                    logger.info("[%d/%d] warmed %s", count, len(todo), route)
+                except Exception as e:
+                    logger.warning("[%d/%d] failed %s: %s", count, len(todo), route, e)
+
+    print(json.dumps(report(store, requests), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
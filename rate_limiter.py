@@ -0,0 +1,252 @@
+"""
+Adaptive rate limiting for the shared Gemini key.
+
+Every session and background job calls Gemini through the same handful of
+API keys, so without coordination a busy moment turns into a wall of 429s
+for everybody. Each key gets:
+
+- token buckets for requests per minute and tokens per minute,
+- an AIMD concurrency window that halves on a 429 or timeout and grows
+  back by one slot per window's worth of successful calls,
+- a FIFO queue, so callers are served in arrival order whichever session
+  they come from.
+
+Queue depth and wait times are kept per key for the UI.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULT_RPM = float(os.environ.get("AGENTX_GEMINI_RPM", 60))
+DEFAULT_TPM = float(os.environ.get("AGENTX_GEMINI_TPM", 1000000))
+DEFAULT_MAX_CONCURRENCY = float(os.environ.get("AGENTX_GEMINI_MAX_CONCURRENCY", 8))
+# Longest we'll sleep between re-checks while queued
+MAX_WAIT_SLICE = 1.0
+
+
+def is_throttle_error(error):
+    """
+    Decide whether an exception means the provider wants us to slow down
+
+    Args:
+        error (BaseException): Exception raised by the API call
+
+    Returns:
+        bool: True for rate limit (429 / quota) errors and timeouts
+    """
+    if isinstance(error, TimeoutError):
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "rate limit", "resourceexhausted", "resource exhausted", "quota", "timeout", "timed out"))
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at capacity per minute."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = per_minute
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount tokens are available (0 if they are now)."""
+        self._refill(now)
+        # A single request bigger than the bucket may go once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.tokens -= amount
+
+
+class KeyLimiter:
+    """Limiter state for one API key."""
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.window = max_concurrency
+        self.in_flight = 0
+        self.throttled = 0
+        self.completed = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._queue = deque()
+        self._cond = threading.Condition()
+
+    def acquire(self, tokens):
+        """
+        Wait for our turn and a free slot, then take one
+
+        Args:
+            tokens (int): Estimated tokens the call will use
+
+        Returns:
+            float: Seconds spent queued
+        """
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._queue.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self._queue[0] is ticket and self.in_flight < int(self.window):
+                        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+                        if wait == 0:
+                            break
+                    else:
+                        wait = MAX_WAIT_SLICE
+                    self._cond.wait(min(wait, MAX_WAIT_SLICE))
+            finally:
+                self._queue.remove(ticket)
+                # The next caller in line may be able to go now
+                self._cond.notify_all()
+            now = time.monotonic()
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+            self.in_flight += 1
+            self.acquired += 1
+            waited = now - started
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            return waited
+
+    def release(self, outcome, extra_tokens=0):
+        """
+        Give the slot back and adapt the window
+
+        Args:
+            outcome (str): "success", "throttled" or "failed"
+            extra_tokens (int): Tokens used beyond the estimate taken at acquire
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if extra_tokens > 0:
+                self.tokens.take(extra_tokens, time.monotonic())
+            if outcome == "throttled":
+                # Multiplicative decrease
+                self.throttled += 1
+                self.window = max(1.0, self.window / 2)
+            elif outcome == "success":
+                # Additive increase: about one slot per window of successes
+                self.completed += 1
+                self.window = min(self.max_concurrency, self.window + 1.0 / self.window)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "in_flight": self.in_flight,
+                "window": round(self.window, 2),
+                "completed": self.completed,
+                "throttled": self.throttled,
+                "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+
+class Slot:
+    """Context manager holding one limiter slot for the duration of a call."""
+
+    def __init__(self, limiter, tokens, on_state=None):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.on_state = on_state or (lambda state: None)
+        self.used_tokens = tokens
+        self.waited = 0.0
+
+    def __enter__(self):
+        self.on_state("queued")
+        self.waited = self.limiter.acquire(self.tokens)
+        self.on_state("running")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            outcome = "success"
+        elif isinstance(exc, Exception) and is_throttle_error(exc):
+            outcome = "throttled"
+        else:
+            outcome = "failed"
+        self.limiter.release(outcome, extra_tokens=self.used_tokens - self.tokens)
+        return False
+
+
+class RateLimiter:
+    """Process-wide registry of per-key limiters."""
+
+    def __init__(self):
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key_id(api_key):
+        # Never keep raw keys around longer than needed
+        return hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:12]
+
+    def for_key(self, api_key):
+        key_id = self._key_id(api_key)
+        with self._lock:
+            if key_id not in self._limiters:
+                self._limiters[key_id] = KeyLimiter()
+            return self._limiters[key_id]
+
+    def slot(self, api_key, tokens, on_state=None):
+        """
+        Reserve a slot for one call made with api_key
+
+        Args:
+            api_key (str): The API key the call uses
+            tokens (int): Estimated tokens for the call
+            on_state (callable): on_state("queued" | "running") as the call
+                waits and then starts
+
+        Returns:
+            Slot: Use as a context manager around the call; set used_tokens
+            on it once the real size is known
+        """
+        return Slot(self.for_key(api_key), tokens, on_state)
+
+    def stats(self, api_key=None):
+        """
+        Report limiter state
+
+        Args:
+            api_key (str): Report only this key (all keys when None)
+
+        Returns:
+            dict: Stats for the key, or key id -> stats for all keys
+        """
+        if api_key is not None:
+            return self.for_key(api_key).stats()
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {key_id: limiter.stats() for key_id, limiter in limiters.items()}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter, creating it on first use."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,144 @@
+"""
+Local BM25 retrieval over a generated travel plan.
+
+Chat questions are mostly about the plan itself ("which hotel was that?",
+"how do we get from the station to the fort?"), but the chat prompt only
+carried the travel form. The itinerary and the research results are now
+split into short chunks and indexed with BM25 once per generated plan; each
+question adds only the few best-matching chunks to the prompt, which
+grounds the answer without sending the whole plan on every turn.
+
+Everything runs in memory with the standard library; there is no
+embedding API call.
+"""
+
+import math
+import os
+import re
+from collections import Counter, namedtuple
+
+from schemas import strip_record
+
+TOP_K = int(os.environ.get("AGENTX_CHAT_TOP_K", 4))
+CHUNK_CHARS = 600
+
+Chunk = namedtuple("Chunk", ["source", "text"])
+
+_WORD = re.compile(r"[a-z0-9₹]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how", "i", "in", "is", "it",
+    "me", "my", "of", "on", "or", "the", "there", "to", "we", "what", "when", "where", "which", "with", "you",
+}
+_SUFFIXES = ("ing", "es", "s")
+_HEADING = re.compile(r"^\s*(#+\s|\*\*[^*]+\*\*\s*:?\s*$|day\s+\d+\b)", re.IGNORECASE)
+
+
+def tokenize(text):
+    """Lowercase words without stopwords, with plural and -ing endings removed."""
+    tokens = []
+    for word in _WORD.findall(str(text).lower()):
+        if word in _STOPWORDS:
+            continue
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                break
+        tokens.append(word)
+    return tokens
+
+
+def chunk_text(source, text, max_chars=CHUNK_CHARS):
+    """
+    Split one result into chunks of whole lines
+
+    A chunk ends at a heading or "Day N" line, or once it reaches
+    max_chars, so a chunk usually covers one day or one topic.
+
+    Args:
+        source (str): step_results key (or "itinerary") the text came from
+        text (str): The agent output
+        max_chars (int): Preferred longest chunk
+
+    Returns:
+        list: Chunk tuples
+    """
+    chunks = []
+    current = []
+    size = 0
+    for line in strip_record(text).splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if current and (_HEADING.match(line) or size + len(line) > max_chars):
+            chunks.append(Chunk(source, "\n".join(current)))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        chunks.append(Chunk(source, "\n".join(current)))
+    return chunks
+
+
+class PlanIndex:
+    """BM25 index over the chunks of one travel plan (see module docstring)."""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = list(chunks)
+        self.k1 = k1
+        self.b = b
+        self._lengths = []
+        self._postings = {}
+        for index, chunk in enumerate(self.chunks):
+            counts = Counter(tokenize(chunk.text))
+            self._lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                self._postings.setdefault(term, []).append((index, count))
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        total = len(self.chunks)
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search(self, query, k=TOP_K):
+        """
+        Best-matching chunks for a question
+
+        Args:
+            query (str): The user's question
+            k (int): Most chunks to return
+
+        Returns:
+            list: Chunk tuples, best first (empty if nothing matches)
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for index, count in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / self._average_length)
+                scores[index] = scores.get(index, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        best = sorted(scores, key=lambda index: (-scores[index], index))[:k]
+        return [self.chunks[index] for index in best]
+
+
+def build_plan_index(itinerary, step_results):
+    """
+    Index a generated plan for chat retrieval
+
+    Args:
+        itinerary (str): The final itinerary
+        step_results (dict): Research results keyed by step
+
+    Returns:
+        PlanIndex: Index over the itinerary and every research result
+    """
+    chunks = chunk_text("itinerary", itinerary or "")
+    for key, text in step_results.items():
+        if key != "itinerary" and text:
+            chunks.extend(chunk_text(key, text))
+    return PlanIndex(chunks)
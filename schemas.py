@@ -0,0 +1,185 @@
+"""
+Compact structured records for the research agents' results.
+
+Each research agent is asked to end its answer with a fenced ```json block
+holding the key facts in a fixed shape (hotels with tier, area and price,
+transport legs with mode, duration and cost, ...). The itinerary step is
+fed these records instead of the prose, which is several times smaller,
+and the same records are exported with the plan. When a record is missing
+or does not validate, callers fall back to the prose.
+"""
+
+import json
+import re
+
+# Record shape per research step. A dict is an object (unknown keys are
+# dropped, missing ones become null), a one-element list is a list of that
+# shape and str is a short string (numbers are accepted and converted).
+STEP_SCHEMAS = {
+    "destination_research": {
+        "summary": str,
+        "best_time_to_visit": str,
+        "highlights": [str],
+        "tips": [str],
+    },
+    "accommodation": {
+        "hotels": [{"name": str, "tier": str, "area": str, "price_per_night": str}],
+    },
+    "transportation": {
+        "legs": [{"from": str, "to": str, "mode": str, "duration": str, "cost": str}],
+        "local_transport": [str],
+    },
+    "activities": {
+        "activities": [{"name": str, "area": str, "duration": str, "cost": str, "best_time": str}],
+    },
+    "dining": {
+        "restaurants": [{"name": str, "cuisine": str, "area": str, "price_range": str, "must_try": str}],
+    },
+}
+
+# Objects in a list need this key to be kept (a hotel without a name is noise)
+_IDENTITY_KEYS = ("name", "mode")
+
+_FENCE = re.compile(r"```json\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+_OPEN_FENCE = re.compile(r"```json", re.IGNORECASE)
+
+
+class SchemaError(ValueError):
+    """A record does not match its step's schema."""
+
+
+def _example(spec):
+    if isinstance(spec, dict):
+        return {key: _example(value) for key, value in spec.items()}
+    if isinstance(spec, list):
+        return [_example(spec[0])]
+    return "..."
+
+
+def schema_instructions(step):
+    """
+    Prompt suffix asking a research agent for its structured record
+
+    Args:
+        step (str): Research step key
+
+    Returns:
+        str: Instructions to append to the agent's prompt
+    """
+    example = json.dumps(_example(STEP_SCHEMAS[step]), ensure_ascii=False)
+    return (
+        "\n\nAfter your answer, add the key facts as a JSON record in a ```json fenced block "
+        f"with exactly this shape: {example}. Keep every value a short string (prices in ₹), "
+        "list at most 8 items per list and do not add other keys."
+    )
+
+
+def _validate(value, spec, path):
+    if isinstance(spec, dict):
+        if not isinstance(value, dict):
+            raise SchemaError(f"{path or 'record'} should be an object")
+        return {key: None if value.get(key) is None else _validate(value[key], sub, f"{path}.{key}".lstrip("."))
+                for key, sub in spec.items()}
+    if isinstance(spec, list):
+        if not isinstance(value, list):
+            raise SchemaError(f"{path} should be a list")
+        items = []
+        for i, item in enumerate(value):
+            item = _validate(item, spec[0], f"{path}[{i}]")
+            if isinstance(item, dict) and not any(item.get(key) for key in _IDENTITY_KEYS if key in item):
+                continue
+            if item not in (None, "", {}):
+                items.append(item)
+        return items
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise SchemaError(f"{path} should be a string")
+    return " ".join(str(value).split())
+
+
+def validate_record(step, record):
+    """
+    Check a record against its step's schema and normalize it
+
+    Args:
+        step (str): Research step key
+        record: Parsed JSON value
+
+    Returns:
+        dict: The record with unknown keys dropped and missing keys as null
+
+    Raises:
+        SchemaError: If the record has the wrong shape or no content
+    """
+    cleaned = _validate(record, STEP_SCHEMAS[step], "")
+    if not any(cleaned.values()):
+        raise SchemaError("record is empty")
+    return cleaned
+
+
+def strip_record(text):
+    """
+    Remove the JSON record block from an agent's output for display
+
+    Also drops an unterminated block at the end, so partial streamed output
+    never shows half a record.
+    """
+    text = _FENCE.sub("", str(text or ""))
+    match = _OPEN_FENCE.search(text)
+    if match:
+        text = text[:match.start()]
+    return text.rstrip()
+
+
+def extract_record(step, text):
+    """
+    Parse and validate the JSON record at the end of an agent's output
+
+    Args:
+        step (str): Research step key
+        text (str): The agent's full output
+
+    Returns:
+        dict: The validated record, or None if there is no usable record
+    """
+    for block in reversed(_FENCE.findall(str(text or ""))):
+        try:
+            return validate_record(step, json.loads(block))
+        except (ValueError, SchemaError):
+            continue
+    return None
+
+
+def compact_record(record):
+    """Serialize a record for a prompt: no nulls, no whitespace."""
+    def prune(value):
+        if isinstance(value, dict):
+            return {key: prune(item) for key, item in value.items() if item not in (None, "", [])}
+        if isinstance(value, list):
+            return [prune(item) for item in value]
+        return value
+
+    return json.dumps(prune(record), ensure_ascii=False, separators=(",", ":"))
+
+
+def describe_record(record):
+    """Render a record as short markdown bullets (for results that arrive as data only)."""
+    lines = []
+    for key, value in record.items():
+        if not value:
+            continue
+        title = key.replace("_", " ").capitalize()
+        if isinstance(value, list):
+            lines.append(f"**{title}**")
+            for item in value:
+                if isinstance(item, dict):
+                    lines.append("- " + " · ".join(str(v) for v in item.values() if v))
+                else:
+                    lines.append(f"- {item}")
+        else:
+            lines.append(f"**{title}:** {value}")
+    return "\n".join(lines)
+
+
+def record_block(record):
+    """Fenced JSON block for a record, in the form agents are asked to produce."""
+    return "```json\n" + json.dumps(record, ensure_ascii=False) + "\n```"
@@ -0,0 +1,237 @@
+"""
+Semantic near-duplicate cache for the research agents.
+
+Trip requests often differ only cosmetically ("Historical sites, Culture,
+Food" vs "Culture, history, food") or in fields a given agent does not care
+about (destination research for Agra is the same for a 3-day and a 4-day
+trip). Each research step therefore declares which request fields must
+match exactly and which are compared by similarity. Free-text fields are
+embedded locally as hashed character trigrams and searched with cosine
+similarity, so no embedding API is needed.
+"""
+
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from task_cache import CACHE_DIR, DEFAULT_TTL, normalize_text
+
+DEFAULT_THRESHOLD = float(os.environ.get("AGENTX_SEMANTIC_THRESHOLD", 0.88))
+# Most results kept per partition (same step and exact fields); oldest go first
+MAX_ENTRIES = int(os.environ.get("AGENTX_SEMANTIC_MAX_ENTRIES", 50))
+
+# step key -> (fields that must match exactly, fields compared by similarity).
+# Every field the step's prompt contains must be in one of the two (see
+# pipeline.build_input_text); dates and lengths of stay are never fuzzy.
+STEP_FIELDS = {
+    "destination_research": (("destination",), ("preferences",)),
+    "accommodation": (("destination", "start_date", "end_date", "duration", "budget"), ()),
+    "transportation": (("origin", "destination", "start_date", "end_date", "duration", "budget"), ()),
+    "activities": (("destination", "start_date", "duration", "budget"), ("preferences",)),
+    "dining": (("destination", "budget"), ("preferences",)),
+}
+
+_STOPWORDS = {"and", "the", "of", "to", "in", "a", "an", "for", "with", "sites", "places", "spots", "things"}
+_SUFFIXES = ("ical", "ies", "ic", "al", "y", "s")
+_DIMENSIONS = 1024
+
+
+def _stem(word):
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def embed(text):
+    """
+    Embed free text as a sparse, L2-normalized vector of hashed trigrams
+
+    Word order, case, punctuation and simple inflections are ignored, so
+    "Historical sites, Culture" and "culture, history" land close together.
+
+    Args:
+        text (str): Free-text request field
+
+    Returns:
+        dict: Sparse vector {dimension: weight}
+    """
+    words = sorted({_stem(w) for w in re.findall(r"[a-z0-9]+", str(text).lower()) if w not in _STOPWORDS})
+    counts = Counter()
+    for word in words:
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            # Stable hash (Python's hash() is salted per process)
+            trigram = padded[i:i + 3].encode("utf-8")
+            counts[int.from_bytes(trigram, "little") * 2654435761 % _DIMENSIONS] += 1
+    norm = math.sqrt(sum(v * v for v in counts.values()))
+    return {k: v / norm for k, v in counts.items()} if norm else {}
+
+
+def cosine(a, b):
+    """Cosine similarity of two normalized sparse vectors (empty vs empty counts as identical)."""
+    if not a or not b:
+        return 1.0 if not a and not b else 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class SemanticCache:
+    """Per-step vector index of research results, persisted in SQLite."""
+
+    def __init__(self, path=None, threshold=DEFAULT_THRESHOLD, ttl=DEFAULT_TTL, max_entries=MAX_ENTRIES):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "semantic_cache.sqlite3")
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS semantic_results (
+                partition TEXT NOT NULL,
+                vectors TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS semantic_results_partition ON semantic_results (partition, created_at)"
+        )
+        self._conn.commit()
+        # partition -> list of (vectors, value, created_at), oldest first
+        self._index = {}
+        self._conn.execute("DELETE FROM semantic_results WHERE created_at < ?", (time.time() - ttl,))
+        for partition, vectors, value, created_at in self._conn.execute(
+            "SELECT partition, vectors, value, created_at FROM semantic_results ORDER BY created_at"
+        ):
+            vectors = [{int(k): v for k, v in vec.items()} for vec in json.loads(vectors)]
+            self._index.setdefault(partition, []).append((vectors, value, created_at))
+        for partition, entries in self._index.items():
+            if len(entries) > max_entries:
+                self._index[partition] = entries[-max_entries:]
+                self._evict(partition)
+        self._conn.commit()
+
+    def _evict(self, partition):
+        """Delete a partition's rows beyond the newest max_entries (caller commits)."""
+        self._conn.execute(
+            """DELETE FROM semantic_results WHERE partition = ? AND rowid NOT IN (
+                SELECT rowid FROM semantic_results WHERE partition = ? ORDER BY created_at DESC LIMIT ?
+            )""",
+            (partition, partition, self.max_entries)
+        )
+
+    @staticmethod
+    def _partition(step, user_input, model):
+        exact_fields, _ = STEP_FIELDS[step]
+        # A result is only reused for the model (route) that would have produced it
+        return "|".join([step, model] + [normalize_text(user_input.get(f, "")) for f in exact_fields])
+
+    @staticmethod
+    def _vectors(step, user_input):
+        _, fuzzy_fields = STEP_FIELDS[step]
+        return [embed(user_input.get(f, "")) for f in fuzzy_fields]
+
+    def lookup(self, step, user_input, model):
+        """
+        Find a cached result for a similar request
+
+        Args:
+            step (str): Research step key (see STEP_FIELDS)
+            user_input (dict): Trip details from the travel form
+            model (str): Model or model route the step runs on
+                (pipeline.cache_model)
+
+        Returns:
+            tuple: (result, similarity) for the best match above the
+            threshold, or None
+        """
+        if step not in STEP_FIELDS:
+            return None
+        partition = self._partition(step, user_input, model)
+        query = self._vectors(step, user_input)
+        cutoff = time.time() - self.ttl
+        best = None
+        with self._lock:
+            for vectors, value, created_at in self._index.get(partition, []):
+                if created_at < cutoff:
+                    continue
+                # Every free-text field has to be similar, not just on average
+                similarity = min((cosine(q, v) for q, v in zip(query, vectors)), default=1.0)
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (value, similarity)
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def store(self, step, user_input, model, value):
+        """
+        Add a freshly generated result to the index
+
+        A result for the same request replaces the old one, expired results
+        are dropped and each partition keeps at most max_entries results.
+
+        Args:
+            step (str): Research step key (see STEP_FIELDS)
+            user_input (dict): Trip details the result was generated for
+            model (str): Model or model route that generated it
+            value (str): The agent output
+        """
+        if step not in STEP_FIELDS or not value:
+            return
+        partition = self._partition(step, user_input, model)
+        vectors = self._vectors(step, user_input)
+        serialized = json.dumps(vectors)
+        now = time.time()
+        cutoff = now - self.ttl
+        with self._lock:
+            for key in list(self._index):
+                kept = [entry for entry in self._index[key] if entry[2] >= cutoff]
+                if kept:
+                    self._index[key] = kept
+                else:
+                    del self._index[key]
+            entries = [entry for entry in self._index.get(partition, []) if entry[0] != vectors]
+            entries.append((vectors, value, now))
+            self._index[partition] = entries[-self.max_entries:]
+            self._conn.execute("DELETE FROM semantic_results WHERE created_at < ?", (cutoff,))
+            self._conn.execute(
+                "DELETE FROM semantic_results WHERE partition = ? AND vectors = ?", (partition, serialized)
+            )
+            self._conn.execute(
+                "INSERT INTO semantic_results (partition, vectors, value, created_at) VALUES (?, ?, ?, ?)",
+                (partition, serialized, value, now)
+            )
+            self._evict(partition)
+            self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the number of indexed results."""
+        with self._lock:
+            entries = sum(len(items) for items in self._index.values())
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Return the process-wide semantic cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticCache()
+        return _cache
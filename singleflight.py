@@ -0,0 +1,101 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+
+When several sessions ask for the same thing at the same time (a popular
+trip on a holiday weekend), only the first caller (the leader) does the
+work; everyone else with the same key waits on the leader's future and
+shares its result. If the leader fails, each waiting caller runs the call
+itself, so one user's bad API key never becomes everyone's error.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class LeaderAbandoned(Exception):
+    """The leading call stopped before producing a result."""
+
+
+class SingleFlight:
+    """Process-wide registry of in-flight calls keyed by request identity."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def join(self, key):
+        """
+        Join the in-flight call for a key, becoming its leader if there is none
+
+        Args:
+            key (str): Identity of the call
+
+        Returns:
+            tuple: (future, is_leader). A leader must call finish() exactly once.
+        """
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def finish(self, key, result=None, error=None):
+        """
+        Publish the leader's outcome to every waiting caller
+
+        Args:
+            key (str): Identity of the call
+            result: The result to share (ignored when error is given)
+            error (Exception): The leader's failure, if any
+        """
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn, is_success=lambda result: True):
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key (str): Identity of the call
+            fn (callable): Zero-argument function doing the work
+            is_success (callable): Decides whether a returned value may be
+                shared; followers re-run fn themselves when it returns False
+
+        Returns:
+            The result of fn (the leader's, or the caller's own on fallback)
+        """
+        future, leader = self.join(key)
+        if not leader:
+            try:
+                result = future.result()
+                if is_success(result):
+                    return result
+            except Exception:
+                pass
+            return fn()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, error=e if isinstance(e, Exception) else LeaderAbandoned(str(e)))
+            raise
+        self.finish(key, result=result)
+        return result
+
+    def stats(self):
+        """Return call and coalesced-call counters."""
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
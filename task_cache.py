@@ -0,0 +1,170 @@
+"""
+Persistent cache for agent task results.
+
+Results are keyed by task name, the model(s) that run the task (see
+pipeline.cache_model) and a hash of the normalized prompt,
+and stored in SQLite so identical trip requests are served from disk across
+sessions and restarts. Entries expire after a TTL and the least recently
+used ones are evicted once the cache grows past its size limits.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.environ.get("AGENTX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".agentx_cache"))
+DEFAULT_TTL = int(os.environ.get("AGENTX_CACHE_TTL", 7 * 24 * 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get("AGENTX_CACHE_MAX_ENTRIES", 5000))
+DEFAULT_MAX_BYTES = int(os.environ.get("AGENTX_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+
+def normalize_text(text):
+    """Lowercase and collapse whitespace so cosmetic differences share a key."""
+    return " ".join(str(text).lower().split())
+
+
+def make_key(task_name, input_text, model):
+    """
+    Build the cache key for a task run
+
+    Args:
+        task_name (str): Stable name of the task (e.g. "dining")
+        input_text (str): The prompt sent to the task
+        model (str): Model (or route of models) the task runs on, so a
+            model change doesn't serve the old model's results
+
+    Returns:
+        str: Hex digest identifying the task run
+    """
+    digest = hashlib.sha256(normalize_text(input_text).encode("utf-8")).hexdigest()
+    return f"{task_name}:{model}:{digest}"
+
+
+class TaskCache:
+    """SQLite-backed result cache with TTL, LRU eviction and hit/miss counters."""
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "task_cache.sqlite3")
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS task_results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_task_results_accessed ON task_results (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key, count=True):
+        """
+        Look up a cached result
+
+        Args:
+            key (str): Key from make_key
+            count (bool): Count the lookup in the hit/miss counters; False
+                for a re-check of a key that was just looked up
+
+        Returns:
+            str: The cached result, or None on a miss or expired entry
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM task_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM task_results WHERE key = ?", (key,))
+                    self._conn.commit()
+                if count:
+                    self.misses += 1
+                return None
+            self._conn.execute("UPDATE task_results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            if count:
+                self.hits += 1
+            return row[0]
+
+    def put(self, key, value):
+        """
+        Store a result and evict old entries if the cache is over its limits
+
+        Args:
+            key (str): Key from make_key
+            value (str): The task result
+        """
+        if not value:
+            return
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO task_results (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        # Expired entries first, then least recently used until within limits
+        self._conn.execute("DELETE FROM task_results WHERE created_at < ?", (now - self.ttl,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM task_results").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM task_results ORDER BY accessed_at").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM task_results WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+
+    def clear(self):
+        """Remove every cached result."""
+        with self._lock:
+            self._conn.execute("DELETE FROM task_results")
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Report cache usage
+
+        Returns:
+            dict: hits, misses, hit rate, entry count and stored bytes
+        """
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM task_results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide task cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TaskCache()
+        return _cache
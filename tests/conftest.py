@@ -0,0 +1,24 @@
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# Keep the tests away from the real caches, limits and metrics port; these
+# must be set before the app modules are imported
+os.environ.setdefault("AGENTX_CACHE_DIR", tempfile.mkdtemp(prefix="agentx-tests-"))
+os.environ.setdefault("AGENTX_GEMINI_RPM", "1000000")
+os.environ.setdefault("AGENTX_GEMINI_TPM", "1000000000")
+os.environ.setdefault("AGENTX_METRICS_PORT", "0")
+
+
+def wait_until(condition, timeout=5.0):
+    """Poll condition() until it holds; fail the test after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.005)
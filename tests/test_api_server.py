@@ -0,0 +1,81 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+from api_server import HTTPError, _json_body, handle_connection, route
+
+KEYS = {"x-gemini-api-key": "AIapi-test-key"}
+
+
+def call(method, path, headers=None, body=b""):
+    return asyncio.run(route(method, path, headers or {}, body))
+
+
+def error_of(method, path, headers=None, body=b""):
+    with pytest.raises(HTTPError) as caught:
+        call(method, path, headers, body)
+    return caught.value.status
+
+
+def test_json_body_must_be_an_object():
+    assert _json_body(b"") == {}
+    assert _json_body(b'{"destination": "Agra"}') == {"destination": "Agra"}
+    for body in (b"not json", b"[1, 2]"):
+        with pytest.raises(HTTPError):
+            _json_body(body)
+
+
+def test_health_and_unknown_routes():
+    status, payload = call("GET", "/health")
+    assert (status, payload["status"]) == (HTTPStatus.OK, "ok")
+    assert error_of("GET", "/itineraries") == HTTPStatus.NOT_FOUND
+    assert error_of("DELETE", "/health") == HTTPStatus.NOT_FOUND
+    assert error_of("GET", "/itineraries/no-such-job", KEYS) == HTTPStatus.NOT_FOUND
+
+
+def test_submitting_needs_a_gemini_key(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    assert error_of("POST", "/itineraries", body=b'{"destination": "Agra"}') == HTTPStatus.UNAUTHORIZED
+
+
+@pytest.mark.parametrize("trip", [
+    {"duration": 3},
+    {"destination": "Agra", "duration": True},
+    {"destination": "Agra", "duration": 2.7},
+    {"destination": "Agra", "duration": 45},
+    {"destination": "Agra", "start_date": "06/11/2026"},
+])
+def test_invalid_trips_are_rejected_before_a_job_starts(trip):
+    assert error_of("POST", "/itineraries", KEYS, json.dumps(trip).encode()) == HTTPStatus.BAD_REQUEST
+
+
+def exchange(raw):
+    """Send raw bytes to a fresh server; returns the status line and the rest once the server closes."""
+    async def run():
+        server = await asyncio.start_server(handle_connection, "127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(raw)
+            await writer.drain()
+            status_line = (await reader.readline()).decode().strip()
+            rest = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return status_line, rest
+        finally:
+            server.close()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_bad_content_length_is_a_400_and_closes_the_connection(length):
+    status_line, rest = exchange(f"POST /chat HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+    assert status_line == "HTTP/1.1 400 Bad Request"
+    assert json.loads(rest.split(b"\r\n\r\n", 1)[1]) == {"error": "Invalid Content-Length header."}
+
+
+def test_oversized_body_is_refused():
+    status_line, _ = exchange(b"POST /chat HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n")
+    assert status_line == "HTTP/1.1 413 Request Entity Too Large"
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+import batch
+from batch import completed_ids, end_with_newline, generate, load_requests, main
+
+
+def write_lines(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_load_requests_uses_ids_or_line_numbers(tmp_path):
+    path = write_lines(tmp_path / "trips.jsonl", [
+        '{"id": 7, "destination": "Agra"}',
+        "",
+        '{"destination": "Goa"}',
+    ])
+    assert load_requests(path) == ([("7", {"id": 7, "destination": "Agra"}), ("line-3", {"destination": "Goa"})], [])
+
+
+def test_unreadable_lines_become_error_results(tmp_path):
+    path = write_lines(tmp_path / "trips.jsonl", [
+        '{"destination": "Agra"',
+        '["Goa"]',
+        '{"destination": "Goa"}',
+    ])
+    trips, invalid = load_requests(path)
+    assert trips == [("line-3", {"destination": "Goa"})]
+    assert [(result["id"], result["status"], result["attempts"]) for result in invalid] == [
+        ("line-1", "error", 0), ("line-2", "error", 0)]
+    assert invalid[0]["error"].startswith("invalid JSON")
+    assert invalid[1]["request"] == ["Goa"]
+
+
+def test_main_reports_unreadable_lines_and_generates_the_rest(tmp_path, monkeypatch):
+    trips = write_lines(tmp_path / "trips.jsonl", ["not json", '{"id": "goa", "destination": "Goa"}'])
+    output = tmp_path / "out.jsonl"
+    monkeypatch.setattr(batch, "run_pipeline", lambda user_input, gemini_api_key, **kwargs: {
+        "itinerary": "Day 1", "step_results": {}, "records": {}, "tailvy_used": False})
+    assert main([trips, "-o", str(output), "--gemini-api-key", "AIk"]) == 1
+    results = {result["id"]: result["status"] for result in map(json.loads, output.read_text().splitlines())}
+    assert results == {"line-1": "error", "goa": "ok"}
+
+
+def test_completed_ids_skips_errors_and_cut_lines(tmp_path):
+    path = write_lines(tmp_path / "out.jsonl", [
+        '{"id": "a", "status": "ok"}',
+        '{"id": "b", "status": "error"}',
+        '{"id": "c", "sta',
+    ])
+    assert completed_ids(path) == {"a"}
+    assert completed_ids(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_end_with_newline_terminates_a_cut_line(tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(b'{"id": "a"}\n{"id": "b", "sta')
+    end_with_newline(str(path))
+    end_with_newline(str(path))
+    assert path.read_bytes() == b'{"id": "a"}\n{"id": "b", "sta\n'
+
+
+def test_malformed_request_fails_without_retrying(monkeypatch):
+    monkeypatch.setattr(batch, "run_pipeline", lambda *args, **kwargs: pytest.fail("must not run"))
+    result = generate("r1", {"destination": "Agra", "duration": 2.5}, "AIk")
+    assert (result["status"], result["attempts"]) == ("error", 0)
+    assert "duration" in result["error"]
+
+
+def test_failures_are_retried_then_reported(monkeypatch):
+    calls = []
+
+    def run_pipeline(user_input, gemini_api_key, **kwargs):
+        calls.append(user_input["destination"])
+        if len(calls) < 2:
+            raise RuntimeError("503 unavailable")
+        kwargs["on_event"]("dining", "done", "Pinch of Spice")
+        return {"itinerary": "Day 1", "step_results": {"dining": "Pinch of Spice"}, "records": {},
+                "tailvy_used": False}
+
+    monkeypatch.setattr(batch, "run_pipeline", run_pipeline)
+    result = generate("r1", {"destination": "Agra"}, "AIk", retries=2, backoff=0)
+    assert (result["status"], result["attempts"]) == ("ok", 2)
+    assert result["timings"]["dining"]["source"] == "done"
+    json.dumps(result)
+
+    calls.clear()
+    monkeypatch.setattr(batch, "run_pipeline", lambda *args, **kwargs: calls.append(1) or 1 / 0)
+    result = generate("r2", {"destination": "Agra"}, "AIk", retries=1, backoff=0)
+    assert (result["status"], result["attempts"], len(calls)) == ("error", 2, 2)
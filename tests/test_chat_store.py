@@ -0,0 +1,38 @@
+from chat_store import ChatStore
+
+
+def fill(store, count):
+    for i in range(count):
+        store.add_exchange(f"Question {i}?", f"Answer {i}.", "10:00")
+
+
+def test_recent_exchanges_are_passed_verbatim_and_older_ones_summarized():
+    store = ChatStore(context_turns=2)
+    fill(store, 3)
+    summary, recent = store.context()
+    assert summary == "- Asked: Question 0? Answered: Answer 0."
+    assert recent == [("Question 1?", "Answer 1."), ("Question 2?", "Answer 2.")]
+
+
+def test_summary_drops_the_oldest_lines_over_its_budget():
+    store = ChatStore(context_turns=1, summary_token_budget=25)
+    fill(store, 6)
+    lines = store.summary.splitlines()
+    assert lines[-1] == "- Asked: Question 4? Answered: Answer 4."
+    assert len(lines) < 5
+
+
+def test_display_history_is_bounded_but_counts_every_message():
+    store = ChatStore(max_messages=4)
+    fill(store, 3)
+    assert len(store) == 4
+    assert store.total == 6
+
+
+def test_pages_run_newest_first():
+    store = ChatStore()
+    fill(store, 3)
+    assert store.page_count(size=4) == 2
+    assert [m["text"] for m in store.page(0, size=4)] == ["Answer 2.", "Question 2?", "Answer 1.", "Question 1?"]
+    assert [m["text"] for m in store.page(1, size=4)] == ["Answer 0.", "Question 0?"]
+    assert ChatStore().page_count() == 1
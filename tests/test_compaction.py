@@ -0,0 +1,43 @@
+from compaction import allocate_budget, compact_section, compact_sections, estimate_tokens
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("abcde") == 2
+
+
+def test_small_sections_keep_their_size_and_large_ones_share_the_rest():
+    assert allocate_budget({"dining": 100, "accommodation": 2000, "activities": 3000}, 1000) == {
+        "dining": 100, "accommodation": 450, "activities": 450}
+
+
+def test_everything_fits_when_the_budget_allows():
+    assert allocate_budget({"dining": 100, "activities": 200}, 1000) == {"dining": 100, "activities": 200}
+
+
+def test_compact_section_drops_blank_and_repeated_lines():
+    text = "Stay near the fort.\n\n  Stay near   the fort.\nCarry cash."
+    assert compact_section(text, 100) == "Stay near the fort.\nCarry cash."
+
+
+def test_compact_section_keeps_factual_lines_in_order():
+    lines = [
+        "Agra is a city with a long and interesting history that visitors love.",
+        "Hotel Taj Vilas, Fatehabad Road: ₹4,500 per night",
+        "It is a lovely place with many things to see and enjoy for everyone.",
+        "The Taj Mahal opens at 6 am and closes at 7 pm",
+    ]
+    compacted = compact_section("\n".join(lines), 30)
+    kept = compacted.splitlines()
+    assert kept == ["Hotel Taj Vilas, Fatehabad Road: ₹4,500 per night", "The Taj Mahal opens at 6 am and closes at 7 pm"]
+    assert estimate_tokens(compacted) <= 30
+
+
+def test_compact_sections_reports_sizes():
+    sections = {"dining": "Pinch of Spice: ₹800 for two", "activities": "x" * 4000}
+    compacted, stats = compact_sections(sections, token_budget=200)
+    assert compacted["dining"] == sections["dining"]
+    assert stats["original_tokens"] == 7 + 1000
+    assert stats["compacted_tokens"] <= 200
+    assert stats["sections"]["activities"][0] == 1000
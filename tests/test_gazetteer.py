@@ -0,0 +1,49 @@
+import pytest
+
+from gazetteer import Gazetteer, max_typos, normalize_place
+
+PLACES = """name,kind,state,latitude,longitude,aliases
+Mumbai,city,Maharashtra,19.0760,72.8777,Bombay
+Varanasi,city,Uttar Pradesh,25.3176,82.9739,Banaras|Benares
+Goa,state,Goa,15.2993,74.1240,
+Panaji,city,Goa,15.4909,73.8278,Panjim
+Gateway of India,landmark,Maharashtra,18.9220,72.8347,
+"""
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    path = tmp_path / "places.csv"
+    path.write_text(PLACES, encoding="utf-8")
+    return Gazetteer(str(path))
+
+
+def test_normalize_place():
+    assert normalize_place("  Bengalūru,  KA! ") == "bengaluru ka"
+    assert normalize_place(None) == ""
+
+
+def test_short_names_must_match_exactly():
+    assert [max_typos(key) for key in ("goa", "agra", "jaipur", "thiruvananthapuram")] == [0, 0, 1, 2]
+
+
+def test_lookup_by_name_and_alias(gazetteer):
+    assert gazetteer.lookup("mumbai").name == "Mumbai"
+    assert gazetteer.lookup("Bombay").name == "Mumbai"
+    assert gazetteer.lookup("benares").state == "Uttar Pradesh"
+
+
+def test_lookup_tolerates_typos_unless_fuzzy_is_off(gazetteer):
+    assert gazetteer.lookup("Varansi").name == "Varanasi"
+    assert gazetteer.lookup("Varansi", fuzzy=False) is None
+    assert gazetteer.lookup("Gao") is None
+    assert gazetteer.lookup("") is None
+
+
+def test_suggest_prefix_matches_cities_first(gazetteer):
+    assert [place.name for place in gazetteer.suggest("g")] == ["Goa", "Gateway of India"]
+    assert [place.name for place in gazetteer.suggest("pan", limit=1)] == ["Panaji"]
+
+
+def test_suggest_falls_back_to_misspellings(gazetteer):
+    assert [place.name for place in gazetteer.suggest("Mumbay")] == ["Mumbai"]
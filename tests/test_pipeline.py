@@ -0,0 +1,130 @@
+import json
+import types
+
+import pytest
+
+import pipeline
+from pipeline import late_results_material, stale_steps, step_fingerprints, step_names, trip_to_user_input
+
+
+def with_record(prose, record):
+    return f"{prose}\n\n```json\n{json.dumps(record)}\n```"
+
+
+DESTINATION = with_record(
+    "Agra is home to the Taj Mahal and Agra Fort.",
+    {
+        "summary": "Mughal capital on the Yamuna.",
+        "best_time_to_visit": "October to March",
+        "highlights": ["Taj Mahal", "Agra Fort", "Sunset at Mehtab Bagh"],
+        "tips": ["Carry water", "Book tickets online"],
+    },
+)
+DINING = with_record(
+    "Eat well in Agra.",
+    {"restaurants": [{"name": "Pinch of Spice", "cuisine": "Mughlai", "area": "Fatehabad Road",
+                      "price_range": "₹₹", "must_try": "Dal makhani"}]},
+)
+
+
+def test_step_names_reads_string_lists_in_the_record():
+    assert step_names("destination_research", DESTINATION) == {"taj mahal", "agra fort", "mehtab bagh"}
+
+
+def test_step_names_reads_record_objects():
+    assert step_names("dining", DINING) == {"pinch of spice"}
+
+
+def test_step_names_falls_back_to_proper_names_in_the_prose():
+    assert step_names("dining", "Try the Dasaprakash Restaurant near Sadar Bazaar.") == {
+        "dasaprakash restaurant", "sadar bazaar"}
+
+
+def test_draft_covering_late_highlights_is_kept():
+    draft = "Day 1: Sunrise at the Taj Mahal, then Agra Fort. Evening at Mehtab Bagh."
+    assert late_results_material(draft, {"destination_research": DESTINATION}) == []
+
+
+def test_draft_missing_late_names_is_refined():
+    draft = "Day 1: Sunrise at the Taj Mahal. Dinner at the hotel."
+    assert late_results_material(draft, {"destination_research": DESTINATION, "dining": DINING}) == [
+        "destination_research", "dining"]
+
+
+def test_late_result_without_names_is_material():
+    assert late_results_material("Day 1: Taj Mahal", {"dining": "eat local food, it is cheap"}) == ["dining"]
+
+
+def test_no_late_results_keeps_the_draft():
+    assert late_results_material("Day 1: Taj Mahal", {}) == []
+
+
+TRIP = trip_to_user_input({"origin": "Delhi", "destination": "Agra", "start_date": "2026-11-06", "duration": 3,
+                           "preferences": "History, Food", "budget": "Mid-range"})
+
+
+def previous_run(user_input):
+    return {"step_results": {key: f"{key} result" for key in step_fingerprints(user_input)},
+            "fingerprints": step_fingerprints(user_input)}
+
+
+def test_everything_is_stale_without_a_previous_run():
+    assert stale_steps(TRIP, None) == set(step_fingerprints(TRIP))
+
+
+def test_unchanged_trip_keeps_every_step():
+    assert stale_steps(dict(TRIP), previous_run(TRIP)) == set()
+
+
+def test_changing_the_budget_reruns_only_the_steps_that_use_it():
+    assert stale_steps(dict(TRIP, budget="Luxury"), previous_run(TRIP)) == {
+        "accommodation", "transportation", "dining", "itinerary"}
+
+
+def test_special_requirements_are_not_prompted_so_rerun_nothing():
+    assert stale_steps(dict(TRIP, special_requirements="Wheelchair access"), previous_run(TRIP)) == set()
+
+
+def test_a_missing_previous_result_is_stale():
+    previous = previous_run(TRIP)
+    previous["step_results"]["dining"] = ""
+    assert stale_steps(TRIP, previous) == {"dining", "itinerary"}
+
+
+@pytest.mark.parametrize("duration, days", [(4, 4), (3.0, 3), ("5", 5)])
+def test_trip_duration_accepts_whole_numbers(duration, days):
+    assert trip_to_user_input({"destination": "Agra", "duration": duration})["duration"] == days
+
+
+@pytest.mark.parametrize("duration", [True, 2.7, "2.7", None, float("nan"), 0, 31])
+def test_trip_duration_rejects_bools_fractions_and_out_of_range(duration):
+    with pytest.raises(ValueError, match="duration"):
+        trip_to_user_input({"destination": "Agra", "duration": duration})
+
+
+@pytest.fixture
+def two_model_route(monkeypatch):
+    """Route every task flash -> pro; an answer passes its checks if it starts with "full"."""
+    answers = {}
+    monkeypatch.setattr(pipeline, "travel_runners", lambda: types.SimpleNamespace(model_routing=True))
+    monkeypatch.setattr(pipeline, "models_for", lambda task_name, routing=None: ["flash", "pro"])
+    monkeypatch.setattr(pipeline, "check_output", lambda task_name, text: [] if text.startswith("full") else ["short"])
+    monkeypatch.setattr(pipeline, "stream_task", lambda task, input_text, api_key, on_progress=None, stage=None,
+                        model=None: (chunk for chunk in answers[model]))
+    return answers
+
+
+def test_routed_stream_shows_held_output_and_withdraws_it_on_escalation(two_model_route):
+    two_model_route.update(flash=["sh", "ort"], pro=["full ", "answer"])
+    provisional = []
+    chunks = list(pipeline.routed_stream_task("dining", None, "prompt", "AIk", on_provisional=provisional.append))
+    assert provisional == ["sh", "ort", None]
+    assert chunks == ["full ", "answer"]
+
+
+def test_routed_stream_yields_the_accepted_held_output_in_full(two_model_route):
+    two_model_route.update(flash=["full ", "answer"])
+    provisional = []
+    chunks = list(pipeline.routed_stream_task("dining", None, "prompt", "AIk", on_provisional=provisional.append))
+    assert provisional == ["full ", "answer"]
+    assert chunks == ["full answer"]
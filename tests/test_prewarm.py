@@ -0,0 +1,51 @@
+import pytest
+
+from prewarm import PrewarmStore, plan_requests, report, route_key
+
+TRIP = {"origin": "Delhi", "destination": "Agra", "duration": 3, "budget": "Mid-range",
+        "preferences": "Historical sites, Culture, Food", "start_date": "2026-11-06", "end_date": "2026-11-09"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PrewarmStore(path=str(tmp_path / "prewarm.sqlite3"))
+
+
+def test_route_key_ignores_dates_and_case():
+    assert route_key(TRIP) == route_key(dict(TRIP, destination="  agra ", start_date="2027-01-01"))
+    assert route_key(TRIP) != route_key(dict(TRIP, budget="Luxury"))
+
+
+def test_lookup_returns_the_plan_with_its_dates(store):
+    assert store.lookup(TRIP) is None
+    store.store(TRIP, {"dining": "Pinch of Spice"}, "Day 1: Taj Mahal")
+    plan = store.lookup(dict(TRIP, start_date="2026-12-01"))
+    assert plan == {"step_results": {"dining": "Pinch of Spice"}, "itinerary": "Day 1: Taj Mahal",
+                    "start_date": "2026-11-06", "end_date": "2026-11-09"}
+
+
+def test_stale_plans_are_not_served(tmp_path):
+    store = PrewarmStore(path=str(tmp_path / "prewarm.sqlite3"), max_age_days=0)
+    store.store(TRIP, {}, "Day 1")
+    assert store.lookup(TRIP) is None
+
+
+def test_lookup_counts_survive_a_new_store(tmp_path, store):
+    store.store(TRIP, {}, "Day 1")
+    store.lookup(TRIP)
+    store.lookup(dict(TRIP, destination="Jaipur"))
+    assert store.lookup_counts() == {"hit": 1, "miss": 1}
+    store.flush()
+    reopened = PrewarmStore(path=str(tmp_path / "prewarm.sqlite3"))
+    assert reopened.lookup_counts() == {"hit": 1, "miss": 1}
+
+
+def test_report_counts_coverage_and_hit_rate(store):
+    requests = plan_requests(routes=[("Delhi", "Agra")], durations=[3], budgets=["Mid-range", "Luxury"])
+    assert len(requests) == 2
+    store.store(requests[0], {}, "Day 1")
+    store.lookup(requests[0])
+    store.lookup(requests[1])
+    summary = report(store, requests)
+    assert (summary["fresh"], summary["missing"], summary["coverage"]) == (1, 1, 0.5)
+    assert summary["hit_rate"] == 0.5
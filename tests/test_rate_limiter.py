@@ -0,0 +1,115 @@
+import threading
+
+import pytest
+
+from conftest import wait_until
+from rate_limiter import KeyLimiter, Slot, TokenBucket, is_throttle_error
+
+
+def test_queued_callers_are_served_in_arrival_order():
+    limiter = KeyLimiter(rpm=100000, tpm=1e9, max_concurrency=1)
+    limiter.acquire(10)
+    served = []
+
+    def call(name):
+        limiter.acquire(10)
+        served.append(name)
+        limiter.release("success")
+
+    threads = []
+    for count, name in enumerate("abcd", start=1):
+        thread = threading.Thread(target=call, args=(name,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: limiter.stats()["queued"] == count)
+    limiter.release("success")
+    for thread in threads:
+        thread.join(5)
+    assert served == list("abcd")
+
+
+def test_throttling_halves_the_window_down_to_one():
+    limiter = KeyLimiter(max_concurrency=8)
+    windows = []
+    for _ in range(4):
+        limiter.acquire(10)
+        limiter.release("throttled")
+        windows.append(limiter.window)
+    assert windows == [4, 2, 1, 1]
+    assert limiter.stats()["throttled"] == 4
+
+
+def test_successes_grow_the_window_back_additively():
+    limiter = KeyLimiter(max_concurrency=4)
+    limiter.window = 1.0
+    windows = []
+    for _ in range(3):
+        limiter.acquire(10)
+        limiter.release("success")
+        windows.append(round(limiter.window, 3))
+    assert windows == [2.0, 2.5, 2.9]
+    for _ in range(50):
+        limiter.acquire(10)
+        limiter.release("success")
+    assert limiter.window == 4
+
+
+def test_failures_leave_the_window_alone():
+    limiter = KeyLimiter(max_concurrency=4)
+    limiter.acquire(10)
+    limiter.release("failed")
+    assert limiter.window == 4
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_shrunk_window_holds_back_the_next_call():
+    limiter = KeyLimiter(rpm=100000, tpm=1e9, max_concurrency=2)
+    limiter.acquire(10)
+    limiter.release("throttled")
+    limiter.acquire(10)
+    started = threading.Event()
+    acquired = threading.Event()
+
+    def call():
+        started.set()
+        limiter.acquire(10)
+        acquired.set()
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    started.wait(5)
+    assert not acquired.wait(0.2)
+    limiter.release("success")
+    assert acquired.wait(5)
+    limiter.release("success")
+    thread.join(5)
+
+
+def test_slot_reports_throttle_errors_as_throttled():
+    limiter = KeyLimiter(max_concurrency=8)
+    states = []
+    with pytest.raises(RuntimeError):
+        with Slot(limiter, 10, states.append):
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota)")
+    assert states == ["queued", "running"]
+    assert limiter.window == 4
+    assert limiter.stats()["in_flight"] == 0
+
+
+@pytest.mark.parametrize("error, throttled", [
+    (RuntimeError("429 Too Many Requests"), True),
+    (TimeoutError(), True),
+    (RuntimeError("Request timed out"), True),
+    (ValueError("invalid API key"), False),
+])
+def test_is_throttle_error(error, throttled):
+    assert is_throttle_error(error) is throttled
+
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(60)
+    bucket.take(60, bucket.updated)
+    assert bucket.wait_time(1, bucket.updated) == pytest.approx(1.0)
+    assert bucket.wait_time(1, bucket.updated + 1.0) == 0.0
+    # A request larger than the bucket goes once the bucket is full
+    assert bucket.wait_time(600, bucket.updated + 60.0) == 0.0
@@ -0,0 +1,42 @@
+from retrieval import Chunk, PlanIndex, build_plan_index, chunk_text, tokenize
+from schemas import record_block
+
+ITINERARY = """Day 1
+Arrive at Agra Cantt station and take an auto to the hotel.
+Evening walk at Mehtab Bagh.
+Day 2
+Sunrise at the Taj Mahal, then Agra Fort.
+Dinner at Pinch of Spice."""
+
+
+def test_tokenize_drops_stopwords_and_plural_endings():
+    assert tokenize("Where are the forts and gardens?") == ["fort", "garden"]
+    assert tokenize("Booking costs ₹500") == ["book", "cost", "₹500"]
+
+
+def test_chunks_split_at_day_headings_and_skip_the_record():
+    text = ITINERARY + "\n" + record_block({"activities": [{"name": "Taj Mahal"}]})
+    chunks = chunk_text("itinerary", text)
+    assert [chunk.text.splitlines()[0] for chunk in chunks] == ["Day 1", "Day 2"]
+    assert all("json" not in chunk.text for chunk in chunks)
+
+
+def test_long_sections_are_split_by_size():
+    text = "\n".join(f"Line {i} about the old city markets" for i in range(40))
+    assert all(len(chunk.text) <= 200 for chunk in chunk_text("activities", text, max_chars=200))
+
+
+def test_search_ranks_the_matching_chunk_first():
+    index = build_plan_index(ITINERARY, {
+        "dining": "Pinch of Spice on Fatehabad Road serves Mughlai food.",
+        "accommodation": "",
+    })
+    assert len(index) == 3
+    best = index.search("Where is Pinch of Spice?", k=1)
+    assert best == [Chunk("dining", "Pinch of Spice on Fatehabad Road serves Mughlai food.")]
+    assert index.search("sunrise", k=2)[0].text.startswith("Day 2")
+
+
+def test_search_without_matching_terms_is_empty():
+    assert build_plan_index(ITINERARY, {}).search("visa requirements") == []
+    assert PlanIndex([]).search("anything") == []
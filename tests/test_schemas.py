@@ -0,0 +1,49 @@
+import pytest
+
+from schemas import (
+    SchemaError, compact_record, describe_record, extract_record, record_block, strip_record, validate_record
+)
+
+
+def test_validate_record_normalizes_values_and_drops_unknown_keys():
+    record = {"hotels": [{"name": " The  Oberoi ", "price_per_night": 25000, "stars": 5}], "extra": True}
+    assert validate_record("accommodation", record) == {
+        "hotels": [{"name": "The Oberoi", "tier": None, "area": None, "price_per_night": "25000"}]}
+
+
+def test_list_items_without_a_name_are_dropped():
+    record = {"restaurants": [{"cuisine": "Mughlai"}, {"name": "Peshawri"}]}
+    assert [r["name"] for r in validate_record("dining", record)["restaurants"]] == ["Peshawri"]
+
+
+@pytest.mark.parametrize("record", [
+    [],
+    {"hotels": "The Oberoi"},
+    {"hotels": [{"name": True}]},
+    {"hotels": []},
+])
+def test_validate_record_rejects_wrong_shapes_and_empty_records(record):
+    with pytest.raises(SchemaError):
+        validate_record("accommodation", record)
+
+
+def test_extract_record_uses_the_last_valid_block():
+    text = "Hotels:\n" + record_block({"hotels": "broken"}) + "\n" + record_block({"hotels": [{"name": "Trident"}]})
+    assert extract_record("accommodation", text)["hotels"][0]["name"] == "Trident"
+    assert extract_record("accommodation", "No record here") is None
+    assert extract_record("accommodation", "```json\n{not json}\n```") is None
+
+
+def test_strip_record_drops_complete_and_unterminated_blocks():
+    assert strip_record("Stay in Agra.\n" + record_block({"hotels": []})) == "Stay in Agra."
+    assert strip_record('Stay in Agra.\n```json\n{"hotels": [') == "Stay in Agra."
+
+
+def test_compact_record_leaves_out_empty_values():
+    record = {"hotels": [{"name": "Trident", "tier": None, "area": "", "price_per_night": "₹9,000"}]}
+    assert compact_record(record) == '{"hotels":[{"name":"Trident","price_per_night":"₹9,000"}]}'
+
+
+def test_describe_record_renders_bullets():
+    record = {"summary": "Mughal city", "tips": ["Carry water"], "highlights": []}
+    assert describe_record(record) == "**Summary:** Mughal city\n**Tips**\n- Carry water"
@@ -0,0 +1,57 @@
+import pytest
+
+from semantic_cache import SemanticCache, cosine, embed
+
+MODEL = "gemini-1.5-flash"
+TRIP = {"destination": "Agra", "start_date": "2026-11-06", "duration": 3, "budget": "Mid-range",
+        "preferences": "Historical sites, Culture, Food"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SemanticCache(path=str(tmp_path / "semantic.sqlite3"), threshold=0.88)
+
+
+def test_embedding_ignores_order_case_and_inflections():
+    assert cosine(embed("Historical sites, Culture, Food"), embed("food and culture, history")) > 0.88
+    assert cosine(embed("Historical sites"), embed("Beaches, nightlife")) < 0.5
+    assert cosine(embed(""), embed("")) == 1.0
+    assert cosine(embed(""), embed("Food")) == 0.0
+
+
+def test_similar_preferences_reuse_the_result(cache):
+    cache.store("dining", TRIP, MODEL, "Pinch of Spice")
+    value, similarity = cache.lookup("dining", dict(TRIP, preferences="culture, history and food"), MODEL)
+    assert value == "Pinch of Spice"
+    assert similarity > 0.88
+    assert cache.lookup("dining", dict(TRIP, preferences="Adventure sports"), MODEL) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_exact_fields_and_the_model_route_partition_results(cache):
+    cache.store("dining", TRIP, MODEL, "Pinch of Spice")
+    assert cache.lookup("dining", dict(TRIP, budget="Luxury"), MODEL) is None
+    assert cache.lookup("dining", TRIP, MODEL + ">gemini-1.5-pro") is None
+    # Dining does not depend on the dates
+    assert cache.lookup("dining", dict(TRIP, start_date="2027-01-01"), MODEL) is not None
+
+
+def test_steps_without_fields_are_never_cached(cache):
+    cache.store("itinerary", TRIP, MODEL, "Day 1")
+    assert cache.lookup("itinerary", TRIP, MODEL) is None
+
+
+def test_partitions_keep_the_newest_results(tmp_path):
+    cache = SemanticCache(path=str(tmp_path / "semantic.sqlite3"), max_entries=2)
+    for preferences in ("Food", "Beaches", "Wildlife"):
+        cache.store("dining", dict(TRIP, preferences=preferences), MODEL, preferences)
+    assert cache.lookup("dining", dict(TRIP, preferences="Food"), MODEL) is None
+    reopened = SemanticCache(path=str(tmp_path / "semantic.sqlite3"), max_entries=2)
+    assert reopened.stats()["entries"] == 2
+    assert reopened.lookup("dining", dict(TRIP, preferences="Wildlife"), MODEL)[0] == "Wildlife"
+
+
+def test_expired_results_are_ignored(tmp_path):
+    cache = SemanticCache(path=str(tmp_path / "semantic.sqlite3"), ttl=-1)
+    cache.store("dining", TRIP, MODEL, "Pinch of Spice")
+    assert cache.lookup("dining", TRIP, MODEL) is None
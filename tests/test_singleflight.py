@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+
+from conftest import wait_until
+from fakes import FakeLLM, Latency, install
+from singleflight import LeaderAbandoned, SingleFlight
+
+
+def run_follower(flight, key, fn):
+    """Start flight.do(key, fn) on a thread once a leader holds key; returns (thread, outcome dict)."""
+    outcome = {}
+
+    def follow():
+        outcome["result"] = flight.do(key, fn)
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    wait_until(lambda: flight.stats()["coalesced"] >= 1)
+    return thread, outcome
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight("test")
+    future, leader = flight.join("trip")
+    assert leader
+    thread, outcome = run_follower(flight, "trip", lambda: pytest.fail("follower must not run the call"))
+    flight.finish("trip", result="shared")
+    thread.join(5)
+    assert outcome["result"] == "shared"
+    assert flight.stats() == {"calls": 2, "coalesced": 1, "in_flight": 0}
+
+
+def test_follower_runs_the_call_itself_when_the_leader_is_abandoned():
+    flight = SingleFlight("test")
+    flight.join("trip")
+    thread, outcome = run_follower(flight, "trip", lambda: "own")
+    flight.finish("trip", error=LeaderAbandoned("closed"))
+    thread.join(5)
+    assert outcome["result"] == "own"
+
+
+def test_leader_stopped_by_base_exception_releases_followers():
+    flight = SingleFlight("test")
+    proceed = threading.Event()
+    leader_outcome = {}
+
+    def stopped_leader():
+        proceed.wait(5)
+        raise GeneratorExit
+
+    def lead():
+        try:
+            flight.do("trip", stopped_leader)
+        except GeneratorExit:
+            leader_outcome["stopped"] = True
+
+    leader_thread = threading.Thread(target=lead)
+    leader_thread.start()
+    wait_until(lambda: flight.stats()["in_flight"] == 1)
+    thread, outcome = run_follower(flight, "trip", lambda: "own")
+    proceed.set()
+    leader_thread.join(5)
+    thread.join(5)
+    assert leader_outcome == {"stopped": True}
+    assert outcome["result"] == "own"
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_unsuccessful_result_is_not_shared():
+    flight = SingleFlight("test")
+    flight.join("trip")
+    outcome = {}
+
+    def follow():
+        outcome["result"] = flight.do("trip", lambda: "own", is_success=lambda result: result is not None)
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    wait_until(lambda: flight.stats()["coalesced"] == 1)
+    flight.finish("trip", result=None)
+    thread.join(5)
+    assert outcome["result"] == "own"
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch, tmp_path):
+    import pipeline
+    import task_cache
+
+    llm = FakeLLM(first_token=Latency("fixed", 0.01), per_chunk=0.001, base_chars=800, chars_per_day=0)
+    with install(llm):
+        monkeypatch.setattr(pipeline, "_runners", None)
+        monkeypatch.setattr(task_cache, "_cache", task_cache.TaskCache(path=str(tmp_path / "cache.sqlite3")))
+        yield llm
+
+
+def test_cached_stream_task_follower_recovers_when_the_leader_stream_is_closed(fake_gemini):
+    import pipeline
+
+    task = pipeline.agent_task("dining_task")
+    prompt = "Destination: Agra, dining for the abandoned-leader test"
+    leader = pipeline.cached_stream_task("dining", task, prompt, "AIleader")
+    first = next(leader)
+    assert first
+    assert pipeline.task_flight.stats()["in_flight"] == 1
+
+    outcome = {}
+
+    def follow():
+        outcome["result"] = "".join(pipeline.cached_stream_task("dining", task, prompt, "AIfollower"))
+
+    coalesced = pipeline.task_flight.stats()["coalesced"]
+    thread = threading.Thread(target=follow)
+    thread.start()
+    wait_until(lambda: pipeline.task_flight.stats()["coalesced"] == coalesced + 1)
+    # The user left the page: the leading stream is closed half way
+    leader.close()
+    thread.join(10)
+
+    assert outcome["result"].startswith("dining_task:")
+    assert len(outcome["result"]) > len(first)
+    assert pipeline.task_flight.stats()["in_flight"] == 0
+    # The follower's own call filled the cache
+    assert pipeline.get_cache().get(pipeline.make_key("dining", prompt, pipeline.cache_model("dining", task))) == outcome["result"]
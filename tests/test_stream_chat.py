@@ -0,0 +1,114 @@
+import sys
+import time
+import types
+
+import pytest
+
+from conftest import wait_until
+from fakes import FakeLLM, FakeTailvy, Latency, install
+
+GEMINI_KEY = "AIchat-test-key"
+TAILVY_KEY = "tailvy-chat-test-key"
+
+
+class _RequestsError(Exception):
+    pass
+
+
+@pytest.fixture
+def backends(monkeypatch):
+    """Fake Gemini (first token after 0.3s) and Tailvy (answers in 0.02s)."""
+    import pipeline
+
+    llm = FakeLLM(first_token=Latency("fixed", 0.3), per_chunk=0.001, base_chars=600, chars_per_day=0)
+    tailvy = FakeTailvy(llm, latency=Latency("fixed", 0.02))
+    sent = []
+
+    def post(url, headers=None, json=None, timeout=None):
+        sent.append((json or {}).get("query"))
+        return tailvy.post(url, headers=headers, json=json, timeout=timeout)
+
+    # FakeTailvy stands in for requests.post; requests itself may not be installed
+    exceptions = types.SimpleNamespace(Timeout=_RequestsError, ConnectionError=_RequestsError)
+    monkeypatch.setitem(sys.modules, "requests", types.SimpleNamespace(post=post, exceptions=exceptions))
+    with install(llm):
+        monkeypatch.setattr(pipeline, "_runners", None)
+        yield types.SimpleNamespace(llm=llm, tailvy=tailvy, sent=sent, pipeline=pipeline)
+
+
+def collect(stream):
+    backends = set()
+    text = ""
+    for backend, chunk in stream:
+        backends.add(backend)
+        text += chunk
+    return backends, text
+
+
+def gemini_in_flight():
+    from rate_limiter import get_rate_limiter
+
+    return get_rate_limiter().stats(GEMINI_KEY)["in_flight"]
+
+
+def test_without_tailvy_key_gemini_answers(backends):
+    winners, text = collect(backends.pipeline.stream_chat("What should we eat in Agra?", GEMINI_KEY))
+    assert winners == {"gemini"}
+    assert text.startswith("chatbot_task:")
+    assert backends.sent == []
+
+
+def test_fast_tailvy_wins_and_gets_the_grounded_prompt(backends):
+    pipeline = backends.pipeline
+    question = "Which hotel did the plan pick?"
+    user_input = {"destination": "Agra"}
+    history = ("- Asked: best time to visit Answered: October to March", [("Is it hot?", "Yes, in May.")])
+    stream = pipeline.stream_chat(question, GEMINI_KEY, TAILVY_KEY, user_input=user_input, history=history)
+    chunks = list(stream)
+    assert [backend for backend, _ in chunks] == ["tailvy"]
+    assert chunks[0][1].startswith("tailvy_chat:")
+    assert backends.sent == [pipeline.build_chat_context(question, user_input, history)]
+    # The losing Gemini call is cancelled and gives its rate limiter slot back
+    wait_until(lambda: gemini_in_flight() == 0)
+
+
+def test_slow_tailvy_loses_to_gemini(backends):
+    backends.tailvy.latency = Latency("fixed", 2.0)
+    started = time.perf_counter()
+    winners, text = collect(backends.pipeline.stream_chat("How do we reach the fort?", GEMINI_KEY, TAILVY_KEY))
+    assert winners == {"gemini"}
+    assert text.startswith("chatbot_task:")
+    assert time.perf_counter() - started < 1.5
+
+
+def test_failed_tailvy_falls_back_to_gemini_with_a_notice(backends):
+    backends.tailvy.status_code = 500
+    notices = []
+    winners, text = collect(backends.pipeline.stream_chat(
+        "Any vegetarian places?", GEMINI_KEY, TAILVY_KEY, notify=lambda level, message: notices.append(level)
+    ))
+    assert winners == {"gemini"}
+    assert text.startswith("chatbot_task:")
+    assert notices
+
+
+def test_both_failing_raises_geminis_error(backends, monkeypatch):
+    backends.tailvy.status_code = 500
+
+    def broken(task, input_text, api_key=None, model=None):
+        raise RuntimeError("gemini down")
+        yield
+
+    monkeypatch.setattr(sys.modules["travel"], "stream_task", broken)
+    monkeypatch.setattr(backends.pipeline, "_runners", None)
+    with pytest.raises(RuntimeError, match="gemini down"):
+        collect(backends.pipeline.stream_chat("Is the fort open on Fridays?", GEMINI_KEY, TAILVY_KEY))
+
+
+def test_caller_closing_the_stream_cancels_gemini(backends):
+    backends.tailvy.latency = Latency("fixed", 2.0)
+    stream = backends.pipeline.stream_chat("Plan a rainy day", GEMINI_KEY, TAILVY_KEY)
+    backend, chunk = next(stream)
+    assert backend == "gemini"
+    stream.close()
+    wait_until(lambda: gemini_in_flight() == 0)